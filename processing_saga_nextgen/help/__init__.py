@@ -3,24 +3,49 @@ Help utilities
 """
 
 import codecs
+import json
 import os
+import threading
 import warnings
 
-with warnings.catch_warnings():
-    warnings.filterwarnings("ignore", category=DeprecationWarning)
-    import yaml
-
 from qgis.core import QgsSettings, Qgis
 from qgis.PyQt.QtCore import QLocale, QCoreApplication
 
+COMPILED_HELP_VERSION = 1
+COMPILED_HELP_FILENAME = "saga_nextgen_short_help.json"
 
-def loadShortHelp():
+_lock = threading.Lock()
+_compiled_help = None
+_translated_help = {}
+_qgis_docs_url = None
+
+
+def _helpFiles() -> dict:
     """
-    Load short help descriptions
+    Returns a dictionary of the yaml help files to their [mtime, size] fingerprint
+    """
+    path = os.path.dirname(__file__)
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith("yaml"):
+                stat = entry.stat()
+                files[entry.name] = [stat.st_mtime_ns, stat.st_size]
+    return files
+
+
+def compileShortHelp() -> dict:
+    """
+    Parses the yaml help files into their compact form, a dictionary of
+    algorithm id to [translation context, untranslated help text]
     """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        import yaml  # pylint: disable=import-outside-toplevel
+
     h = {}
     path = os.path.dirname(__file__)
-    for f in os.listdir(path):
+    for f in sorted(os.listdir(path)):
         if f.endswith("yaml"):
             filename = os.path.join(path, f)
             with codecs.open(filename, encoding="utf-8") as stream:
@@ -29,29 +54,117 @@ def loadShortHelp():
                     for k, v in yaml.load(stream, Loader=yaml.SafeLoader).items():
                         if v is None:
                             continue
-                        h[k] = QCoreApplication.translate(
-                            "{}Algorithm".format(f[:-5].upper()), v
-                        )
-
-    version = ".".join(Qgis.QGIS_VERSION.split(".")[0:2])
-    overrideLocale = QgsSettings().value("locale/overrideFlag", False, bool)
-    if not overrideLocale:
-        locale = QLocale.system().name()[:2]
-    else:
-        locale = QgsSettings().value("locale/userLocale", "")
-    locale = locale.split("_")[0]
-
-    def replace(s):
-        if s is not None:
-            return s.replace(
-                "{qgisdocs}", "https://docs.qgis.org/%s/%s/docs" % (version, locale)
+                        h[k] = ["{}Algorithm".format(f[:-5].upper()), v]
+    return h
+
+
+def _compiledHelpFile() -> str:
+    """
+    Returns the path to the compiled help cache
+    """
+    from processing.tools.system import userFolder  # pylint: disable=import-outside-toplevel
+
+    return os.path.join(userFolder(), COMPILED_HELP_FILENAME)
+
+
+def _loadCompiledHelp() -> dict:
+    """
+    Returns the compact form of the help, reading it from the compiled help
+    cache when this is up to date with the yaml files, and recompiling and
+    storing it otherwise
+    """
+    files = _helpFiles()
+    compiled_file = _compiledHelpFile()
+    try:
+        with open(compiled_file, encoding="utf-8") as f:
+            compiled = json.load(f)
+        if (
+            compiled.get("version") == COMPILED_HELP_VERSION
+            and compiled.get("files") == files
+        ):
+            return compiled["help"]
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    h = compileShortHelp()
+    temp_file = "{}.{}.tmp".format(compiled_file, os.getpid())
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": COMPILED_HELP_VERSION, "files": files, "help": h},
+                f,
+                separators=(",", ":"),
             )
+        os.replace(temp_file, compiled_file)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+    return h
+
+
+def _qgisDocsUrl() -> str:
+    """
+    Returns the base URL of the QGIS documentation for the current QGIS version and locale
+    """
+    global _qgis_docs_url  # pylint: disable=global-statement
+    if _qgis_docs_url is None:
+        version = ".".join(Qgis.QGIS_VERSION.split(".")[0:2])
+        overrideLocale = QgsSettings().value("locale/overrideFlag", False, bool)
+        if not overrideLocale:
+            locale = QLocale.system().name()[:2]
+        else:
+            locale = QgsSettings().value("locale/userLocale", "")
+        locale = locale.split("_")[0]
+        _qgis_docs_url = "https://docs.qgis.org/%s/%s/docs" % (version, locale)
+    return _qgis_docs_url
 
-        return None
 
-    h = {k: replace(v) for k, v in list(h.items())}
+def algorithmShortHelp(algorithm_id: str):
+    """
+    Returns the translated short help for an algorithm, or None if there is
+    no help for the algorithm.
+
+    The help files are only read on the first call, and each algorithm's
+    help is translated once and then cached.
+    """
+    global _compiled_help  # pylint: disable=global-statement
+    if algorithm_id in _translated_help:
+        return _translated_help[algorithm_id]
 
+    with _lock:
+        if _compiled_help is None:
+            _compiled_help = _loadCompiledHelp()
+
+        entry = _compiled_help.get(algorithm_id)
+        if entry is None:
+            h = None
+        else:
+            context, text = entry
+            h = QCoreApplication.translate(context, text).replace(
+                "{qgisdocs}", _qgisDocsUrl()
+            )
+        _translated_help[algorithm_id] = h
     return h
 
 
-shortHelp = loadShortHelp()
+def loadShortHelp():
+    """
+    Load short help descriptions
+    """
+    global _compiled_help  # pylint: disable=global-statement
+    with _lock:
+        if _compiled_help is None:
+            _compiled_help = _loadCompiledHelp()
+        algorithm_ids = list(_compiled_help.keys())
+
+    return {k: algorithmShortHelp(k) for k in algorithm_ids}
+
+
+def __getattr__(name):
+    # the short help dictionary used to be built on import, keep it available
+    # for existing users but only build it when actually requested
+    if name == "shortHelp":
+        return loadShortHelp()
+    raise AttributeError(name)
@@ -20,8 +20,8 @@ import os
 import shutil
 
 from processing.core.ProcessingConfig import ProcessingConfig
-from processing.tools.system import getTempFilename
 from qgis.core import (
+    QgsProcessingParameterDefinition,
     Qgis,
     QgsApplication,
     QgsProcessingUtils,
@@ -30,6 +30,7 @@ from qgis.core import (
     QgsProcessing,
     QgsProcessingParameterRasterLayer,
     QgsProcessingParameterFeatureSource,
+    QgsProcessingFeatureSourceDefinition,
     QgsProcessingParameterBoolean,
     QgsProcessingParameterNumber,
     QgsProcessingParameterEnum,
@@ -40,20 +41,28 @@ from qgis.core import (
     QgsProcessingParameterFile,
     QgsProcessingParameterExtent,
     QgsProcessingParameterRasterDestination,
+    QgsRasterLayer,
     QgsProcessingParameterVectorDestination,
+    QgsProcessingOutputMultipleLayers,
 )
 
 from .SagaAlgorithmBase import SagaAlgorithmBase
-from .SagaNameDecorator import decoratedAlgorithmName, decoratedGroupName
-from .SagaParameters import Parameters
+from .SagaAlgorithmDefinition import SagaAlgorithmDefinition
+from .SagaParameters import SagaImageOutputParam
+from .accounting import SagaRunSummary
+from .alignment import SagaGrid
+from .clipping import SagaClipping
+from .exportcache import SagaExportCache
+from .gdalexport import SagaGdalExport
+from .profiling import SagaTrace
+from .rastermetadata import SagaRasterMetadata
+from .scheduler import SagaCoreScheduler
+from .bands import SagaBandExecution
+from .tiling import SagaTiledExecution, SagaTiling
+from .tiffoutput import SagaTiffOutput
 from .utils import SagaUtils
-from ..help import shortHelp
-
-pluginPath = os.path.normpath(
-    os.path.join(os.path.split(os.path.dirname(__file__))[0], os.pardir)
-)
-
-sessionExportedLayers = {}
+from .vectorexport import SagaVectorExport
+from ..help import algorithmShortHelp
 
 
 class SagaAlgorithm(SagaAlgorithmBase):
@@ -63,29 +72,68 @@ class SagaAlgorithm(SagaAlgorithmBase):
 
     OUTPUT_EXTENT = "OUTPUT_EXTENT"
 
-    def __init__(self, descriptionfile):
+    # io_gdal options used when exporting rasters
+    RASTER_EXPORT_OPTIONS = "-TRANSFORM 1 -RESAMPLING 3"
+
+    # advanced parameter overriding the number of threads used for a run
+    THREADS = "SAGA_THREADS"
+    STACK_BANDS = "SAGA_STACK_BANDS"
+    # suffix of the outputs listing every band's output of unstacked runs
+    BAND_OUTPUTS_SUFFIX = "_BANDS"
+    ALIGN_REFERENCE = "SAGA_ALIGN_REFERENCE"
+
+    def __init__(
+        self,
+        descriptionfile,
+        description=None,
+        definition=None,
+        defer_parameters=False,
+    ):
         super().__init__()
         self.exportedLayers = {}
-        self.hardcoded_strings = []
-        self.allow_nonmatching_grid_extents = False
+        self.exportedFiles = []
+        # export cache key to path, for exports which have not run yet
+        self.pendingExports = {}
+        # raster source (and window or grid) to exported path, for the
+        # run's (or batch's) exports whether or not the cache is enabled
+        self.sharedExports = {}
+        # (cache, path) of the export cache entries pinned by the run
+        self.usedExports = []
+        # io_gdal import command to the (source, destination) of the GDAL
+        # export which replaces it
+        self.gdalExports = {}
+        # input name to multiband raster layer, for inputs run per band
+        self.bandInputs = {}
+        # output name to the paths of each band's output
+        self.bandOutputs = {}
+        # temporary grid to GeoTIFF, for outputs converted after the run
+        self.tiffOutputs = {}
+        # grid which raster inputs are aligned to, if any
+        self.alignGrid = None
+        self.runSummary = None
+        self.trace = SagaTrace(None)
         self.description_file = descriptionfile
-        self.undecorated_group = None
-        self._name = ""
-        self._display_name = ""
-        self._group = ""
-        self._groupId = ""
-        self.params = []
-        self.known_issues = False
-        self.defineCharacteristicsFromFile()
+        self.defer_parameters = defer_parameters
+        self._parameters_created = False
+        if definition is None:
+            definition = SagaAlgorithmDefinition.definition(
+                descriptionfile, description
+            )
+        self.defineCharacteristics(definition)
 
     # pylint: disable=missing-docstring
 
     def createInstance(self):
-        return SagaAlgorithm(self.description_file)
+        # only the per-run state is new, the parsed definition is shared
+        return SagaAlgorithm(self.description_file, definition=self.definition)
 
     def initAlgorithm(self, config=None):  # pylint: disable=unused-argument
-        for p in self.params:
-            self.addParameter(p)
+        if self.defer_parameters:
+            # the provider's copy only needs the metadata shown in the
+            # toolbox. Instances created from it (for running, dialogs or
+            # models) through createInstance create their parameters.
+            return
+        self.createParameters()
 
     def name(self):
         return self._name
@@ -100,7 +148,7 @@ class SagaAlgorithm(SagaAlgorithmBase):
         return self._groupId
 
     def shortHelpString(self):
-        return shortHelp.get(self.id(), None)
+        return algorithmShortHelp(self.id())
 
     def icon(self):
         return QgsApplication.getThemeIcon("/providerSaga.svg")
@@ -110,59 +158,200 @@ class SagaAlgorithm(SagaAlgorithmBase):
 
     # pylint: enable=missing-docstring
 
-    def defineCharacteristicsFromFile(self):
+    def createParameters(self):
         """
-        Defines algorithm parameters from file
+        Creates the algorithm's parameters from the shared definition's
+        prototype parameters, if this has not already been done
         """
-        with open(self.description_file, encoding="utf-8") as lines:
-            line = lines.readline().strip("\n").strip()
+        if self._parameters_created:
+            return
 
-            self._name = line
-            if "|" in self._name:
-                tokens = self._name.split("|")
-                self._name = tokens[0]
-                # cmdname is the name of the algorithm in SAGA, that is, the name to use to call it in the console
-                self.cmdname = tokens[1]
+        self._parameters_created = True
+        for param in self.definition.parameters():
+            self.addParameter(param.clone())
+
+        threads = QgsProcessingParameterNumber(
+            self.THREADS,
+            self.tr("Number of threads (0 = use the provider setting)"),
+            QgsProcessingParameterNumber.Type.Integer,
+            defaultValue=0,
+            optional=True,
+            minValue=0,
+        )
+        threads.setFlags(
+            threads.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+        )
+        self.addParameter(threads)
+
+        # multiband inputs are run for each band, with optionally stacked
+        # outputs, for algorithms which turn rasters into rasters
+        prototypes = self.definition.parameters()
+        if any(
+            isinstance(param, QgsProcessingParameterRasterLayer) for param in prototypes
+        ) and any(
+            isinstance(param, QgsProcessingParameterRasterDestination)
+            and not isinstance(param, SagaImageOutputParam)
+            for param in prototypes
+        ):
+            stack = QgsProcessingParameterBoolean(
+                self.STACK_BANDS,
+                self.tr(
+                    "Stack the outputs of multiband inputs into multiband GeoTIFFs"
+                ),
+                defaultValue=False,
+                optional=True,
+            )
+            stack.setFlags(
+                stack.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+            )
+            self.addParameter(stack)
+
+            # unless stacked, the raster outputs of multiband inputs are the
+            # first band's output, with every band's output listed here
+            for param in prototypes:
+                if isinstance(
+                    param, QgsProcessingParameterRasterDestination
+                ) and not isinstance(param, SagaImageOutputParam):
+                    self.addOutput(
+                        QgsProcessingOutputMultipleLayers(
+                            param.name() + self.BAND_OUTPUTS_SUFFIX,
+                            self.tr("{} (each band of multiband inputs)").format(
+                                param.description()
+                            ),
+                        )
+                    )
 
-            else:
-                self.cmdname = self._name
-                self._display_name = self.tr(str(self._name))
-            self._name = decoratedAlgorithmName(self._name)
-            self._display_name = self.tr(str(self._name))
-
-            self._name = self._name.lower()
-            validChars = (
-                "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789:"
+        # raster inputs which must share a grid can be aligned to a chosen
+        # reference grid
+        if not self.allow_nonmatching_grid_extents and any(
+            isinstance(param, QgsProcessingParameterRasterLayer)
+            or (
+                isinstance(param, QgsProcessingParameterMultipleLayers)
+                and param.layerType() == QgsProcessing.SourceType.TypeRaster
+            )
+            for param in prototypes
+        ):
+            reference = QgsProcessingParameterRasterLayer(
+                self.ALIGN_REFERENCE,
+                self.tr("Reference grid to align raster inputs to"),
+                optional=True,
             )
-            self._name = "".join(c for c in self._name if c in validChars)
+            reference.setFlags(
+                reference.flags() | QgsProcessingParameterDefinition.Flag.FlagAdvanced
+            )
+            self.addParameter(reference)
 
-            line = lines.readline().strip("\n").strip()
-            if line == "##known_issues":
-                self.known_issues = True
-                line = lines.readline().strip("\n").strip()
+    def defineCharacteristics(self, definition):
+        """
+        Defines algorithm characteristics from a shared algorithm definition
+        """
+        self.definition = definition
+        self.cmdname = definition.cmdname
+        self._name = definition.name
+        self._display_name = definition.display_name
+        self._group = definition.group
+        self._groupId = definition.group_id
+        self.undecorated_group = definition.undecorated_group
+        self.known_issues = definition.known_issues
+        self.hardcoded_strings = definition.hardcoded_strings
+        self.allow_nonmatching_grid_extents = definition.allow_nonmatching_grid_extents
+        self.tile_halo = definition.tile_halo
+
+    def processAlgorithm(self, parameters, context, feedback):  # pylint: disable=missing-docstring
+        self.trace = SagaTrace.for_run(self.id())
+        try:
+            with self.trace.span(self.id(), "algorithm"):
+                return self.runAlgorithm(parameters, context, feedback)
+        finally:
+            self.trace.finish()
 
-            self.undecorated_group = line
-            self._group = self.tr(decoratedGroupName(self.undecorated_group))
+    def runAlgorithm(self, parameters, context, feedback):
+        """
+        Runs the algorithm, returning its results
+        """
+        with self.trace.span("version check"):
+            self.checkInstalledVersion(feedback)
+
+        self.pendingExports = {}
+        self.sharedExports = {}
+        self.usedExports = []
 
-            validChars = (
-                "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789:"
+        # every execution gets its own workspace for its job files, so that
+        # concurrent executions never overwrite each other's files
+        workspace = SagaUtils.createJobWorkspace()
+        try:
+            import_commands, commands, outputs = self.prepareCommands(
+                parameters, context, feedback, workspace
             )
-            grpName = decoratedGroupName(self.undecorated_group).lower()
-            self._groupId = "".join(c for c in grpName if c in validChars)
-            line = lines.readline().strip("\n").strip()
-            while line != "":
-                if line.startswith("Hardcoded"):
-                    self.hardcoded_strings.append(line[len("Hardcoded|") :])
-                elif Parameters.is_parameter_line(line):
-                    self.params.append(Parameters.create_parameter_from_line(line))
-                elif line.startswith("AllowUnmatching"):
-                    self.allow_nonmatching_grid_extents = True
-                else:
-                    pass  # TODO
-                    # self.addOutput(getOutputFromString(line))
-                line = lines.readline().strip("\n").strip()
+            self.logCommands(import_commands + commands, feedback)
+
+            # 3: Run SAGA
+            # input imports don't depend on each other, so they run
+            # concurrently before the algorithm's own commands
+            summary = SagaRunSummary(self.id())
+            with self.trace.span("import inputs"):
+                import_commands, runs = SagaGdalExport.exportRasters(
+                    import_commands, self.gdalExports, feedback
+                )
+                summary.add(runs)
+                completed, runs = SagaUtils.executeSagaImports(
+                    import_commands, feedback, workspace
+                )
+            summary.add(runs)
+            execution = None
+            if completed:
+                self.commitExports(feedback)
+                # multiband inputs run per band, large tileable rasters in
+                # tiles, and everything else as a single command
+                execution = self.bandExecution(
+                    parameters, context, commands, outputs, workspace
+                ) or self.tiledExecution(
+                    parameters, context, commands, outputs, workspace
+                )
+            if execution is not None:
+                feedback.pushInfo(execution.summary())
+                with self.trace.span("saga execution", mode=execution.summary()):
+                    completed, runs = execution.run(
+                        lambda part_inputs, part_outputs: self.substitutedCommand(
+                            parameters, context, workspace, part_inputs, part_outputs
+                        ),
+                        feedback,
+                        self.requestedThreads(parameters, context),
+                    )
+                summary.add(runs)
+            elif completed:
+                with SagaCoreScheduler.reserve(
+                    self.requestedThreads(parameters, context)
+                ) as threads:
+                    feedback.pushDebugInfo(
+                        self.tr("Running SAGA with {} threads").format(threads)
+                    )
+                    with self.trace.span("saga execution", threads=threads):
+                        completed, runs = SagaUtils.executeSagaCommands(
+                            commands, feedback, workspace, threads
+                        )
+                    summary.add(runs)
+        finally:
+            workspace.cleanup()
+            self.releaseExports()
+
+        self.trace.add_command_runs(summary.runs)
+
+        self.reportRunSummary(summary, feedback)
+
+        _, _, output_files, output_files_nonascii = outputs
+        if not completed:
+            self.removeCanceledRunFiles(output_files, output_files_nonascii)
+            return {}
 
-    def processAlgorithm(self, parameters, context, feedback):  # pylint: disable=missing-docstring,too-many-statements,too-many-branches,too-many-locals
+        results = self.finalizeOutputs(*outputs)
+        self.updateBandLayersToLoad(context, output_files)
+        return results
+
+    def checkInstalledVersion(self, feedback):
+        """
+        Checks that a supported version of SAGA is installed
+        """
         version = SagaUtils.getInstalledVersion(True)
         if version is None:
             raise QgsProcessingException(
@@ -171,52 +360,216 @@ class SagaAlgorithm(SagaAlgorithmBase):
                 )
             )
 
-        if version < SagaUtils.REQUIRED_VERSION:
+        if SagaUtils.versionTuple(version) < SagaUtils.versionTuple(
+            SagaUtils.REQUIRED_VERSION
+        ):
             feedback.reportError(
                 self.tr(
                     "Problem with SAGA installation: unsupported SAGA version (found: {}, required: >={})."
                 ).format(version, SagaUtils.REQUIRED_VERSION)
             )
 
-        commands = []
+    def prepareCommands(self, parameters, context, feedback, workspace):
+        """
+        Exports the inputs and builds the SAGA commands for a run.
+
+        Returns the input import commands, which do not depend on each other,
+        the remaining commands, and the run's outputs as a tuple of the CRS
+        to write for output layers (or None), the list of output layer files,
+        a dictionary of output name to output file, and a dictionary of
+        temporary output file to the requested output file for outputs with
+        non-ascii paths.
+        """
         self.exportedLayers = {}
+        self.exportedFiles = []
+        self.gdalExports = {}
+        self.bandInputs = {}
+        self.bandOutputs = {}
+        self.tiffOutputs = {}
+        self.alignGrid = self.alignmentGrid(parameters, context)
 
         self.preProcessInputs()
-        crs = None
 
         # 1: Export rasters to sgrd and vectors to shp
         # Tables must be in dbf format. We check that.
+        with self.trace.span("export inputs"):
+            export_commands, crs = self.exportInputLayers(parameters, context, feedback)
+        commands = list(export_commands)
+
+        # 2: Set parameters and outputs
+        with self.trace.span("build commands"):
+            command, output_layers, output_files, output_files_nonascii = (
+                self.buildCommand(parameters, context, workspace)
+            )
+            commands.append(command)
+            commands.extend(self.postProcessingCommands(parameters, context))
+            commands = self.editCommands(commands)
+
+        import_commands, commands = SagaUtils.splitImportCommands(
+            commands, export_commands
+        )
+        return (
+            import_commands,
+            commands,
+            (crs, output_layers, output_files, output_files_nonascii),
+        )
+
+    def logCommands(self, commands, feedback):
+        """
+        Reports the commands for a run, and logs them if enabled
+        """
+        loglines = [self.tr("SAGA execution commands")]
+        for line in commands:
+            feedback.pushCommandInfo(line)
+            loglines.append(line)
+        if ProcessingConfig.getSetting(SagaUtils.SAGA_LOG_COMMANDS):
+            QgsMessageLog.logMessage(
+                "\n".join(loglines), self.tr("Processing"), Qgis.MessageLevel.Info
+            )
+
+    def reportRunSummary(self, summary, feedback):
+        """
+        Reports the resources used by each command of a run, logging them if
+        command logging is enabled
+        """
+        self.runSummary = summary.toDict()
+        lines = summary.lines()
+        for line in lines:
+            feedback.pushInfo(line)
+        if ProcessingConfig.getSetting(SagaUtils.SAGA_LOG_COMMANDS):
+            QgsMessageLog.logMessage(
+                "\n".join([self.tr("SAGA execution resource usage")] + lines),
+                self.tr("Processing"),
+                Qgis.MessageLevel.Info,
+            )
+        summary.write()
+
+    def finalizeOutputs(
+        self, crs, output_layers, output_files, output_files_nonascii
+    ) -> dict:
+        """
+        Finalizes the outputs of a completed run, writing their projection
+        files, converting GeoTIFF outputs and moving outputs with non-ascii
+        paths into place, and returns the algorithm results
+        """
+        if crs is not None:
+            with self.trace.span("write projection files"):
+                for out in output_layers:
+                    prjFile = os.path.splitext(out)[0] + ".prj"
+                    with open(prjFile, "wt", encoding="utf-8") as f:
+                        f.write(crs.toWkt())
+
+        if self.tiffOutputs:
+            tiffOutput = SagaUtils.tiffOutput()
+            with self.trace.span("convert tif outputs"):
+                for gridPath, tiffPath in self.tiffOutputs.items():
+                    error = tiffOutput.translate(gridPath, tiffPath)
+                    SagaUtils.removeDataset(gridPath)
+                    if error is not None:
+                        raise QgsProcessingException(
+                            self.tr("Could not write {}: {}").format(tiffPath, error)
+                        )
+
+        with self.trace.span("move non-ascii outputs"):
+            for old, new in output_files_nonascii.items():
+                oldFolder = os.path.dirname(old)
+                newFolder = os.path.dirname(new)
+                newName = os.path.splitext(os.path.basename(new))[0]
+                files = list(os.listdir(oldFolder))
+                for f in files:
+                    ext = os.path.splitext(f)[1]
+                    newPath = os.path.join(newFolder, newName + ext)
+                    oldPath = os.path.join(oldFolder, f)
+                    shutil.move(oldPath, newPath)
+
+        results = {
+            o.name(): output_files[o.name()]
+            for o in self.outputDefinitions()
+            if o.name() in output_files
+        }
+        # unstacked outputs of multiband inputs: the first band's output,
+        # and the list of every band's outputs
+        for name, paths in self.bandOutputs.items():
+            results[name] = paths[0]
+            results[name + self.BAND_OUTPUTS_SUFFIX] = paths
+        return results
+
+    def updateBandLayersToLoad(self, context, output_files):
+        """
+        Loads the first band's output of unstacked multiband runs on
+        completion in place of the requested output, which is not written
+        """
+        layers = context.layersToLoadOnCompletion()
+        changed = False
+        for name, paths in self.bandOutputs.items():
+            path = output_files.get(name)
+            if path in layers:
+                layers[paths[0]] = layers.pop(path)
+                changed = True
+        if changed:
+            context.setLayersToLoadOnCompletion(layers)
+
+    def exportInputLayers(self, parameters, context, feedback):  # pylint: disable=too-many-statements,too-many-branches
+        """
+        Exports input rasters to sgrd and vectors to shp where required,
+        storing the paths to use for each input in exportedLayers.
+
+        Returns the list of export commands to run before the algorithm's
+        command, and the CRS of the first vector input (or None).
+        """
+        commands = []
+        crs = None
+
         for param in self.parameterDefinitions():  # pylint:disable=too-many-nested-blocks
             if isinstance(param, QgsProcessingParameterRasterLayer):
                 if param.name() not in parameters or parameters[param.name()] is None:
                     continue
+                if param.name() == self.ALIGN_REFERENCE:
+                    continue
 
+                # SAGA grids are used as is, unless they must be aligned
                 if isinstance(parameters[param.name()], str):
-                    if parameters[param.name()].lower().endswith("sdat"):
+                    if self.alignGrid is None and parameters[
+                        param.name()
+                    ].lower().endswith("sdat"):
                         self.exportedLayers[param.name()] = (
                             parameters[param.name()][:-4] + "sgrd"
                         )
-                    elif parameters[param.name()].lower().endswith("sgrd"):
+                    elif self.alignGrid is None and parameters[
+                        param.name()
+                    ].lower().endswith("sgrd"):
                         self.exportedLayers[param.name()] = parameters[param.name()]
                     else:
                         layer = self.parameterAsRasterLayer(
                             parameters, param.name(), context
                         )
-                        exportCommand = self.exportRasterLayer(param.name(), layer)
+                        exportCommand = self.exportRasterLayer(
+                            param.name(),
+                            layer,
+                            self.clipRectangle(parameters, context, layer.crs()),
+                        )
                         if exportCommand is not None:
                             commands.append(exportCommand)
                 else:
-                    if parameters[param.name()].source().lower().endswith("sdat"):
+                    if self.alignGrid is None and parameters[
+                        param.name()
+                    ].source().lower().endswith("sdat"):
                         self.exportedLayers[param.name()] = (
                             parameters[param.name()].source()[:-4] + "sgrd"
                         )
-                    if parameters[param.name()].source().lower().endswith("sgrd"):
+                    if self.alignGrid is None and parameters[
+                        param.name()
+                    ].source().lower().endswith("sgrd"):
                         self.exportedLayers[param.name()] = parameters[
                             param.name()
                         ].source()
                     else:
                         exportCommand = self.exportRasterLayer(
-                            param.name(), parameters[param.name()]
+                            param.name(),
+                            parameters[param.name()],
+                            self.clipRectangle(
+                                parameters, context, parameters[param.name()].crs()
+                            ),
                         )
                         if exportCommand is not None:
                             commands.append(exportCommand)
@@ -233,13 +586,9 @@ class SagaAlgorithm(SagaAlgorithmBase):
 
                     crs = source.sourceCrs()
 
-                layer_path = self.parameterAsCompatibleSourceLayerPath(
-                    parameters, param.name(), context, ["shp"], "shp", feedback=feedback
+                self.exportedLayers[param.name()] = self.exportVectorLayer(
+                    parameters, param.name(), context, feedback, parameters
                 )
-                if layer_path:
-                    self.exportedLayers[param.name()] = layer_path
-                else:
-                    raise QgsProcessingException(self.tr("Unsupported file format"))
             elif isinstance(param, QgsProcessingParameterMultipleLayers):
                 if param.name() not in parameters or parameters[param.name()] is None:
                     continue
@@ -250,12 +599,20 @@ class SagaAlgorithm(SagaAlgorithmBase):
                 if param.layerType() == QgsProcessing.SourceType.TypeRaster:
                     files = []
                     for i, layer in enumerate(layers):
-                        if layer.source().lower().endswith("sdat"):
+                        if self.alignGrid is None and layer.source().lower().endswith(
+                            "sdat"
+                        ):
                             files.append(layer.source()[:-4] + "sgrd")
-                        elif layer.source().lower().endswith("sgrd"):
+                        elif self.alignGrid is None and layer.source().lower().endswith(
+                            "sgrd"
+                        ):
                             files.append(layer.source())
                         else:
-                            exportCommand = self.exportRasterLayer(param.name(), layer)
+                            exportCommand = self.exportRasterLayer(
+                                param.name(),
+                                layer,
+                                self.clipRectangle(parameters, context, layer.crs()),
+                            )
                             files.append(self.exportedLayers[param.name()])
                             if exportCommand is not None:
                                 commands.append(exportCommand)
@@ -275,32 +632,246 @@ class SagaAlgorithm(SagaAlgorithmBase):
 
                             crs = source.sourceCrs()
 
-                        layer_path = self.parameterAsCompatibleSourceLayerPath(
-                            temp_params,
-                            param.name(),
-                            context,
-                            ["shp"],
-                            "shp",
-                            feedback=feedback,
+                        layer_path = self.exportVectorLayer(
+                            temp_params, param.name(), context, feedback, parameters
                         )
-                        if layer_path:
-                            if param.name() in self.exportedLayers:
-                                self.exportedLayers[param.name()].append(layer_path)
-                            else:
-                                self.exportedLayers[param.name()] = [layer_path]
+                        if param.name() in self.exportedLayers:
+                            self.exportedLayers[param.name()].append(layer_path)
                         else:
-                            raise QgsProcessingException(
-                                self.tr("Unsupported file format")
-                            )
+                            self.exportedLayers[param.name()] = [layer_path]
 
-        # 2: Set parameters and outputs
+        return commands, crs
+
+    def alignsGrids(self, parameters) -> bool:
+        """
+        Returns True if a run's raster inputs are aligned to a reference
+        grid, i.e. grid alignment is enabled or a reference grid was chosen
+        """
+        return (
+            not self.allow_nonmatching_grid_extents
+            and SagaGdalExport.available()
+            and (
+                SagaUtils.alignGrids()
+                or parameters.get(self.ALIGN_REFERENCE) is not None
+            )
+        )
+
+    def alignmentGrid(self, parameters, context):
+        """
+        Returns the grid which a run's raster inputs are aligned to, i.e. the
+        chosen reference grid or the grid of the first raster input, or None
+        if inputs are not aligned
+        """
+        if not self.alignsGrids(parameters):
+            return None
+
+        if parameters.get(self.ALIGN_REFERENCE) is not None:
+            layer = self.parameterAsRasterLayer(
+                parameters, self.ALIGN_REFERENCE, context
+            )
+            if layer is None:
+                raise QgsProcessingException(
+                    self.invalidRasterError(parameters, self.ALIGN_REFERENCE)
+                )
+            return SagaGrid.fromLayer(layer)
+
+        for param in self.parameterDefinitions():
+            if param.name() not in parameters or parameters[param.name()] is None:
+                continue
+            layer = None
+            if isinstance(param, QgsProcessingParameterRasterLayer):
+                layer = self.parameterAsRasterLayer(parameters, param.name(), context)
+            elif (
+                isinstance(param, QgsProcessingParameterMultipleLayers)
+                and param.layerType() == QgsProcessing.SourceType.TypeRaster
+            ):
+                layers = self.parameterAsLayerList(parameters, param.name(), context)
+                layer = layers[0] if layers else None
+            if layer is not None:
+                return SagaGrid.fromLayer(layer)
+        return None
+
+    def clipRectangle(self, parameters, context, crs):
+        """
+        Returns the output extent, in the given CRS, which inputs are clipped
+        to, or None if inputs should not be clipped
+        """
+        # the extents of projection tools are in the target CRS, not in
+        # the CRS of their inputs
+        if not SagaUtils.clipToExtent() or self.undecorated_group.startswith("pj_"):
+            return None
+
+        for param in self.parameterDefinitions():
+            if (
+                isinstance(param, QgsProcessingParameterExtent)
+                and parameters.get(param.name()) is not None
+            ):
+                rect = self.parameterAsExtent(parameters, param.name(), context, crs)
+                if rect.isNull() or rect.isEmpty():
+                    return None
+                return rect
+        return None
+
+    def clipMarginDistance(self, parameters, context) -> float:
+        """
+        Returns the margin around the extent of clipped vector inputs, in
+        map units, i.e. the clip margin in cells of the output cell size
+        """
+        for name in ("TARGET_USER_SIZE", "USER_SIZE"):
+            if (
+                self.parameterDefinition(name) is not None
+                and parameters.get(name) is not None
+            ):
+                return SagaUtils.clipMargin() * self.parameterAsDouble(
+                    parameters, name, context
+                )
+        return 0
+
+    def exportVectorLayer(
+        self, parameters, parameterName, context, feedback, runParameters
+    ):
+        """
+        Exports a vector input to a shapefile where required, returning the
+        shapefile's path. Exports of file based layers are reused from the
+        export cache when the layer has not changed. When inputs are
+        clipped, only the features intersecting the output extent (of
+        runParameters) are exported.
+        """
+        clipRect = None
+        source = None
+        if SagaUtils.clipToExtent():
+            source = self.parameterAsSource(parameters, parameterName, context)
+            if source is not None:
+                clipRect = self.clipRectangle(
+                    runParameters, context, source.sourceCrs()
+                )
+                if clipRect is not None:
+                    clipRect.grow(self.clipMarginDistance(runParameters, context))
+
+        cache = SagaExportCache.cache(SagaExportCache.VECTORS)
+        key = None
+        if cache is not None:
+            key = self.vectorExportKey(parameters, parameterName, context, clipRect)
+
+        if key is None and clipRect is None:
+            layer_path = self.parameterAsCompatibleSourceLayerPath(
+                parameters,
+                parameterName,
+                context,
+                ["shp"],
+                "shp",
+                feedback=feedback,
+            )
+            if not layer_path:
+                raise QgsProcessingException(self.tr("Unsupported file format"))
+            return layer_path
+
+        if key is not None:
+            layer_path = cache.lookup(key)
+            if layer_path is not None:
+                self.usedExports.append((cache, layer_path))
+                return layer_path
+            layer_path = cache.newEntryPath(key, parameterName + ".shp")
+        else:
+            layer_path = QgsProcessingUtils.generateTempFilename(parameterName + ".shp")
+
+        if source is None:
+            source = self.parameterAsSource(parameters, parameterName, context)
+        if source is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, parameterName)
+            )
+        try:
+            with self.trace.span("export vector input", parameter=parameterName):
+                completed = SagaVectorExport.writeShapefile(
+                    source, layer_path, context, feedback, clipRect
+                )
+        except Exception:
+            if key is not None:
+                cache.discard(layer_path)
+            raise
+        if key is not None:
+            if completed:
+                cache.commit(key, layer_path)
+                self.usedExports.append((cache, layer_path))
+            else:
+                cache.discard(layer_path)
+        return layer_path
+
+    def vectorExportKey(self, parameters, parameterName, context, clipRect=None):
+        """
+        Returns the export cache key for a vector input, or None if its
+        exports cannot be cached (e.g. it is not file based or has unsaved
+        edits) or it need not be exported
+        """
+        layer = self.parameterAsVectorLayer(parameters, parameterName, context)
+        if layer is None or layer.providerType() != "ogr" or layer.isModified():
+            return None
+
+        # selected features only, feature limit and filter of the input
+        definition = parameters.get(parameterName)
+        selection = None
+        feature_limit = -1
+        filter_expression = ""
+        if isinstance(definition, QgsProcessingFeatureSourceDefinition):
+            if definition.selectedFeaturesOnly:
+                selection = sorted(layer.selectedFeatureIds())
+            feature_limit = definition.featureLimit
+            filter_expression = getattr(definition, "filterExpression", "")
+
+        if (
+            SagaVectorExport.isShapefile(layer)
+            and selection is None
+            and feature_limit == -1
+            and not filter_expression
+            and clipRect is None
+        ):
+            # used as is
+            return None
+
+        fingerprint = SagaVectorExport.sourceFingerprint(layer.source())
+        if fingerprint is None:
+            return None
+        parts = [
+            "vector",
+            fingerprint,
+            layer.source(),
+            layer.subsetString(),
+            selection,
+            feature_limit,
+            filter_expression,
+            layer.featureCount(),
+        ]
+        if clipRect is not None:
+            parts.append(
+                [
+                    clipRect.xMinimum(),
+                    clipRect.xMaximum(),
+                    clipRect.yMinimum(),
+                    clipRect.yMaximum(),
+                ]
+            )
+        return SagaExportCache.makeKey(*parts)
+
+    def buildCommand(self, parameters, context, workspace):  # pylint: disable=too-many-statements,too-many-branches,too-many-locals
+        """
+        Builds the SAGA command for the algorithm.
+
+        Returns the command, the list of output layer files, a dictionary of
+        output name to output file, and a dictionary of temporary output
+        file to the requested output file for outputs with non-ascii paths.
+        """
         command = self.undecorated_group + ' "' + self.cmdname + '"'
         command += " " + " ".join(self.hardcoded_strings)
 
         for param in self.parameterDefinitions():
             if param.name() not in parameters or parameters[param.name()] is None:
                 continue
-            if param.isDestination():
+            if param.isDestination() or param.name() in (
+                self.THREADS,
+                self.STACK_BANDS,
+                self.ALIGN_REFERENCE,
+            ):
                 continue
 
             if isinstance(
@@ -324,15 +895,18 @@ class SagaAlgorithm(SagaAlgorithmBase):
                 else:
                     command += " -{} false".format(param.name().strip())
             elif isinstance(param, QgsProcessingParameterMatrix):
-                tempTableFile = getTempFilename("txt")
-                with open(tempTableFile, "w", encoding="utf-8") as f:
-                    f.write("\t".join(param.headers()) + "\n")
-                    values = self.parameterAsMatrix(parameters, param.name(), context)
-                    for i in range(0, len(values), 3):
-                        s = "{}\t{}\t{}\n".format(
-                            values[i], values[i + 1], values[i + 2]
+                tempTableFile = workspace.tempFilename("txt")
+                with self.trace.span("matrix table", parameter=param.name()):
+                    with open(tempTableFile, "w", encoding="utf-8") as f:
+                        f.write("\t".join(param.headers()) + "\n")
+                        values = self.parameterAsMatrix(
+                            parameters, param.name(), context
                         )
-                        f.write(s)
+                        for i in range(0, len(values), 3):
+                            s = "{}\t{}\t{}\n".format(
+                                values[i], values[i + 1], values[i + 2]
+                            )
+                            f.write(s)
                 command += ' -{} "{}"'.format(param.name(), tempTableFile)
             elif isinstance(param, QgsProcessingParameterExtent):
                 # 'We have to subtract/add half cell size, since SAGA is
@@ -387,6 +961,7 @@ class SagaAlgorithm(SagaAlgorithmBase):
         output_files = {}
         # If the user has entered an output file that has non-ascii chars, we use a different path with only ascii chars
         output_files_nonascii = {}
+        tiffOutput = None
         for out in self.destinationParameterDefinitions():
             filePath = self.parameterAsOutputLayer(parameters, out.name(), context)
             if isinstance(
@@ -407,9 +982,30 @@ class SagaAlgorithm(SagaAlgorithmBase):
                     output_files_nonascii[filePath] = nonAsciiFilePath
 
             output_files[out.name()] = filePath
+            if (
+                isinstance(out, QgsProcessingParameterRasterDestination)
+                and not isinstance(out, SagaImageOutputParam)
+                and SagaTiffOutput.isTiffPath(filePath)
+            ):
+                if tiffOutput is None:
+                    tiffOutput = SagaUtils.tiffOutput()
+                if tiffOutput.needsConversion():
+                    # SAGA writes a grid, converted to the GeoTIFF after the run
+                    gridPath = QgsProcessingUtils.generateTempFilename(
+                        out.name() + ".sgrd"
+                    )
+                    self.tiffOutputs[gridPath] = filePath
+                    output_layers[-1] = gridPath
+                    filePath = gridPath
             command += ' -{} "{}"'.format(out.name(), filePath)
-        commands.append(command)
 
+        return command, output_layers, output_files, output_files_nonascii
+
+    def postProcessingCommands(self, parameters, context):
+        """
+        Returns any additional commands to run after the algorithm's command
+        """
+        commands = []
         # special treatment for RGB algorithm
         # TODO: improve this and put this code somewhere else
         if self.cmdname == "RGB Composite":
@@ -424,42 +1020,7 @@ class SagaAlgorithm(SagaAlgorithmBase):
                             filename2, filename
                         )
                     )
-
-        # 3: Run SAGA
-        commands = self.editCommands(commands)
-        SagaUtils.createSagaBatchJobFileFromSagaCommands(commands)
-        loglines = [self.tr("SAGA execution commands")]
-        for line in commands:
-            feedback.pushCommandInfo(line)
-            loglines.append(line)
-        if ProcessingConfig.getSetting(SagaUtils.SAGA_LOG_COMMANDS):
-            QgsMessageLog.logMessage(
-                "\n".join(loglines), self.tr("Processing"), Qgis.MessageLevel.Info
-            )
-        SagaUtils.executeSaga(feedback)
-
-        if crs is not None:
-            for out in output_layers:
-                prjFile = os.path.splitext(out)[0] + ".prj"
-                with open(prjFile, "wt", encoding="utf-8") as f:
-                    f.write(crs.toWkt())
-
-        for old, new in output_files_nonascii.items():
-            oldFolder = os.path.dirname(old)
-            newFolder = os.path.dirname(new)
-            newName = os.path.splitext(os.path.basename(new))[0]
-            files = list(os.listdir(oldFolder))
-            for f in files:
-                ext = os.path.splitext(f)[1]
-                newPath = os.path.join(newFolder, newName + ext)
-                oldPath = os.path.join(oldFolder, f)
-                shutil.move(oldPath, newPath)
-
-        return {
-            o.name(): output_files[o.name()]
-            for o in self.outputDefinitions()
-            if o.name() in output_files
-        }
+        return commands
 
     def preProcessInputs(self):
         """
@@ -504,18 +1065,347 @@ class SagaAlgorithm(SagaAlgorithmBase):
                 break
         return cellsize
 
-    def exportRasterLayer(self, parameterName, layer):
+    def requestedThreads(self, parameters, context) -> int:
         """
-        Exports a raster layer
+        Returns the number of threads requested for this run, either through
+        the run's threads parameter or the provider setting, or 0 if the
+        job should get its share of the available cores
         """
-        global sessionExportedLayers  # pylint: disable=global-statement,global-variable-not-assigned
-        if layer.source() in sessionExportedLayers:
-            exportedLayer = sessionExportedLayers[layer.source()]
-            if os.path.exists(exportedLayer):
-                self.exportedLayers[parameterName] = exportedLayer
+        if parameters.get(self.THREADS) is not None:
+            threads = self.parameterAsInt(parameters, self.THREADS, context)
+            if threads > 0:
+                return threads
+        return SagaUtils.threadsSetting()
+
+    def tiledExecution(self, parameters, context, commands, outputs, workspace):
+        """
+        Returns the tiled execution for a run, or None if the run should not
+        be tiled.
+
+        Runs are tiled when tiled execution is enabled, the algorithm is
+        tileable, its raster inputs are larger than a tile, and its only
+        layer inputs and outputs are rasters.
+        """
+        tile_size = SagaUtils.tileSize()
+        if (
+            not tile_size
+            or self.tile_halo is None
+            or self.allow_nonmatching_grid_extents
+            or self.bandInputs
+            or len(commands) != 1
+            or not SagaGdalExport.available()
+        ):
+            return None
+
+        inputs = {}
+        for param in self.parameterDefinitions():
+            if param.isDestination():
+                continue
+            if param.name() not in parameters or parameters[param.name()] is None:
+                continue
+            if param.name() == self.ALIGN_REFERENCE:
+                continue
+            if isinstance(param, QgsProcessingParameterRasterLayer):
+                inputs[param.name()] = self.exportedLayers[param.name()]
+            elif isinstance(
+                param,
+                (
+                    QgsProcessingParameterFeatureSource,
+                    QgsProcessingParameterMultipleLayers,
+                    QgsProcessingParameterExtent,
+                ),
+            ):
                 return None
+        if not inputs:
+            return None
+
+        _, _, output_files, _ = outputs
+        # outputs converted to GeoTIFF after the run are mosaicked to the
+        # grids SAGA would have written
+        grids = {tiffPath: gridPath for gridPath, tiffPath in self.tiffOutputs.items()}
+        tile_outputs = {}
+        for out in self.destinationParameterDefinitions():
+            path = output_files.get(out.name())
+            if not path or not isinstance(path, str):
+                continue
+            if not isinstance(
+                out, QgsProcessingParameterRasterDestination
+            ) or isinstance(out, SagaImageOutputParam):
+                return None
+            tile_outputs[out.name()] = grids.get(path, path)
+        if not tile_outputs:
+            return None
+
+        size = SagaTiling.rasterSize(next(iter(inputs.values())))
+        if size is None or (size[0] <= tile_size and size[1] <= tile_size):
+            return None
+
+        halo = SagaTiling.halo(
+            self.tile_halo,
+            lambda name: self.parameterAsDouble(parameters, name, context),
+        )
+        tiles = SagaTiling.tiles(size[0], size[1], tile_size, halo)
+        return SagaTiledExecution(tiles, inputs, tile_outputs, workspace)
+
+    def bandExecution(self, parameters, context, commands, outputs, workspace):
+        """
+        Returns the per-band execution for a run with multiband inputs, or
+        None if the run has no multiband inputs
+        """
+        if not self.bandInputs:
+            return None
+
+        band_count = max(layer.bandCount() for layer in self.bandInputs.values())
+        stack = False
+        if parameters.get(self.STACK_BANDS) is not None:
+            stack = self.parameterAsBoolean(parameters, self.STACK_BANDS, context)
+
+        _, _, output_files, _ = outputs
+        band_outputs = {}
+        for out in self.destinationParameterDefinitions():
+            path = output_files.get(out.name())
+            if not path or not isinstance(path, str):
+                continue
+            if (
+                len(commands) != 1
+                or not isinstance(out, QgsProcessingParameterRasterDestination)
+                or isinstance(out, SagaImageOutputParam)
+            ):
+                raise QgsProcessingException(
+                    self.tr("Multiband layers are not supported by {}").format(
+                        self.displayName()
+                    )
+                )
+            if stack and not SagaTiffOutput.isTiffPath(path):
+                raise QgsProcessingException(
+                    self.tr(
+                        "Stacked outputs of multiband layers must be GeoTIFF "
+                        "(.tif) files"
+                    )
+                )
+            band_outputs[out.name()] = path
+        # GeoTIFF outputs are written from the bands' outputs instead
+        self.tiffOutputs = {
+            gridPath: tiffPath
+            for gridPath, tiffPath in self.tiffOutputs.items()
+            if tiffPath not in band_outputs.values()
+        }
+
+        execution = SagaBandExecution(
+            band_count,
+            {name: layer.source() for name, layer in self.bandInputs.items()},
+            band_outputs,
+            workspace,
+            stack,
+        )
+        self.bandOutputs = execution.bandOutputs()
+        return execution
 
-            del sessionExportedLayers[layer.source()]
+    def substitutedCommand(self, parameters, context, workspace, inputs, outputs):
+        """
+        Builds the SAGA command for part of a run (e.g. a tile or a band),
+        reading the given inputs and writing the given outputs in place of
+        the run's
+        """
+        exportedLayers = self.exportedLayers
+        tiffOutputs = self.tiffOutputs
+        self.exportedLayers = dict(exportedLayers)
+        self.exportedLayers.update(inputs)
+        self.tiffOutputs = {}
+        part_parameters = dict(parameters)
+        part_parameters.update(outputs)
+        try:
+            command, _, _, _ = self.buildCommand(part_parameters, context, workspace)
+        finally:
+            self.exportedLayers = exportedLayers
+            self.tiffOutputs = tiffOutputs
+        return command
+
+    def removeCanceledRunFiles(self, output_files, output_files_nonascii):
+        """
+        Deletes the partial outputs of a canceled run, and the intermediate
+        raster exports it created
+        """
+        for path in list(output_files.values()) + list(output_files_nonascii):
+            if isinstance(path, str):
+                SagaUtils.removeDataset(path)
+
+        for path in self.exportedFiles + list(self.tiffOutputs):
+            SagaUtils.removeDataset(path)
+        for paths in self.bandOutputs.values():
+            for path in paths:
+                SagaUtils.removeDataset(path)
+        cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+        if cache is not None:
+            cache.discardAll(self.pendingExports)
+        self.pendingExports.clear()
+
+    def releaseExports(self):
+        """
+        Releases the export cache entries pinned by the run, once its SAGA
+        commands no longer read them, and removes its uncommitted exports
+        """
+        for cache, path in self.usedExports:
+            cache.release(path)
+        self.usedExports = []
+        if self.pendingExports:
+            cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+            if cache is not None:
+                cache.discardAll(self.pendingExports)
+            self.pendingExports.clear()
+
+    def commitExports(self, feedback):
+        """
+        Adds the run's completed raster exports to the export cache
+        """
+        cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+        if cache is None:
+            return
+        cache.commitAll(self.pendingExports)
+        self.usedExports.extend((cache, path) for path in self.pendingExports.values())
+        self.pendingExports.clear()
+
+        statistics = cache.statistics()
+        feedback.pushDebugInfo(
+            self.tr(
+                "Raster export cache: {} hits, {} misses, {:.1f} of {:.1f} MiB used"
+            ).format(
+                statistics["hits"],
+                statistics["misses"],
+                statistics["size_bytes"] / 1024 / 1024,
+                statistics["budget_bytes"] / 1024 / 1024,
+            )
+        )
+
+    def rasterExportKey(self, layer, band=None, window=None, grid=None):
+        """
+        Returns the export cache key for a raster layer (or a window of its
+        cells, or the layer aligned to a grid), or None if the layer's
+        exports cannot be cached (e.g. it is not file based)
+        """
+        fingerprint = SagaExportCache.fileFingerprint(layer.source())
+        if fingerprint is None:
+            return None
+        parts = [
+            "raster",
+            fingerprint,
+            band,
+            self.RASTER_EXPORT_OPTIONS,
+            SagaUtils.getInstalledVersion(),
+        ]
+        if window is not None:
+            parts.append(list(window))
+        if grid is not None:
+            parts.append([grid.toList(), SagaUtils.alignResampling()])
+        return SagaExportCache.makeKey(*parts)
+
+    def canReadRasterDirectly(self, layer, source=None) -> bool:
+        """
+        Returns True if SAGA can read a raster layer's source (or the given
+        source, e.g. a clip of the layer) directly, so the layer need not
+        be exported
+        """
+        return (
+            SagaUtils.importExportOptimization()
+            and layer.providerType() == "gdal"
+            and SagaUtils.isDirectRasterSource(source or layer.source())
+        )
+
+    def canReadBandViews(self) -> bool:
+        """
+        Returns True if bands of multiband rasters can be passed to SAGA as
+        single band virtual rasters
+        """
+        return SagaGdalExport.available()
+
+    def exportBandViews(self, parameterName, layer):
+        """
+        Registers a multiband raster layer to be run per band. The layer is
+        not exported, its bands are read through virtual rasters instead.
+        """
+        if not self.canReadBandViews() or isinstance(
+            self.parameterDefinition(parameterName),
+            QgsProcessingParameterMultipleLayers,
+        ):
+            raise QgsProcessingException(
+                self.tr(
+                    "Input layer {0} has more than one band.\n"
+                    "Multiband layers are not supported by SAGA"
+                ).format(layer.name())
+            )
+        if self.alignGrid is not None and not self.alignGrid.matches(
+            SagaGrid.fromLayer(layer)
+        ):
+            raise QgsProcessingException(
+                self.tr(
+                    "Multiband input layer {0} is not on the reference grid.\n"
+                    "Multiband layers cannot be aligned to a reference grid"
+                ).format(layer.name())
+            )
+        for other in self.bandInputs.values():
+            if other.bandCount() != layer.bandCount():
+                raise QgsProcessingException(
+                    self.tr("Multiband input layers must have the same number of bands")
+                )
+        self.bandInputs[parameterName] = layer
+        self.exportedLayers[parameterName] = layer.source()
+        return None
+
+    def exportRasterLayer(self, parameterName, layer, clipRect=None):
+        """
+        Exports a raster layer, reusing a cached export of the layer when
+        one is available. With import/export optimizations enabled, rasters
+        which SAGA can read directly are passed to it as is.
+
+        With a clip rectangle (in the layer's CRS), only the window of the
+        layer covering the rectangle is exported, read through a virtual
+        raster of the window. Layers which are not on the grid inputs are
+        aligned to are exported through a virtual raster warped onto it.
+        """
+        if layer.bandCount() > 1:
+            return self.exportBandViews(parameterName, layer)
+
+        source = layer.source()
+        window = None
+        grid = None
+        if self.alignGrid is not None and not self.alignGrid.matches(
+            SagaGrid.fromLayer(layer)
+        ):
+            aligned = QgsProcessingUtils.generateTempFilename("aligned.vrt")
+            with self.trace.span("align raster input", parameter=parameterName):
+                self.alignGrid.writeWarpedView(
+                    source, aligned, SagaUtils.alignResampling()
+                )
+            source = aligned
+            grid = self.alignGrid
+        elif source.lower().endswith(("sdat", "sgrd")):
+            # SAGA grids (on the aligned grid) are used as is
+            self.exportedLayers[parameterName] = source[:-4] + "sgrd"
+            return None
+        elif (
+            clipRect is not None
+            and layer.providerType() == "gdal"
+            and SagaGdalExport.available()
+        ):
+            clipped = QgsProcessingUtils.generateTempFilename("clip.vrt")
+            with self.trace.span("clip raster input", parameter=parameterName):
+                window = SagaClipping.clipRaster(
+                    source,
+                    clipped,
+                    (
+                        clipRect.xMinimum(),
+                        clipRect.xMaximum(),
+                        clipRect.yMinimum(),
+                        clipRect.yMaximum(),
+                    ),
+                    SagaUtils.clipMargin(),
+                )
+            if window is not None:
+                source = clipped
+
+        if self.canReadRasterDirectly(layer, source):
+            self.exportedLayers[parameterName] = source
+            return None
 
         if layer:
             filename = layer.name()
@@ -528,23 +1418,97 @@ class SagaAlgorithm(SagaAlgorithmBase):
         if len(filename) == 0:
             filename = "layer"
 
-        destFilename = QgsProcessingUtils.generateTempFilename(filename + ".sgrd")
-        sessionExportedLayers[layer.source()] = destFilename
+        shared = SagaExportCache.makeKey(
+            layer.source(), window, grid.toList() if grid is not None else None
+        )
+        if shared in self.sharedExports:
+            # already exported for this run (or batch)
+            self.exportedLayers[parameterName] = self.sharedExports[shared]
+            return None
+
+        cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+        key = (
+            self.rasterExportKey(layer, window=window, grid=grid)
+            if cache is not None
+            else None
+        )
+        if key is not None:
+            if key in self.pendingExports:
+                # the same file, through a different source string
+                self.exportedLayers[parameterName] = self.pendingExports[key]
+                self.sharedExports[shared] = self.pendingExports[key]
+                return None
+
+            exportedLayer = cache.lookup(key)
+            if exportedLayer is not None:
+                self.usedExports.append((cache, exportedLayer))
+                self.exportedLayers[parameterName] = exportedLayer
+                self.sharedExports[shared] = exportedLayer
+                return None
+
+            destFilename = cache.newEntryPath(key, filename + ".sgrd")
+            self.pendingExports[key] = destFilename
+        else:
+            destFilename = QgsProcessingUtils.generateTempFilename(filename + ".sgrd")
+            self.exportedFiles.append(destFilename)
         self.exportedLayers[parameterName] = destFilename
+        self.sharedExports[shared] = destFilename
 
-        return 'io_gdal 0 -TRANSFORM 1 -RESAMPLING 3 -GRIDS "{}" -FILES "{}"'.format(
-            destFilename, layer.source()
+        command = 'io_gdal 0 {} -GRIDS "{}" -FILES "{}"'.format(
+            self.RASTER_EXPORT_OPTIONS, destFilename, source
+        )
+        if (
+            SagaUtils.rasterExportBackend() == SagaUtils.EXPORT_BACKEND_GDAL
+            and layer.providerType() == "gdal"
+        ):
+            # exported in-process, with the io_gdal command as a fallback
+            self.gdalExports[command] = (source, destFilename)
+        return command
+
+    def rasterInputMetadata(self, parameters, name, context) -> list:
+        """
+        Returns the metadata of the rasters of a raster (or multiple raster)
+        parameter, read from the rasters' headers where they are files, so
+        that they need not be loaded as layers
+        """
+        values = parameters[name]
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        multiple = isinstance(
+            self.parameterDefinition(name), QgsProcessingParameterMultipleLayers
         )
 
+        metadata = []
+        for value in values:
+            if isinstance(value, str) and os.path.isfile(value):
+                header = SagaRasterMetadata.forPath(value)
+                if header is not None:
+                    metadata.append(header)
+                    continue
+
+            if not multiple:
+                layer = self.parameterAsRasterLayer(parameters, name, context)
+            elif isinstance(value, str):
+                layer = QgsProcessingUtils.mapLayerFromString(value, context)
+            else:
+                layer = value
+            if isinstance(layer, QgsRasterLayer):
+                metadata.append(SagaRasterMetadata.forLayer(layer))
+        return metadata
+
     def checkParameterValues(self, parameters, context):  # pylint: disable=missing-docstring
         """
-        We check that there are no multiband layers, which are not
-        supported by SAGA, and that raster layers have the same grid extent
+        We check that multiband layers can be run per band, and that raster
+        layers have the same grid extent unless they are aligned to a
+        reference grid
         """
-        extent = None
+        grid = None
+        band_count = None
         raster_layer_params = []
         for param in self.parameterDefinitions():
-            if param not in parameters or parameters[param.name()] is None:
+            if param.name() not in parameters or parameters[param.name()] is None:
+                continue
+            if param.name() == self.ALIGN_REFERENCE:
                 continue
 
             if isinstance(param, QgsProcessingParameterRasterLayer):
@@ -553,24 +1517,33 @@ class SagaAlgorithm(SagaAlgorithmBase):
                 isinstance(param, QgsProcessingParameterMultipleLayers)
                 and param.layerType() == QgsProcessing.SourceType.TypeRaster
             ):
-                raster_layer_params.extend(param.name())
+                raster_layer_params.append(param.name())
 
+        check_grids = not self.allow_nonmatching_grid_extents and not self.alignsGrids(
+            parameters
+        )
         for layer_param in raster_layer_params:
-            layer = self.parameterAsRasterLayer(parameters, layer_param, context)
-
-            if layer is None:
-                continue
-            if layer.bandCount() > 1:
-                return False, self.tr(
-                    "Input layer {0} has more than one band.\n"
-                    "Multiband layers are not supported by SAGA"
-                ).format(layer.name())
-            if not self.allow_nonmatching_grid_extents:
-                if extent is None:
-                    extent = (layer.extent(), layer.height(), layer.width())
-                else:
-                    extent2 = (layer.extent(), layer.height(), layer.width())
-                    if extent != extent2:
+            for metadata in self.rasterInputMetadata(parameters, layer_param, context):
+                if metadata.band_count > 1:
+                    # multiband rasters are run per band, where SAGA can read
+                    # the bands' virtual rasters
+                    if not self.canReadBandViews() or not isinstance(
+                        self.parameterDefinition(layer_param),
+                        QgsProcessingParameterRasterLayer,
+                    ):
+                        return False, self.tr(
+                            "Input layer {0} has more than one band.\n"
+                            "Multiband layers are not supported by SAGA"
+                        ).format(metadata.name)
+                    if band_count is not None and band_count != metadata.band_count:
+                        return False, self.tr(
+                            "Multiband input layers must have the same number of bands"
+                        )
+                    band_count = metadata.band_count
+                if check_grids:
+                    if grid is None:
+                        grid = metadata.grid
+                    elif not grid.matches(metadata.grid):
                         return False, self.tr(
                             "Input layers do not have the same grid extent."
                         )
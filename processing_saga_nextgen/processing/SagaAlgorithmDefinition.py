@@ -0,0 +1,94 @@
+"""
+Shared, read-only definitions of SAGA algorithms
+"""
+
+import threading
+
+from qgis.PyQt.QtCore import QCoreApplication
+
+from .SagaDescriptionIndex import SagaDescriptionIndex
+from .SagaNameDecorator import decoratedAlgorithmName, decoratedGroupName
+from .SagaParameters import Parameters
+
+
+class SagaAlgorithmDefinition:
+    """
+    The parsed definition of a SAGA algorithm.
+
+    A single definition is shared by every SagaAlgorithm instance created
+    from the same description file, so that creating new instances (e.g. for
+    each row of a batch run or each step of a model) does not re-read the
+    description file or re-parse its parameter definitions. Definitions
+    must be treated as read-only.
+    """
+
+    _definitions = {}
+    _lock = threading.Lock()
+
+    VALID_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789:"
+
+    def __init__(self, description_file: str, description: dict):
+        self.description_file = description_file
+        # cmdname is the name of the algorithm in SAGA, that is, the name to use to call it in the console
+        self.cmdname = description["cmdname"]
+
+        name = decoratedAlgorithmName(description["name"])
+        self.display_name = QCoreApplication.translate("SAGAAlgorithm", str(name))
+        self.name = "".join(
+            c for c in name.lower() if c in SagaAlgorithmDefinition.VALID_CHARS
+        )
+
+        self.known_issues = description["known_issues"]
+
+        self.undecorated_group = description["group"]
+        group = decoratedGroupName(self.undecorated_group)
+        self.group = QCoreApplication.translate("SAGAAlgorithm", group)
+        self.group_id = "".join(
+            c for c in group.lower() if c in SagaAlgorithmDefinition.VALID_CHARS
+        )
+
+        self.hardcoded_strings = tuple(description["hardcoded_strings"])
+        self.allow_nonmatching_grid_extents = description["allow_unmatching"]
+        # halo specification of algorithms which can be run in tiles, or None
+        self.tile_halo = description["tile_halo"]
+        self.parameter_lines = tuple(description["parameters"])
+        self._parameters = None
+
+    @staticmethod
+    def definition(description_file: str, description: dict = None):
+        """
+        Returns the shared definition for a description file.
+
+        If a parsed description is specified it replaces any existing
+        definition for the file, otherwise an existing definition is reused
+        and the file is only parsed if no definition exists yet.
+        """
+        with SagaAlgorithmDefinition._lock:
+            if description is None:
+                existing = SagaAlgorithmDefinition._definitions.get(description_file)
+                if existing is not None:
+                    return existing
+                description = SagaDescriptionIndex.parse_description_file(
+                    description_file
+                )
+
+            definition = SagaAlgorithmDefinition(description_file, description)
+            SagaAlgorithmDefinition._definitions[description_file] = definition
+            return definition
+
+    def parameters(self) -> tuple:
+        """
+        Returns the prototype parameter definitions for the algorithm,
+        creating them on first use.
+
+        The prototypes are shared and must not be added to an algorithm
+        directly, add clones of them instead.
+        """
+        if self._parameters is None:
+            with SagaAlgorithmDefinition._lock:
+                if self._parameters is None:
+                    self._parameters = tuple(
+                        Parameters.create_parameter_from_line(line)
+                        for line in self.parameter_lines
+                    )
+        return self._parameters
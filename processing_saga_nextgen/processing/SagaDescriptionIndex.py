@@ -0,0 +1,177 @@
+"""
+Persistent index of pre-parsed SAGA algorithm description files
+"""
+
+import json
+import os
+import time
+
+from processing.tools.system import userFolder
+
+from .SagaParameters import Parameters
+
+
+class SagaDescriptionIndex:
+    """
+    Stores the parsed content of every SAGA description file in a single
+    on-disk index, so that the provider does not have to open and parse
+    hundreds of small files on each startup.
+
+    The index is validated against the modification time and size of each
+    description file, and stale or missing entries are re-parsed and written
+    back automatically.
+    """
+
+    # Bump whenever the parsed structure changes, to force a rebuild
+    INDEX_VERSION = 2
+
+    INDEX_FILENAME = "saga_nextgen_description_index.json"
+
+    def __init__(self, folder: str, index_file: str = None):
+        self.folder = os.path.abspath(folder)
+        self.index_file = index_file or os.path.join(
+            userFolder(), SagaDescriptionIndex.INDEX_FILENAME
+        )
+        self.errors = {}
+
+    @staticmethod
+    def parse_description_file(path: str) -> dict:
+        """
+        Parses a SAGA description file, returning a dictionary of the raw
+        (undecorated) algorithm characteristics and parameter definition lines
+        """
+        description = {
+            "name": "",
+            "cmdname": "",
+            "known_issues": False,
+            "group": "",
+            "hardcoded_strings": [],
+            "allow_unmatching": False,
+            "tile_halo": None,
+            "parameters": [],
+        }
+        with open(path, encoding="utf-8") as lines:
+            line = lines.readline().strip("\n").strip()
+            if "|" in line:
+                tokens = line.split("|")
+                description["name"] = tokens[0]
+                # cmdname is the name of the algorithm in SAGA, that is, the name to use to call it in the console
+                description["cmdname"] = tokens[1]
+            else:
+                description["name"] = line
+                description["cmdname"] = line
+
+            line = lines.readline().strip("\n").strip()
+            if line == "##known_issues":
+                description["known_issues"] = True
+                line = lines.readline().strip("\n").strip()
+
+            description["group"] = line
+
+            line = lines.readline().strip("\n").strip()
+            while line != "":
+                if line.startswith("Hardcoded"):
+                    description["hardcoded_strings"].append(line[len("Hardcoded|") :])
+                elif Parameters.is_parameter_line(line):
+                    description["parameters"].append(line)
+                elif line.startswith("AllowUnmatching"):
+                    description["allow_unmatching"] = True
+                elif line.startswith("Tileable"):
+                    description["tile_halo"] = line[len("Tileable|") :] or "0"
+                line = lines.readline().strip("\n").strip()
+
+        return description
+
+    def _read_index(self) -> dict:
+        """
+        Reads the stored index, returning an empty dictionary if it is
+        missing, unreadable or was created by a different index version
+        """
+        try:
+            with open(self.index_file, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if (
+            not isinstance(index, dict)
+            or index.get("version") != SagaDescriptionIndex.INDEX_VERSION
+            or index.get("folder") != self.folder
+        ):
+            return {}
+
+        return index.get("files", {})
+
+    def _write_index(self, files: dict):
+        """
+        Atomically replaces the stored index
+        """
+        index = {
+            "version": SagaDescriptionIndex.INDEX_VERSION,
+            "folder": self.folder,
+            "files": files,
+        }
+        temp_file = "{}.{}.tmp".format(self.index_file, os.getpid())
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(temp_file, self.index_file)
+        except OSError:
+            # the index is only an optimisation -- a read-only profile folder
+            # just means we parse the description files again next time
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
+    def descriptions(self, profile=None) -> dict:
+        """
+        Returns a dictionary of description file name to parsed description,
+        rebuilding any stale entries in the stored index.
+
+        Files which could not be parsed are omitted from the result, and the
+        corresponding errors are available from the errors attribute.
+
+        If a SagaStartupProfile is specified, the time taken to parse each
+        stale description file is recorded in it.
+        """
+        self.errors = {}
+        stored = self._read_index()
+        files = {}
+        changed = False
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith("txt") or not entry.is_file():
+                    continue
+
+                stat = entry.stat()
+                fingerprint = [stat.st_mtime_ns, stat.st_size]
+                cached = stored.get(entry.name)
+                if cached is not None and cached.get("fingerprint") == fingerprint:
+                    files[entry.name] = cached
+                    continue
+
+                changed = True
+                start = time.perf_counter()
+                try:
+                    description = SagaDescriptionIndex.parse_description_file(
+                        entry.path
+                    )
+                except Exception as e:  # pylint: disable=broad-except
+                    self.errors[entry.name] = str(e)
+                    continue
+                finally:
+                    if profile is not None:
+                        profile.record_description(
+                            entry.name, time.perf_counter() - start
+                        )
+
+                files[entry.name] = {
+                    "fingerprint": fingerprint,
+                    "description": description,
+                }
+
+        if changed or len(files) != len(stored):
+            self._write_index(files)
+
+        return {name: files[name]["description"] for name in sorted(files.keys())}
@@ -18,7 +18,11 @@
 import pathlib
 
 from qgis.PyQt.QtCore import QCoreApplication
-from qgis.core import QgsProcessingParameterRasterDestination, QgsProcessingParameters
+from qgis.core import (
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterRasterDestination,
+    QgsProcessingParameters,
+)
 from processing.core.parameters import getParameterFromString
 
 
@@ -40,7 +44,14 @@ class SagaImageOutputParam(QgsProcessingParameterRasterDestination):
         return ["tif"]
 
     def clone(self):
-        copy = SagaImageOutputParam(self.name(), self.description())
+        copy = SagaImageOutputParam(
+            self.name(),
+            self.description(),
+            self.defaultValue(),
+            bool(self.flags() & QgsProcessingParameterDefinition.Flag.FlagOptional),
+            self.createByDefault(),
+        )
+        copy.setFlags(self.flags())
         return copy
 
     def createFileFilter(self):
@@ -26,10 +26,6 @@ from qgis.core import (
 from processing_saga_nextgen.processing.utils import SagaUtils
 from .SagaAlgorithmBase import SagaAlgorithmBase
 
-pluginPath = os.path.normpath(
-    os.path.join(os.path.split(os.path.dirname(__file__))[0], os.pardir)
-)
-
 
 class SplitRGBBands(SagaAlgorithmBase):
     """
@@ -107,7 +103,18 @@ class SplitRGBBands(SagaAlgorithmBase):
             % (lib, temp, trailing, b)
         )
 
-        SagaUtils.createSagaBatchJobFileFromSagaCommands(commands)
-        SagaUtils.executeSaga(feedback)
+        workspace = SagaUtils.createJobWorkspace()
+        try:
+            SagaUtils.createSagaBatchJobFileFromSagaCommands(commands, workspace)
+            completed = SagaUtils.executeSaga(feedback, workspace)
+        finally:
+            workspace.cleanup()
+
+        if not completed:
+            for path in [r, g, b] + [
+                "{}_{}{}.sgrd".format(temp, trailing, band) for band in range(1, 4)
+            ]:
+                SagaUtils.removeDataset(path)
+            return {}
 
         return {self.R: r, self.G: g, self.B: b}
@@ -0,0 +1,149 @@
+"""
+Resource accounting for SAGA executions
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+
+
+class SagaCommandRun:
+    """
+    The outcome of running a single SAGA batch job: its console output,
+    whether it was canceled, and the resources it used.
+
+    CPU times and peak memory are only available where the process can be
+    waited for with os.wait4 (i.e. not on Windows), and are None otherwise.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self.console = []
+        self.canceled = False
+        self.return_code = None
+        self.wall_seconds = 0
+        self.user_seconds = None
+        self.system_seconds = None
+        self.peak_rss_bytes = None
+        self.thread_id = threading.get_ident()
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        """
+        Records the run's wall time
+        """
+        self.wall_seconds = time.perf_counter() - self.start_time
+
+    def setUsage(self, rusage):
+        """
+        Records the resource usage returned by os.wait4 for the run's process
+        tree
+        """
+        self.user_seconds = rusage.ru_utime
+        self.system_seconds = rusage.ru_stime
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        if platform.system() == "Darwin":
+            self.peak_rss_bytes = rusage.ru_maxrss
+        else:
+            self.peak_rss_bytes = rusage.ru_maxrss * 1024
+
+    def name(self) -> str:
+        """
+        Returns a short name for the command, i.e. its tool library and tool
+        """
+        return " ".join(self.command.split(" ")[:2])
+
+    def toDict(self) -> dict:
+        """
+        Returns the run as a JSON serializable dictionary
+        """
+        return {
+            "command": self.command,
+            "canceled": self.canceled,
+            "return_code": self.return_code,
+            "wall_seconds": self.wall_seconds,
+            "user_seconds": self.user_seconds,
+            "system_seconds": self.system_seconds,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+    def summary(self) -> str:
+        """
+        Returns a human readable summary of the run's resource usage
+        """
+        text = "{}: {:.2f}s".format(self.name(), self.wall_seconds)
+        if self.user_seconds is not None:
+            text += ", CPU {:.2f}s user + {:.2f}s system".format(
+                self.user_seconds, self.system_seconds
+            )
+        if self.peak_rss_bytes is not None:
+            text += ", peak memory {:.1f} MiB".format(self.peak_rss_bytes / 1024 / 1024)
+        if self.canceled:
+            text += " (canceled)"
+        return text
+
+
+class SagaRunSummary:
+    """
+    A machine readable summary of an algorithm execution, listing the
+    resources used by each of its SAGA commands.
+
+    If the SAGANG_RUN_SUMMARY environment variable is set to the path of a
+    file, each execution's summary is appended to it as a line of JSON.
+    """
+
+    ENVIRONMENT_VARIABLE = "SAGANG_RUN_SUMMARY"
+
+    def __init__(self, algorithm_id: str):
+        self.algorithm_id = algorithm_id
+        self.runs = []
+
+    def add(self, runs):
+        """
+        Adds command runs to the summary
+        """
+        self.runs.extend(runs)
+
+    def toDict(self) -> dict:
+        """
+        Returns the summary as a JSON serializable dictionary
+        """
+
+        def total(attribute):
+            values = [getattr(run, attribute) for run in self.runs]
+            if not values or any(value is None for value in values):
+                return None
+            return sum(values)
+
+        peak = [run.peak_rss_bytes for run in self.runs]
+        return {
+            "algorithm": self.algorithm_id,
+            "commands": [run.toDict() for run in self.runs],
+            "total": {
+                "wall_seconds": sum(run.wall_seconds for run in self.runs),
+                "user_seconds": total("user_seconds"),
+                "system_seconds": total("system_seconds"),
+                "peak_rss_bytes": max(peak) if peak and None not in peak else None,
+            },
+        }
+
+    def lines(self) -> list:
+        """
+        Returns a human readable summary line for each command
+        """
+        return [run.summary() for run in self.runs]
+
+    def write(self):
+        """
+        Appends the summary to the file set through the environment, if any
+        """
+        path = os.environ.get(SagaRunSummary.ENVIRONMENT_VARIABLE, "").strip()
+        if not path:
+            return
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.toDict()) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,127 @@
+"""
+Alignment of raster inputs to a common grid
+"""
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import QgsProcessingException
+
+
+class SagaGrid:
+    """
+    A raster grid system: its extent, size in cells and CRS.
+
+    SAGA tools without the AllowUnmatching flag require all of their raster
+    inputs to share a grid system. When grid alignment is enabled, inputs
+    on another grid are presented to SAGA as virtual warped rasters
+    resampled onto a reference grid, so each is only resampled once, as
+    it is exported, rather than warped to a full copy beforehand.
+    """
+
+    # resampling setting options, as GDAL resampling algorithms
+    RESAMPLING = ["near", "bilinear", "cubic", "cubicspline"]
+
+    # fraction of a cell by which matching grids' extents may differ, e.g.
+    # from the limited precision of .sgrd headers
+    TOLERANCE = 1e-3
+
+    def __init__(
+        self,
+        xmin: float,
+        xmax: float,
+        ymin: float,
+        ymax: float,
+        width: int,
+        height: int,
+        crs: str = "",
+    ):
+        self.xmin = xmin
+        self.xmax = xmax
+        self.ymin = ymin
+        self.ymax = ymax
+        self.width = width
+        self.height = height
+        # an authority identifier (e.g. EPSG:2056) or WKT definition
+        self.crs = crs
+
+    @staticmethod
+    def fromLayer(layer) -> "SagaGrid":
+        """
+        Returns the grid of a raster layer
+        """
+        extent = layer.extent()
+        crs = layer.crs()
+        return SagaGrid(
+            extent.xMinimum(),
+            extent.xMaximum(),
+            extent.yMinimum(),
+            extent.yMaximum(),
+            layer.width(),
+            layer.height(),
+            crs.authid() or crs.toWkt(),
+        )
+
+    def cellSize(self) -> tuple:
+        """
+        Returns the grid's cell width and height
+        """
+        return (
+            (self.xmax - self.xmin) / self.width,
+            (self.ymax - self.ymin) / self.height,
+        )
+
+    def matches(self, other: "SagaGrid") -> bool:
+        """
+        Returns True if another grid is the same grid system
+        """
+        if (
+            self.width != other.width
+            or self.height != other.height
+            or self.crs != other.crs
+        ):
+            return False
+        cell_width, cell_height = self.cellSize()
+        return (
+            abs(self.xmin - other.xmin) <= cell_width * SagaGrid.TOLERANCE
+            and abs(self.xmax - other.xmax) <= cell_width * SagaGrid.TOLERANCE
+            and abs(self.ymin - other.ymin) <= cell_height * SagaGrid.TOLERANCE
+            and abs(self.ymax - other.ymax) <= cell_height * SagaGrid.TOLERANCE
+        )
+
+    def toList(self) -> list:
+        """
+        Returns the grid as a list, e.g. for export cache keys
+        """
+        return [
+            self.xmin,
+            self.xmax,
+            self.ymin,
+            self.ymax,
+            self.width,
+            self.height,
+            self.crs,
+        ]
+
+    def writeWarpedView(self, source: str, destination: str, resampling: str):
+        """
+        Writes a virtual raster of a source raster resampled onto the grid.
+        The resampling only happens when the virtual raster is read.
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        output = gdal.Warp(
+            destination,
+            source,
+            format="VRT",
+            outputBounds=(self.xmin, self.ymin, self.xmax, self.ymax),
+            width=self.width,
+            height=self.height,
+            dstSRS=self.crs or None,
+            resampleAlg=resampling,
+        )
+        if output is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaGrid", "Could not align {} to the reference grid: {}"
+                ).format(source, gdal.GetLastErrorMsg())
+            )
+        output = None
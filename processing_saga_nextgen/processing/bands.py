@@ -0,0 +1,201 @@
+"""
+Per-band execution of SAGA tools on multiband rasters
+"""
+
+import contextlib
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import QgsProcessingException
+
+from .tiffoutput import SagaTiffOutput
+from .tiling import SagaTiling
+from .utils import SagaUtils
+
+
+class SagaBandExecution:
+    """
+    Runs a SAGA command once for each band of its multiband inputs.
+
+    SAGA grids have a single band, so each band of a multiband input is
+    presented to SAGA as a single band virtual raster referencing the
+    band, without copying it. The bands run in parallel saga_cmd processes.
+    Each band's outputs are either written next to the requested output
+    (e.g. slope_band2.sdat), or stacked into the requested output as a
+    multiband GeoTIFF once every band has finished.
+
+    Single band inputs of the same run are used as is for every band.
+    """
+
+    def __init__(
+        self,
+        band_count: int,
+        inputs: dict,
+        outputs: dict,
+        workspace,
+        stack: bool = False,
+        tiff_output=None,
+    ):
+        """
+        inputs is a dictionary of input parameter name to the source of a
+        multiband raster, and outputs a dictionary of output parameter
+        name to the requested output path
+        """
+        self.band_count = band_count
+        self.inputs = inputs
+        self.outputs = outputs
+        self.workspace = workspace
+        self.stack = stack
+        self.tiff_output = tiff_output or SagaUtils.tiffOutput()
+
+    @staticmethod
+    def bandPath(path: str, band: int) -> str:
+        """
+        Returns the path of a band's output, for unstacked outputs
+        """
+        base, extension = os.path.splitext(path)
+        return "{}_band{}{}".format(base, band, extension)
+
+    def bandOutputs(self) -> dict:
+        """
+        Returns a dictionary of output parameter name to the list of paths
+        of each band's output, or an empty dictionary for stacked outputs
+        """
+        if self.stack:
+            return {}
+        return {
+            name: [
+                SagaBandExecution.bandPath(path, band)
+                for band in range(1, self.band_count + 1)
+            ]
+            for name, path in self.outputs.items()
+        }
+
+    @staticmethod
+    def writeBandView(source: str, destination: str, band: int):
+        """
+        Writes a single band virtual raster referencing a band of a source
+        raster
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        output = gdal.Translate(destination, source, format="VRT", bandList=[band])
+        if output is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaBandExecution", "Could not read band {} of {}: {}"
+                ).format(band, source, gdal.GetLastErrorMsg())
+            )
+        output = None
+
+    def prepareBand(self, band: int):
+        """
+        Writes a band's input views, returning dictionaries of parameter name
+        to the band's input and output paths
+        """
+        band_inputs = {}
+        for name, source in self.inputs.items():
+            band_inputs[name] = self.workspace.tempFilename("vrt")
+            SagaBandExecution.writeBandView(source, band_inputs[name], band)
+        band_outputs = {
+            name: self.workspace.tempFilename("sgrd") for name in self.outputs
+        }
+        return band_inputs, band_outputs
+
+    def summary(self) -> str:
+        """
+        Returns a description of the execution for the log
+        """
+        return QCoreApplication.translate(
+            "SagaBandExecution", "Running SAGA for each of {} bands"
+        ).format(self.band_count)
+
+    def _deliverBand(self, band: int, band_outputs: dict):
+        """
+        Moves (or for GeoTIFF outputs, converts) a finished band's outputs
+        to their final paths
+        """
+        for name, path in self.outputs.items():
+            destination = SagaBandExecution.bandPath(path, band)
+            if SagaTiffOutput.isTiffPath(destination):
+                error = self.tiff_output.translate(
+                    SagaTiling.gdalPath(band_outputs[name]), destination
+                )
+                if error is not None:
+                    raise QgsProcessingException(
+                        QCoreApplication.translate(
+                            "SagaBandExecution", "Could not write {}: {}"
+                        ).format(destination, error)
+                    )
+                SagaUtils.removeDataset(band_outputs[name])
+            else:
+                SagaUtils.moveDataset(band_outputs[name], destination)
+
+    def _stackBands(self, outputs: dict):
+        """
+        Stacks every band's outputs into the requested multiband outputs
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        for name, path in self.outputs.items():
+            vrt = self.workspace.tempFilename("vrt")
+            stacked = gdal.BuildVRT(
+                vrt,
+                [
+                    SagaTiling.gdalPath(outputs[band][name])
+                    for band in range(1, self.band_count + 1)
+                ],
+                separate=True,
+            )
+            error = None
+            if stacked is None:
+                error = gdal.GetLastErrorMsg()
+            else:
+                stacked = None
+                error = self.tiff_output.translate(vrt, path)
+            if error is not None:
+                raise QgsProcessingException(
+                    QCoreApplication.translate(
+                        "SagaBandExecution", "Could not write {}: {}"
+                    ).format(path, error)
+                )
+
+    def run(self, build_command, feedback, threads: int = 0):
+        """
+        Runs the bands, using build_command(band_inputs, band_outputs) to
+        build each band's command. Returns a tuple of whether execution
+        completed (i.e. was not canceled) and the list of SagaCommandRun
+        for the bands.
+        """
+        commands = {}
+        outputs = {}
+        for band in range(1, self.band_count + 1):
+            band_inputs, outputs[band] = self.prepareBand(band)
+            commands[band] = build_command(band_inputs, outputs[band])
+
+        runs = []
+        with contextlib.closing(
+            SagaUtils.executeParallelCommands(
+                commands, feedback, self.workspace, threads, "saga_band"
+            )
+        ) as results:
+            for done, (band, run) in enumerate(results, start=1):
+                runs.append(run)
+                if run.canceled or feedback.isCanceled():
+                    continue
+                for name in self.outputs:
+                    if not os.path.exists(outputs[band][name]):
+                        raise QgsProcessingException(
+                            QCoreApplication.translate(
+                                "SagaBandExecution", "SAGA failed on band {}:\n{}"
+                            ).format(band, "\n".join(run.console))
+                        )
+                if not self.stack:
+                    self._deliverBand(band, outputs[band])
+                feedback.setProgress(100 * done / self.band_count)
+
+        if feedback.isCanceled():
+            return False, runs
+        if self.stack:
+            self._stackBands(outputs)
+        return True, runs
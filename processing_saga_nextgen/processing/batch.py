@@ -0,0 +1,362 @@
+"""
+Batch execution of a SAGA algorithm over many parameter sets
+"""
+
+import concurrent.futures
+import os
+import time
+
+from qgis.core import QgsProcessingContext, QgsProcessingFeedback
+
+from .exportcache import SagaExportCache
+from .gdalexport import SagaGdalExport
+from .profiling import SagaTrace
+from .scheduler import SagaCoreScheduler
+from .utils import SagaUtils
+
+
+class SagaBatchResult:
+    """
+    The result of running one item of a batch
+    """
+
+    def __init__(self, index: int, parameters: dict):
+        self.index = index
+        self.parameters = parameters
+        self.results = None
+        self.error = None
+        self.console = []
+        self.seconds = 0
+        self.usage = None
+
+    def succeeded(self) -> bool:
+        """
+        Returns True if the item completed successfully
+        """
+        return self.error is None and self.results is not None
+
+
+class SagaBatchExecutor:
+    """
+    Runs a SAGA algorithm over many sets of parameters.
+
+    Running items one at a time through processAlgorithm repeats the version
+    check, exports and job setup for every item, and runs everything
+    serially. Instead, the executor:
+
+    - builds the commands for all items up front, exporting each distinct
+      input raster only once across the whole batch
+    - runs all the exports as one concurrent import phase
+    - runs the items' commands on a bounded pool of workers, sharing the
+      cores between the running items
+
+    Results are streamed as each item finishes, e.g.:
+
+        executor = SagaBatchExecutor(alg, context, feedback)
+        for result in executor.run(parameter_sets):
+            ...
+        print(executor.statistics())
+    """
+
+    def __init__(self, algorithm, context=None, feedback=None, max_workers: int = None):
+        self.algorithm = algorithm
+        self.context = context if context is not None else QgsProcessingContext()
+        self.feedback = feedback if feedback is not None else QgsProcessingFeedback()
+        self.max_workers = max_workers or SagaCoreScheduler.availableCores()
+        self.items = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.seconds = 0
+        self.trace = SagaTrace(None)
+        self._pending_exports = {}
+        self._shared_exports = {}
+        self._used_exports = []
+        self._exported_files = []
+
+    def statistics(self) -> dict:
+        """
+        Returns statistics for the last batch run
+        """
+        return {
+            "items": self.items,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "seconds": self.seconds,
+            "items_per_second": self.items / self.seconds if self.seconds else 0,
+        }
+
+    def run(self, parameter_sets):
+        """
+        Runs the algorithm for each dictionary of parameters, yielding a
+        SagaBatchResult for each item as it finishes. Items which fail are
+        reported through the result's error, and do not stop the batch.
+        """
+        parameter_sets = list(parameter_sets)
+        self.items = len(parameter_sets)
+        self.succeeded = 0
+        self.failed = 0
+        start = time.perf_counter()
+
+        self.trace = SagaTrace.for_run("batch " + self.algorithm.id())
+        with self.trace.span("version check"):
+            self.algorithm.checkInstalledVersion(self.feedback)
+
+        # export cache key to path for the batch's exports, which run before
+        # any of its items, so later items reuse earlier items' exports
+        self._pending_exports = {}
+        # raster source to exported path for the batch's exports, used
+        # whether or not the export cache is enabled
+        self._shared_exports = {}
+        # (cache, path) of the export cache entries pinned by the batch,
+        # released once all of its items ran
+        self._used_exports = []
+        # temporary exports of inputs which are not cached, removed once all
+        # of the batch's items ran
+        self._exported_files = []
+        workspace = SagaUtils.createJobWorkspace()
+        try:
+            items = []
+            for index, parameters in enumerate(parameter_sets):
+                if self.feedback.isCanceled():
+                    break
+                with self.trace.span("prepare item", "batch", item=index):
+                    item = self._prepareItem(index, parameters, workspace)
+                if item.error is not None:
+                    self._finished(item, start)
+                    yield item.result
+                else:
+                    items.append(item)
+
+            yield from self._runItems(items, workspace, start)
+        finally:
+            workspace.cleanup()
+            for cache, path in self._used_exports:
+                cache.release(path)
+            self._used_exports = []
+            if self._pending_exports:
+                # the batch stopped before its exports ran
+                cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+                if cache is not None:
+                    cache.discardAll(self._pending_exports)
+                self._pending_exports = {}
+            for path in self._exported_files:
+                SagaUtils.removeDataset(path)
+            self._exported_files = []
+            self.trace.finish()
+            self.seconds = time.perf_counter() - start
+            self.feedback.pushInfo(
+                self.algorithm.tr(
+                    "Batch of {} items: {} succeeded, {} failed, {:.2f} items/s"
+                ).format(
+                    self.items,
+                    self.succeeded,
+                    self.failed,
+                    self.statistics()["items_per_second"],
+                )
+            )
+
+    def _prepareItem(self, index, parameters, workspace):
+        """
+        Exports an item's inputs and builds its commands
+        """
+        item = _BatchItem(index, parameters)
+        try:
+            item.algorithm = self.algorithm.create()
+            item.algorithm.pendingExports = dict(self._pending_exports)
+            item.algorithm.sharedExports = dict(self._shared_exports)
+            ok, message = item.algorithm.checkParameterValues(parameters, self.context)
+            if not ok:
+                raise ValueError(message)
+            item.import_commands, item.commands, item.outputs = (
+                item.algorithm.prepareCommands(
+                    parameters, self.context, self.feedback, workspace
+                )
+            )
+            if item.algorithm.bandInputs:
+                raise ValueError(
+                    self.algorithm.tr(
+                        "Multiband layers are not supported in batch runs"
+                    )
+                )
+            self._pending_exports.update(item.algorithm.pendingExports)
+            self._shared_exports.update(item.algorithm.sharedExports)
+            self._used_exports.extend(item.algorithm.usedExports)
+            self._exported_files.extend(item.algorithm.exportedFiles)
+        except Exception as e:  # pylint: disable=broad-except
+            item.error = str(e)
+            if item.algorithm is not None:
+                self._used_exports.extend(item.algorithm.usedExports)
+                self._exported_files.extend(item.algorithm.exportedFiles)
+                cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+                if cache is not None:
+                    cache.discardAll(
+                        {
+                            key: path
+                            for key, path in item.algorithm.pendingExports.items()
+                            if key not in self._pending_exports
+                        }
+                    )
+        return item
+
+    def _runItems(self, items, workspace, start):
+        """
+        Runs the batch's exports and then its items, yielding the items'
+        results as they finish
+        """
+        import_commands = []
+        for item in items:
+            for command in item.import_commands:
+                if command not in import_commands:
+                    import_commands.append(command)
+        gdal_exports = {}
+        for item in items:
+            gdal_exports.update(item.algorithm.gdalExports)
+        with self.trace.span("import inputs", "batch"):
+            import_commands, gdal_runs = SagaGdalExport.exportRasters(
+                import_commands, gdal_exports, self.feedback
+            )
+            completed, runs = SagaUtils.executeSagaImports(
+                import_commands, self.feedback, workspace
+            )
+        self.trace.add_command_runs(gdal_runs + runs)
+
+        cache = SagaExportCache.cache(SagaExportCache.RASTERS)
+        if cache is not None:
+            if completed:
+                cache.commitAll(self._pending_exports)
+                self._used_exports.extend(
+                    (cache, path) for path in self._pending_exports.values()
+                )
+            else:
+                cache.discardAll(self._pending_exports)
+        self._pending_exports = {}
+
+        if not completed:
+            for item in items:
+                item.error = self.algorithm.tr("Canceled")
+                self._finished(item, start)
+                yield item.result
+            return
+
+        workers = min(self.max_workers, len(items)) or 1
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        futures = {
+            pool.submit(self._runItem, item, workspace, workers): item for item in items
+        }
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                item = futures[future]
+                if future.cancelled():
+                    item.error = self.algorithm.tr("Canceled")
+                else:
+                    try:
+                        item.result.console = future.result()
+                    except Exception as e:  # pylint: disable=broad-except
+                        item.error = str(e)
+                self._finishItem(item)
+                if self.feedback.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                self._finished(item, start)
+                yield item.result
+        finally:
+            # when the caller stops consuming the results, only wait for
+            # the items which are already running
+            for pending in futures:
+                pending.cancel()
+            pool.shutdown(wait=True)
+
+    def _runItem(self, item, workspace, workers: int = 1):
+        """
+        Runs an item's commands, returning its console output. This runs on
+        a worker thread, so must not use the context or feedback (other
+        than to check for cancellation). The item gets its share of the
+        cores between the batch's workers.
+        """
+        item_start = time.perf_counter()
+        requested = SagaUtils.threadsSetting()
+        requested = max(1, requested // workers) if requested else 0
+        try:
+            with SagaCoreScheduler.reserve(requested, workers) as threads:
+                batch_filename = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                    item.commands,
+                    workspace,
+                    "saga_batch_item_{}".format(item.index),
+                    threads,
+                )
+                run = SagaUtils.runBatchJob(
+                    batch_filename, self.feedback, "; ".join(item.commands)
+                )
+        finally:
+            item.result.seconds = time.perf_counter() - item_start
+        item.result.usage = run.toDict()
+        self.trace.add_command_runs([run])
+        if run.canceled:
+            item.error = self.algorithm.tr("Canceled")
+        return run.console
+
+    def _finishItem(self, item):
+        """
+        Finalizes a completed item's outputs, or removes the partial outputs
+        of a failed one
+        """
+        _, _, output_files, output_files_nonascii = item.outputs
+        if item.error is None:
+            # GeoTIFF outputs which are converted after the run only exist
+            # as SAGA grids at this point
+            paths = [
+                path for path in output_files.values() if isinstance(path, str)
+            ] + list(item.algorithm.tiffOutputs)
+            if paths and not any(os.path.exists(path) for path in paths):
+                item.error = self.algorithm.tr(
+                    "SAGA did not create any outputs:\n{}"
+                ).format("\n".join(item.result.console))
+
+        if item.error is None:
+            try:
+                item.result.results = item.algorithm.finalizeOutputs(*item.outputs)
+            except Exception as e:  # pylint: disable=broad-except
+                item.error = str(e)
+        else:
+            for path in (
+                list(output_files.values())
+                + list(output_files_nonascii)
+                + list(item.algorithm.tiffOutputs)
+            ):
+                if isinstance(path, str):
+                    SagaUtils.removeDataset(path)
+
+    def _finished(self, item, start):
+        """
+        Records a finished item and reports the batch's progress
+        """
+        item.result.error = item.error
+        if item.result.succeeded():
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            self.feedback.reportError(
+                self.algorithm.tr("Batch item {} failed: {}").format(
+                    item.index, item.error
+                )
+            )
+
+        done = self.succeeded + self.failed
+        if self.items:
+            self.feedback.setProgress(100 * done / self.items)
+        self.seconds = time.perf_counter() - start
+
+
+class _BatchItem:
+    """
+    The state of an item of a batch while it is prepared and run
+    """
+
+    def __init__(self, index: int, parameters: dict):
+        self.index = index
+        self.result = SagaBatchResult(index, parameters)
+        self.algorithm = None
+        self.import_commands = []
+        self.commands = []
+        self.outputs = None
+        self.error = None
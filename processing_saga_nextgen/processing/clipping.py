@@ -0,0 +1,84 @@
+"""
+Clipping of inputs to the extent a run is limited to
+"""
+
+import math
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import QgsProcessingException
+
+
+class SagaClipping:
+    """
+    Clips inputs to the extent a run is limited to, before they are
+    exported.
+
+    Tools which write their outputs to a user defined target extent (e.g.
+    gridding, resampling or mosaicking) still read their complete inputs.
+    When clipping is enabled, rasters are instead presented to SAGA as
+    virtual rasters of the window covering the extent, and vector inputs
+    are exported with only the features intersecting the extent (see
+    SagaVectorExport), so a small extent of a large input is all that is
+    read and written. Inputs are clipped to the extent plus a margin of
+    cells, so that tools which use the neighbourhood of the extent's edge
+    cells give the same results.
+    """
+
+    @staticmethod
+    def rasterWindow(geotransform, width: int, height: int, extent, margin: int):
+        """
+        Returns the (x offset, y offset, width, height) window of cells of a
+        raster covering an (xmin, xmax, ymin, ymax) extent, extended by a
+        margin of cells, or None if the raster cannot or need not be clipped
+        (i.e. it is rotated, the window covers the whole raster, or the
+        extent does not overlap the raster)
+        """
+        origin_x, size_x, rotation_x, origin_y, rotation_y, size_y = geotransform
+        if rotation_x != 0 or rotation_y != 0 or size_x == 0 or size_y == 0:
+            return None
+
+        xmin, xmax, ymin, ymax = extent
+        columns = sorted([(xmin - origin_x) / size_x, (xmax - origin_x) / size_x])
+        rows = sorted([(ymin - origin_y) / size_y, (ymax - origin_y) / size_y])
+        left = max(0, int(math.floor(columns[0])) - margin)
+        right = min(width, int(math.ceil(columns[1])) + margin)
+        top = max(0, int(math.floor(rows[0])) - margin)
+        bottom = min(height, int(math.ceil(rows[1])) + margin)
+
+        if left >= right or top >= bottom:
+            return None
+        window = (left, top, right - left, bottom - top)
+        if window == (0, 0, width, height):
+            return None
+        return window
+
+    @staticmethod
+    def clipRaster(source: str, destination: str, extent, margin: int):
+        """
+        Writes a virtual raster of the window of a raster covering an
+        extent. Returns the window, or None if the raster was not clipped.
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        dataset = gdal.Open(source)
+        if dataset is None:
+            return None
+        window = SagaClipping.rasterWindow(
+            dataset.GetGeoTransform(),
+            dataset.RasterXSize,
+            dataset.RasterYSize,
+            extent,
+            margin,
+        )
+        if window is None:
+            return None
+
+        output = gdal.Translate(destination, dataset, format="VRT", srcWin=list(window))
+        if output is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaClipping", "Could not clip {}: {}"
+                ).format(source, gdal.GetLastErrorMsg())
+            )
+        output = None
+        return window
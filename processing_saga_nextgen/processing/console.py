@@ -0,0 +1,154 @@
+"""
+Streaming parser for saga_cmd console output
+"""
+
+import codecs
+import locale
+import re
+import time
+
+from collections import deque
+
+
+class SagaConsoleOutput:
+    """
+    Parses saga_cmd's console output as it is produced, reporting progress
+    and console messages to a feedback object.
+
+    saga_cmd reports progress by repeatedly rewriting a percentage on the
+    same line (e.g. "\\r 42%"), so long running tools can print hundreds of
+    thousands of updates. Output is therefore read in bulk chunks, progress
+    is only reported when it changes and at most once per progress interval,
+    and console messages are batched and pushed at most once per console
+    interval. Only the most recent console lines are kept for the log.
+    """
+
+    # "42%", "[ 42%]", "42.5 %" etc, on a line of their own
+    PROGRESS_RE = re.compile(r"^[\s\[(]*(\d{1,3})(?:\.\d+)?\s*%[\s\])]*$")
+
+    # saga_cmd's busy indicator
+    SPINNER_LINES = ("/", "-", "\\", "|")
+
+    LINE_BREAK_RE = re.compile(r"[\r\n]")
+
+    def __init__(
+        self,
+        feedback,
+        progress_interval: float = 0.1,
+        console_interval: float = 0.1,
+        max_log_lines: int = 1000,
+        clock=time.monotonic,
+    ):
+        self.feedback = feedback
+        self.progress_interval = progress_interval
+        self.console_interval = console_interval
+        self.loglines = deque(maxlen=max_log_lines if max_log_lines > 0 else None)
+        self.line_count = 0
+        self._clock = clock
+        self._remainder = ""
+        self._progress = None
+        self._pending_progress = None
+        self._last_progress_time = None
+        self._pending_console = []
+        self._last_console_time = None
+        self._decoder = codecs.getincrementaldecoder(
+            locale.getpreferredencoding(False)
+        )(errors="replace")
+
+    @staticmethod
+    def parseLine(line: str):
+        """
+        Classifies a single line of output, returning a tuple of the
+        progress percentage (or None) and the console text (or None)
+        """
+        match = SagaConsoleOutput.PROGRESS_RE.match(line)
+        if match:
+            return min(int(match.group(1)), 100), None
+
+        line = line.strip()
+        if not line or line in SagaConsoleOutput.SPINNER_LINES:
+            return None, None
+        return None, line
+
+    def feed(self, text: str):
+        """
+        Parses a chunk of output, which may end part way through a line
+        """
+        lines = SagaConsoleOutput.LINE_BREAK_RE.split(self._remainder + text)
+        self._remainder = lines.pop()
+        for line in lines:
+            self._parse(line)
+        self._flush(self._clock())
+
+    def feedBytes(self, chunk: bytes):
+        """
+        Decodes and parses a chunk of raw output
+        """
+        self.feed(self._decoder.decode(chunk))
+
+    def finish(self):
+        """
+        Parses any remaining output and reports everything still pending
+        """
+        self._remainder += self._decoder.decode(b"", final=True)
+        if self._remainder:
+            self._parse(self._remainder)
+            self._remainder = ""
+        self._flush(None)
+
+    def logText(self) -> str:
+        """
+        Returns the retained console lines for logging
+        """
+        omitted = self.line_count - len(self.loglines)
+        if omitted <= 0:
+            return "\n".join(self.loglines)
+        return "\n".join(
+            ["[{} earlier lines omitted]".format(omitted)] + list(self.loglines)
+        )
+
+    def _parse(self, line: str):
+        progress, text = SagaConsoleOutput.parseLine(line)
+        if progress is not None:
+            if progress != self._progress:
+                self._pending_progress = progress
+        elif text is not None:
+            self.line_count += 1
+            self.loglines.append(text)
+            self._pending_console.append(text)
+
+    def _flush(self, now):
+        """
+        Reports pending progress and console output. A now value of None
+        forces everything pending to be reported.
+        """
+        if self._pending_progress is not None and (
+            now is None
+            or self._last_progress_time is None
+            or now - self._last_progress_time >= self.progress_interval
+        ):
+            self._progress = self._pending_progress
+            self._pending_progress = None
+            self._last_progress_time = now
+            self.feedback.setProgress(self._progress)
+
+        if self._pending_console and (
+            now is None
+            or self._last_console_time is None
+            or now - self._last_console_time >= self.console_interval
+        ):
+            self.feedback.pushConsoleInfo("\n".join(self._pending_console))
+            self._pending_console = []
+            self._last_console_time = now
+
+    def readStream(self, stream, chunk_size: int = 65536):
+        """
+        Reads and parses a binary stream until it is exhausted
+        """
+        read = getattr(stream, "read1", stream.read)
+        while True:
+            chunk = read(chunk_size)
+            if not chunk:
+                break
+            self.feedBytes(chunk)
+        self.finish()
@@ -0,0 +1,476 @@
+"""
+Persistent cache of layers exported for use by SAGA
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from contextlib import contextmanager
+
+from .utils import SagaUtils
+
+
+class SagaExportCache:
+    """
+    A persistent cache of exported layers, shared between runs and QGIS
+    sessions.
+
+    Entries are keyed by a fingerprint of everything which affects the
+    export (e.g. the source file's path, size and modification time, and the
+    export options), so an entry is never reused once its source changes.
+    Each entry lives in its own folder within the cache folder, so that all
+    of an export's files (e.g. .sgrd, .sdat and .mgrd) are kept together.
+
+    Exports are only added to the cache once they have completed: a run
+    reserves a new entry path for each export it needs, and commits the
+    entries after its exports ran successfully (or discards them otherwise).
+    When the cache grows over its disk budget the least recently used
+    entries are evicted, as are entry folders left over from failed or
+    interrupted runs.
+
+    Entry folders a run uses (i.e. looked up, or reserved for its exports)
+    are pinned until the run releases them, so that they are never removed
+    while the run's SAGA commands still read or write them. Pins are
+    recorded by a pin file in the entry folder, so that they are respected
+    by every QGIS process sharing the cache. The index is re-read and
+    merged under a lock file whenever it is written, so that processes do
+    not overwrite each other's entries.
+    """
+
+    INDEX_VERSION = 1
+    INDEX_FILENAME = "index.json"
+    LOCK_FILENAME = "index.lock"
+    PIN_PREFIX = ".pin-"
+
+    RASTERS = "rasters"
+    VECTORS = "vectors"
+
+    # unpinned folders which are not in the index and older than this are
+    # assumed to be left over from failed or interrupted runs
+    ORPHAN_SECONDS = 3600
+    # pin files older than this are assumed to be left over by a process
+    # which did not exit cleanly
+    PIN_STALE_SECONDS = 24 * 3600
+    # lock files older than this are assumed to be left over by a process
+    # which did not exit cleanly
+    LOCK_STALE_SECONDS = 30
+    # time to wait for the index lock before giving up
+    LOCK_TIMEOUT_SECONDS = 10
+
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, folder: str, budget_bytes: int):
+        self.folder = folder
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        # the index as last read from (or written to) disk, and the
+        # modification time of the index file it was read from
+        self._index = None
+        self._index_mtime = None
+        # lookups since the index was last written
+        self._hits = 0
+        self._misses = 0
+        self._touched = {}
+        # entry folder to the number of runs in this process using it
+        self._pins = {}
+        # uncommitted folders to remove once they are released (e.g. when
+        # another run committed the same key first)
+        self._abandoned = set()
+        self._pin_filename = "{}{}-{}".format(
+            SagaExportCache.PIN_PREFIX, os.getpid(), uuid.uuid4().hex[:8]
+        )
+
+    @staticmethod
+    def cache(name: str):
+        """
+        Returns the shared cache with the given name (e.g. RASTERS),
+        configured from the provider settings, or None if export caching is
+        disabled
+        """
+        budget_bytes = SagaUtils.exportCacheBudget()
+        if budget_bytes <= 0:
+            return None
+
+        folder = os.path.join(SagaUtils.exportCacheFolder(), name)
+        with SagaExportCache._caches_lock:
+            cache = SagaExportCache._caches.get(folder)
+            if cache is None:
+                cache = SagaExportCache(folder, budget_bytes)
+                SagaExportCache._caches[folder] = cache
+            cache.budget_bytes = budget_bytes
+            return cache
+
+    @staticmethod
+    def fileFingerprint(path: str):
+        """
+        Returns a fingerprint of a file, consisting of its normalized path,
+        size and modification time, or None if it is not a file
+        """
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        return [
+            os.path.normcase(os.path.abspath(path)),
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]
+
+    @staticmethod
+    def makeKey(*parts) -> str:
+        """
+        Returns a cache key for a list of JSON serializable parts
+        """
+        return hashlib.sha1(
+            json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _indexFilename(self) -> str:
+        return os.path.join(self.folder, SagaExportCache.INDEX_FILENAME)
+
+    def _readIndex(self) -> dict:
+        """
+        Reads the cache index from disk, replacing the in-memory copy
+        """
+        index = None
+        try:
+            self._index_mtime = os.stat(self._indexFilename()).st_mtime_ns
+            with open(self._indexFilename(), encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != SagaExportCache.INDEX_VERSION:
+                index = None
+        except (OSError, ValueError, AttributeError):
+            index = None
+        if index is None:
+            index = {
+                "version": SagaExportCache.INDEX_VERSION,
+                "entries": {},
+                "hits": 0,
+                "misses": 0,
+            }
+        self._index = index
+        return index
+
+    def _loadIndex(self) -> dict:
+        """
+        Returns the cache index, reading it again from disk when another
+        process changed it
+        """
+        try:
+            mtime = os.stat(self._indexFilename()).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._index is None or mtime != self._index_mtime:
+            return self._readIndex()
+        return self._index
+
+    def _writeIndex(self, index: dict):
+        """
+        Merges the lookups since the index was last written into an index
+        read under the index lock, and writes it to disk
+        """
+        index["hits"] += self._hits
+        index["misses"] += self._misses
+        for key, last_used in self._touched.items():
+            entry = index["entries"].get(key)
+            if entry is not None:
+                entry["last_used"] = max(entry["last_used"], last_used)
+        self._hits = 0
+        self._misses = 0
+        self._touched = {}
+
+        path = self._indexFilename()
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(temp_path, path)
+            self._index_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        self._index = index
+
+    @contextmanager
+    def _indexLock(self):
+        """
+        Context manager which holds the lock file guarding the index against
+        concurrent writes by other processes, yielding whether the lock
+        was acquired
+        """
+        path = os.path.join(self.folder, SagaExportCache.LOCK_FILENAME)
+        deadline = time.monotonic() + SagaExportCache.LOCK_TIMEOUT_SECONDS
+        locked = False
+        while not locked:
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                locked = True
+            except FileExistsError:
+                try:
+                    if (
+                        time.time() - os.stat(path).st_mtime
+                        > SagaExportCache.LOCK_STALE_SECONDS
+                    ):
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            except OSError:
+                break
+        try:
+            yield locked
+        finally:
+            if locked:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def lookup(self, key: str):
+        """
+        Returns the path of the cached export for a key, or None if there is
+        no cached export. A found entry is pinned until it is released.
+        """
+        with self._lock:
+            index = self._loadIndex()
+            entry = index["entries"].get(key)
+            path = None
+            if entry is not None:
+                path = os.path.join(self.folder, entry["path"])
+                if not os.path.exists(path):
+                    # removed from outside of the cache
+                    path = None
+
+            # written with the next commit or release, not for every lookup
+            if path is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                entry["last_used"] = time.time()
+                self._touched[key] = entry["last_used"]
+                self._pin(os.path.dirname(path))
+            return path
+
+    def newEntryPath(self, key: str, filename: str) -> str:
+        """
+        Reserves a new, uncommitted entry for a key, returning the path to
+        export the layer to. The entry is pinned until it is released or
+        discarded.
+        """
+        folder = os.path.join(
+            self.folder, "{}_{}".format(key[:16], uuid.uuid4().hex[:8])
+        )
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            self._pin(folder)
+        return os.path.join(folder, filename)
+
+    def commit(self, key: str, path: str):
+        """
+        Adds a completed export to the cache, evicting the least recently
+        used entries if the cache is over its disk budget. The entry stays
+        pinned until it is released.
+        """
+        if not os.path.exists(path):
+            self.discard(path)
+            return
+
+        folder = os.path.dirname(path)
+        with self._lock, self._indexLock() as locked:
+            if not locked:
+                # the export is still used by the run, but not cached
+                self._abandoned.add(folder)
+                return
+
+            index = self._readIndex()
+            entries = index["entries"]
+            existing = entries.get(key)
+            if existing is not None and os.path.exists(
+                os.path.join(self.folder, existing["path"])
+            ):
+                # another run exported the same layer concurrently. Keep
+                # the existing entry, this export is removed once this run
+                # no longer uses it.
+                self._abandoned.add(folder)
+                return
+
+            entries[key] = {
+                "path": os.path.relpath(path, self.folder),
+                "size": SagaExportCache._folderSize(folder),
+                "last_used": time.time(),
+            }
+            self._evict(index)
+            self._writeIndex(index)
+
+    def release(self, path: str):
+        """
+        Releases an entry pinned by lookup, newEntryPath or commit, so that
+        it may be evicted once no other run uses it
+        """
+        folder = os.path.dirname(path)
+        with self._lock:
+            if self._unpin(folder) and folder in self._abandoned:
+                self._abandoned.discard(folder)
+                shutil.rmtree(folder, ignore_errors=True)
+            if self._hits or self._misses:
+                with self._indexLock() as locked:
+                    if locked:
+                        self._writeIndex(self._readIndex())
+
+    def discard(self, path: str):
+        """
+        Removes an uncommitted entry
+        """
+        folder = os.path.dirname(path)
+        with self._lock:
+            self._unpin(folder)
+            self._abandoned.discard(folder)
+        if os.path.dirname(folder) == self.folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def commitAll(self, pending: dict):
+        """
+        Commits a dictionary of key to export path
+        """
+        for key, path in pending.items():
+            self.commit(key, path)
+
+    def discardAll(self, pending: dict):
+        """
+        Removes a dictionary of key to uncommitted export path
+        """
+        for path in pending.values():
+            self.discard(path)
+
+    def _pin(self, folder: str):
+        count = self._pins.get(folder, 0)
+        if count == 0:
+            try:
+                with open(os.path.join(folder, self._pin_filename), "wb"):
+                    pass
+            except OSError:
+                pass
+        self._pins[folder] = count + 1
+
+    def _unpin(self, folder: str) -> bool:
+        """
+        Releases a pin, returning True if the folder is no longer used by
+        this process
+        """
+        count = self._pins.get(folder, 0) - 1
+        if count > 0:
+            self._pins[folder] = count
+            return False
+        self._pins.pop(folder, None)
+        try:
+            os.remove(os.path.join(folder, self._pin_filename))
+        except OSError:
+            pass
+        return True
+
+    def _inUse(self, folder: str) -> bool:
+        """
+        Returns True if an entry folder is pinned by this or another process
+        """
+        if folder in self._pins:
+            return True
+        now = time.time()
+        try:
+            with os.scandir(folder) as files:
+                for file in files:
+                    if (
+                        file.name.startswith(SagaExportCache.PIN_PREFIX)
+                        and now - file.stat().st_mtime
+                        < SagaExportCache.PIN_STALE_SECONDS
+                    ):
+                        return True
+        except OSError:
+            pass
+        return False
+
+    def _evict(self, index: dict):
+        """
+        Evicts least recently used entries which are not in use until the
+        cache is within its budget, and removes orphaned entry folders.
+        Must be called while holding the index lock.
+        """
+        entries = index["entries"]
+        for key in list(entries):
+            if not os.path.exists(os.path.join(self.folder, entries[key]["path"])):
+                # removed from outside of the cache
+                del entries[key]
+
+        total = sum(entry["size"] for entry in entries.values())
+        for key, entry in sorted(
+            entries.items(), key=lambda item: item[1]["last_used"]
+        ):
+            if total <= self.budget_bytes:
+                break
+            folder = os.path.join(self.folder, os.path.dirname(entry["path"]))
+            if self._inUse(folder):
+                continue
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= entry["size"]
+            del entries[key]
+
+        referenced = {
+            os.path.normcase(os.path.dirname(entry["path"]))
+            for entry in entries.values()
+        }
+        now = time.time()
+        try:
+            with os.scandir(self.folder) as folders:
+                for folder in folders:
+                    if (
+                        folder.is_dir()
+                        and os.path.normcase(folder.name) not in referenced
+                        and now - folder.stat().st_mtime
+                        > SagaExportCache.ORPHAN_SECONDS
+                        and not self._inUse(folder.path)
+                    ):
+                        shutil.rmtree(folder.path, ignore_errors=True)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _folderSize(folder: str) -> int:
+        size = 0
+        try:
+            with os.scandir(folder) as files:
+                for file in files:
+                    if file.is_file():
+                        size += file.stat().st_size
+        except OSError:
+            pass
+        return size
+
+    def statistics(self) -> dict:
+        """
+        Returns the cache's size and hit/miss statistics
+        """
+        with self._lock:
+            index = self._loadIndex()
+            hits = index["hits"] + self._hits
+            misses = index["misses"] + self._misses
+            return {
+                "entries": len(index["entries"]),
+                "size_bytes": sum(entry["size"] for entry in index["entries"].values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0,
+            }
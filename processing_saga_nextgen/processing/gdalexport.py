@@ -0,0 +1,177 @@
+"""
+In-process export of rasters to SAGA grids with GDAL
+"""
+
+import concurrent.futures
+import math
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+
+from .accounting import SagaCommandRun
+from .utils import SagaUtils
+
+
+class SagaGdalExport:
+    """
+    Exports rasters to SAGA grids with GDAL's SAGA driver, inside the QGIS
+    process.
+
+    Importing a raster with io_gdal starts a saga_cmd process, with its
+    full tool library load, just to copy the raster. Instead, rasters are
+    copied with gdal.Translate (or, for rotated rasters which SAGA cannot
+    represent, warped to a north up grid with gdal.Warp), running several
+    exports on a thread pool since GDAL releases the GIL during I/O.
+
+    Each export is registered against the io_gdal import command it
+    replaces, and rasters which cannot be exported with GDAL fall back to
+    that command. This includes rasters with non-square cells, which SAGA
+    grids cannot represent either, and which io_gdal resamples.
+    """
+
+    # matches io_gdal's B-spline resampling of rotated rasters
+    RESAMPLING = "cubicspline"
+
+    _available = None
+
+    @staticmethod
+    def available() -> bool:
+        """
+        Returns True if the GDAL bindings and SAGA driver are available
+        """
+        if SagaGdalExport._available is None:
+            try:
+                from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+                SagaGdalExport._available = gdal.GetDriverByName("SAGA") is not None
+            except ImportError:
+                SagaGdalExport._available = False
+        return SagaGdalExport._available
+
+    @staticmethod
+    def isRotated(geotransform) -> bool:
+        """
+        Returns True if a GDAL geotransform is rotated or sheared
+        """
+        return geotransform[2] != 0 or geotransform[4] != 0
+
+    @staticmethod
+    def hasSquareCells(geotransform) -> bool:
+        """
+        Returns True if a GDAL geotransform's cells are square, allowing for
+        the rounding of cell sizes stored as text
+        """
+        return math.isclose(abs(geotransform[1]), abs(geotransform[5]), rel_tol=1e-9)
+
+    @staticmethod
+    def exportCommand(source: str, destination: str, rotated: bool) -> str:
+        """
+        Returns a description of an export, in the form of a command, for
+        reporting alongside the SAGA commands
+        """
+        return 'gdal {} -of SAGA "{}" "{}"'.format(
+            "Warp" if rotated else "Translate", source, destination
+        )
+
+    @staticmethod
+    def exportRaster(source: str, destination: str) -> SagaCommandRun:
+        """
+        Exports a raster to a SAGA grid, returning the export's run. The
+        run's return code is 0 if the export succeeded.
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        run = SagaCommandRun(SagaGdalExport.exportCommand(source, destination, False))
+        # GDAL's SAGA driver writes the .sgrd header alongside the .sdat
+        sdat = os.path.splitext(destination)[0] + ".sdat"
+        output = None
+        error = None
+        try:
+            dataset = gdal.OpenEx(source, gdal.OF_RASTER)
+            if dataset is not None:
+                geotransform = dataset.GetGeoTransform()
+                if SagaGdalExport.isRotated(geotransform):
+                    # warped to a north up grid of square cells
+                    run.command = SagaGdalExport.exportCommand(
+                        source, destination, True
+                    )
+                    output = gdal.Warp(
+                        sdat,
+                        dataset,
+                        format="SAGA",
+                        resampleAlg=SagaGdalExport.RESAMPLING,
+                    )
+                elif not SagaGdalExport.hasSquareCells(geotransform):
+                    # left to io_gdal, rather than written with the SAGA
+                    # driver's single cell size
+                    error = QCoreApplication.translate(
+                        "SagaGdalExport", "The raster's cells are not square"
+                    )
+                else:
+                    output = gdal.Translate(sdat, dataset, format="SAGA", strict=True)
+            if output is None and error is None:
+                error = gdal.GetLastErrorMsg()
+            # closes and flushes the output
+            output = None
+            dataset = None
+        except RuntimeError as e:
+            # raised instead of returning None when GDAL exceptions are enabled
+            error = str(e)
+
+        if error is None:
+            run.return_code = 0
+        else:
+            run.console = [error]
+            run.return_code = 1
+            SagaUtils.removeDataset(destination)
+        run.stop()
+        return run
+
+    @staticmethod
+    def exportRasters(commands, exports: dict, feedback):
+        """
+        Runs the GDAL exports for import commands, on a bounded pool of
+        threads.
+
+        exports is a dictionary of io_gdal import command to the (source,
+        destination) of its GDAL export. Returns the commands which must
+        still be run by SAGA, i.e. those without a GDAL export and those
+        whose GDAL export failed, and the list of SagaCommandRun for the
+        GDAL exports.
+        """
+        gdal_commands = [command for command in commands if command in exports]
+        if not gdal_commands or not SagaGdalExport.available():
+            return list(commands), []
+
+        failed = set()
+        runs = []
+        max_workers = min(len(gdal_commands), SagaUtils.maxImportProcesses())
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(SagaGdalExport.exportRaster, *exports[command]): command
+                for command in gdal_commands
+            }
+            for future in concurrent.futures.as_completed(futures):
+                command = futures[future]
+                if future.cancelled():
+                    failed.add(command)
+                    continue
+                run = future.result()
+                runs.append(run)
+                if run.return_code != 0:
+                    feedback.pushWarning(
+                        QCoreApplication.translate(
+                            "SagaGdalExport",
+                            "GDAL could not export {}, using io_gdal instead: {}",
+                        ).format(exports[command][0], "\n".join(run.console))
+                    )
+                    failed.add(command)
+                if feedback.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+
+        return [
+            command
+            for command in commands
+            if command not in exports or command in failed
+        ], runs
@@ -0,0 +1,47 @@
+"""
+Isolated workspaces for SAGA job executions
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+
+from processing.tools.system import isWindows
+
+
+class SagaJobWorkspace:
+    """
+    A folder holding the files used by a single SAGA execution, such as the
+    batch job script and matrix parameter tables.
+
+    Each execution gets its own workspace, so that concurrently running
+    algorithms never share (and overwrite) each other's files.
+    """
+
+    def __init__(self, parent_folder: str):
+        os.makedirs(parent_folder, exist_ok=True)
+        self.folder = tempfile.mkdtemp(prefix="saga_job_", dir=parent_folder)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def batchJobFilename(self, name: str = "saga_batch_job") -> str:
+        """
+        Returns the full pathname to use for a batch file in the workspace
+        """
+        return os.path.join(self.folder, name + (".bat" if isWindows() else ".sh"))
+
+    def tempFilename(self, extension: str) -> str:
+        """
+        Returns a unique file name within the workspace
+        """
+        with self._lock:
+            index = next(self._counter)
+        return os.path.join(self.folder, "temp_{}.{}".format(index, extension))
+
+    def cleanup(self):
+        """
+        Removes the workspace and all files within it
+        """
+        shutil.rmtree(self.folder, ignore_errors=True)
@@ -0,0 +1,307 @@
+"""
+Opt-in profiling of the SAGA provider
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+class SagaStartupProfile:
+    """
+    Records where the provider's startup time goes: wall time per load phase,
+    the cost of parsing each (changed) description file, the cost of
+    creating each algorithm from its parsed description and (optionally) the
+    peak memory allocated by Python while loading.
+
+    Profiling is enabled by setting the SAGANG_PROFILE_STARTUP environment
+    variable, either to "1" to log the report, or to the path of a JSON file
+    to write the report to.
+    """
+
+    ENVIRONMENT_VARIABLE = "SAGANG_PROFILE_STARTUP"
+
+    # number of most expensive description files (and algorithm
+    # definitions) listed in the report
+    SLOWEST_DESCRIPTION_COUNT = 10
+
+    def __init__(self, trace_allocations: bool = True, output_file: str = None):
+        self.trace_allocations = trace_allocations
+        self.output_file = output_file
+        self.phases = {}
+        self.descriptions = {}
+        self.definitions = {}
+        self.peak_allocated_bytes = None
+        self._started_tracing = False
+        self._start = None
+        self._total_seconds = 0
+
+    @staticmethod
+    def from_environment():
+        """
+        Returns a new profile if startup profiling is enabled through the
+        environment, or None if it is not
+        """
+        value = os.environ.get(SagaStartupProfile.ENVIRONMENT_VARIABLE, "").strip()
+        if not value or value == "0":
+            return None
+
+        return SagaStartupProfile(
+            output_file=value if value not in ("1", "true", "yes") else None
+        )
+
+    def start(self):
+        """
+        Starts profiling
+        """
+        self._start = time.perf_counter()
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stops profiling
+        """
+        self._total_seconds = time.perf_counter() - self._start
+        if tracemalloc.is_tracing():
+            _, self.peak_allocated_bytes = tracemalloc.get_traced_memory()
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Context manager which times a load phase. Phases with the same name
+        are accumulated.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + (time.perf_counter() - start)
+
+    def record_description(self, description_file: str, seconds: float):
+        """
+        Adds to the recorded cost of parsing a description file
+        """
+        self.descriptions[description_file] = (
+            self.descriptions.get(description_file, 0) + seconds
+        )
+
+    def record_definition(self, description_file: str, seconds: float):
+        """
+        Adds to the recorded cost of creating the algorithm of a parsed
+        description file
+        """
+        self.definitions[description_file] = (
+            self.definitions.get(description_file, 0) + seconds
+        )
+
+    @staticmethod
+    def _costs(costs: dict) -> dict:
+        slowest = sorted(costs.items(), key=lambda item: item[1], reverse=True)[
+            : SagaStartupProfile.SLOWEST_DESCRIPTION_COUNT
+        ]
+        return {
+            "count": len(costs),
+            "total_seconds": sum(costs.values()),
+            "slowest": [
+                {"file": file, "seconds": seconds} for file, seconds in slowest
+            ],
+        }
+
+    def report(self) -> dict:
+        """
+        Returns the profile as a JSON serializable dictionary
+        """
+        return {
+            "total_seconds": self._total_seconds,
+            "phases": dict(self.phases),
+            "descriptions": SagaStartupProfile._costs(self.descriptions),
+            "definitions": SagaStartupProfile._costs(self.definitions),
+            "peak_allocated_bytes": self.peak_allocated_bytes,
+        }
+
+    def summary(self) -> str:
+        """
+        Returns a human readable summary of the profile
+        """
+        report = self.report()
+        lines = ["SAGA provider startup: {:.3f}s".format(report["total_seconds"])]
+        for name, seconds in sorted(
+            report["phases"].items(), key=lambda item: item[1], reverse=True
+        ):
+            lines.append("  {}: {:.3f}s".format(name, seconds))
+        for name, label in (
+            ("descriptions", "description files parsed"),
+            ("definitions", "algorithms created"),
+        ):
+            lines.append(
+                "  {} {}: {:.3f}s".format(
+                    report[name]["count"], label, report[name]["total_seconds"]
+                )
+            )
+            for cost in report[name]["slowest"]:
+                lines.append("    {}: {:.4f}s".format(cost["file"], cost["seconds"]))
+        if report["peak_allocated_bytes"] is not None:
+            lines.append(
+                "  peak Python allocations: {:.1f} MiB".format(
+                    report["peak_allocated_bytes"] / 1024 / 1024
+                )
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: str):
+        """
+        Writes the profile report to a JSON file
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class SagaTrace:
+    """
+    Records a timeline of spans for an algorithm execution (its phases and
+    each SAGA command), written in the Chrome trace event JSON format which
+    can be loaded into chrome://tracing or the Perfetto UI.
+
+    Tracing is enabled by setting the SAGANG_TRACE environment variable,
+    either to a folder, to write a separate trace file for each run, or to
+    the path of a .json file, to collect every run of the session into a
+    single trace file (which is rewritten after each run). Spans are
+    recorded against the thread they ran on, so concurrent algorithms and
+    concurrent SAGA commands appear on separate tracks.
+    """
+
+    ENVIRONMENT_VARIABLE = "SAGANG_TRACE"
+
+    _lock = threading.Lock()
+    _epoch = time.perf_counter()
+    _run_counter = itertools.count(1)
+    _session_events = []
+
+    def __init__(self, name: str, output: str = None):
+        self.name = name
+        self.output = output
+        self.enabled = output is not None
+        self.events = []
+
+    @staticmethod
+    def for_run(name: str):
+        """
+        Returns a trace for a run, which is disabled (and records nothing)
+        unless tracing is enabled through the environment
+        """
+        value = os.environ.get(SagaTrace.ENVIRONMENT_VARIABLE, "").strip()
+        if not value or value == "0":
+            return SagaTrace(name)
+        return SagaTrace(name, value)
+
+    @staticmethod
+    def timestamp(seconds: float) -> float:
+        """
+        Converts a time.perf_counter() value to a trace timestamp, in
+        microseconds
+        """
+        return (seconds - SagaTrace._epoch) * 1000000
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        seconds: float,
+        category: str = "phase",
+        thread_id: int = None,
+        args: dict = None,
+    ):
+        """
+        Records a span which started at a time.perf_counter() value and
+        lasted for a number of seconds
+        """
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": SagaTrace.timestamp(start),
+            "dur": seconds * 1000000,
+            "pid": os.getpid(),
+            "tid": thread_id if thread_id is not None else threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args):
+        """
+        Context manager which records a span for the duration of the context
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start, category, args=args)
+
+    def add_command_runs(self, runs):
+        """
+        Records a span for each SagaCommandRun
+        """
+        for run in runs:
+            self.add_span(
+                run.name(),
+                run.start_time,
+                run.wall_seconds,
+                "saga",
+                run.thread_id,
+                {"command": run.command, "canceled": run.canceled},
+            )
+
+    def finish(self):
+        """
+        Writes the trace, either to its own file or to the session's file
+        """
+        if not self.enabled or not self.events:
+            return
+
+        with SagaTrace._lock:
+            if self.output.lower().endswith(".json"):
+                SagaTrace._session_events.extend(self.events)
+                path = self.output
+                events = SagaTrace._session_events
+            else:
+                name = "".join(c if c.isalnum() else "_" for c in self.name)
+                path = os.path.join(
+                    self.output,
+                    "{}_{}_{}.json".format(
+                        name, os.getpid(), next(SagaTrace._run_counter)
+                    ),
+                )
+                events = self.events
+
+            try:
+                folder = os.path.dirname(path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                temp_path = "{}.{}.tmp".format(path, os.getpid())
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"traceEvents": events, "displayTimeUnit": "ms"},
+                        f,
+                        separators=(",", ":"),
+                    )
+                os.replace(temp_path, path)
+            except OSError:
+                pass
+        self.events = []
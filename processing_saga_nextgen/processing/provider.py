@@ -3,6 +3,9 @@ Processing provider for SAGA
 """
 
 import os
+import time
+
+from contextlib import nullcontext
 
 from processing.core.ProcessingConfig import ProcessingConfig, Setting
 from qgis.PyQt.QtCore import QCoreApplication
@@ -11,6 +14,8 @@ from qgis.core import Qgis, QgsProcessingProvider, QgsMessageLog
 from processing_saga_nextgen.gui.gui_utils import GuiUtils
 from processing_saga_nextgen.processing.utils import SagaUtils
 from .SagaAlgorithm import SagaAlgorithm
+from .SagaDescriptionIndex import SagaDescriptionIndex
+from .profiling import SagaStartupProfile
 from .SplitRGBBands import SplitRGBBands
 
 
@@ -19,11 +24,67 @@ class SagaNextGenAlgorithmProvider(QgsProcessingProvider):
     Processing provider for SAGA
     """
 
+    # the provider's algorithm copies only define the metadata shown in the
+    # toolbox, their parameters are created by the instances created from
+    # them
+    DEFER_PARAMETERS = True
+
     def __init__(self):
         super().__init__()
         self.algs = []
+        self.startup_profile = None
+        self._profile = None
+
+    def _phase(self, name: str):
+        """
+        Returns a context manager timing a startup phase, when startup
+        profiling is enabled
+        """
+        if self._profile is None:
+            return nullcontext()
+        return self._profile.phase(name)
 
     def load(self):  # pylint:disable=missing-docstring
+        self._profile = SagaStartupProfile.from_environment()
+        if self._profile is not None:
+            self._profile.start()
+
+        with self._phase("settings"):
+            self.addSettings()
+        with self._phase("read settings"):
+            ProcessingConfig.readSettings()
+        self.refreshAlgorithms()
+
+        if self._profile is not None:
+            with self._phase("version probe"):
+                self.longName()
+            self._profile.stop()
+            self.reportStartupProfile(self._profile)
+            self.startup_profile = self._profile
+            self._profile = None
+        return True
+
+    def reportStartupProfile(self, profile: SagaStartupProfile):
+        """
+        Logs a startup profile, and writes it to a JSON file if requested
+        """
+        QgsMessageLog.logMessage(
+            profile.summary(), self.tr("Processing"), Qgis.MessageLevel.Info
+        )
+        if profile.output_file:
+            try:
+                profile.write_json(profile.output_file)
+            except OSError as e:
+                QgsMessageLog.logMessage(
+                    self.tr("Could not write SAGA startup profile: {}").format(e),
+                    self.tr("Processing"),
+                    Qgis.MessageLevel.Warning,
+                )
+
+    def addSettings(self):
+        """
+        Registers the provider's settings
+        """
         ProcessingConfig.settingIcons["SAGANG"] = self.icon()
 
         ProcessingConfig.addSetting(
@@ -69,50 +130,270 @@ class SagaNextGenAlgorithmProvider(QgsProcessingProvider):
                 valuetype=Setting.FOLDER,
             )
         )
-
-        ProcessingConfig.readSettings()
-        self.refreshAlgorithms()
-        return True
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_MAX_IMPORT_PROCESSES,
+                self.tr(
+                    "Maximum number of concurrent input imports (0 = number of CPU cores)"
+                ),
+                0,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_PROGRESS_MODE,
+                self.tr("SAGA progress reporting"),
+                self.tr("Progress and messages"),
+                valuetype=Setting.SELECTION,
+                options=[
+                    self.tr("Progress and messages"),
+                    self.tr("Messages only (no progress)"),
+                    self.tr("Silent"),
+                ],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_PROGRESS_UPDATE_INTERVAL,
+                self.tr("Minimum interval between progress updates (ms)"),
+                100,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_CONSOLE_LOG_LINES,
+                self.tr("Maximum number of console output lines logged"),
+                1000,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_THREADS,
+                self.tr(
+                    "Threads per SAGA job (0 = share the available cores between running jobs)"
+                ),
+                0,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_PROCESS_PRIORITY,
+                self.tr("SAGA process priority"),
+                self.tr("Normal"),
+                valuetype=Setting.SELECTION,
+                options=[
+                    self.tr("Normal"),
+                    self.tr("Below normal"),
+                    self.tr("Idle (background)"),
+                ],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_EXPORT_CACHE_FOLDER,
+                self.tr("Export cache folder"),
+                "",
+                valuetype=Setting.FOLDER,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_EXPORT_CACHE_SIZE,
+                self.tr("Export cache size (MB, 0 = disable the export cache)"),
+                2048,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_RASTER_EXPORT_BACKEND,
+                self.tr("Raster export backend"),
+                self.tr("GDAL (in-process)"),
+                valuetype=Setting.SELECTION,
+                options=[
+                    self.tr("GDAL (in-process)"),
+                    self.tr("SAGA io_gdal"),
+                ],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_TILE_SIZE,
+                self.tr(
+                    "Tile size for tiled execution of larger rasters "
+                    "(cells, 0 = disable tiled execution)"
+                ),
+                0,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_CLIP_TO_EXTENT,
+                self.tr("Clip inputs to the output extent before exporting them"),
+                False,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_CLIP_MARGIN,
+                self.tr("Margin around the output extent of clipped inputs (cells)"),
+                10,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_ALIGN_GRIDS,
+                self.tr("Align raster inputs on different grids to a reference grid"),
+                False,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_ALIGN_RESAMPLING,
+                self.tr("Resampling method for aligning raster inputs"),
+                self.tr("Nearest neighbour"),
+                valuetype=Setting.SELECTION,
+                options=[
+                    self.tr("Nearest neighbour"),
+                    self.tr("Bilinear"),
+                    self.tr("Cubic"),
+                    self.tr("Cubic spline"),
+                ],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_TIFF_COMPRESSION,
+                self.tr("GeoTIFF output compression"),
+                self.tr("None"),
+                valuetype=Setting.SELECTION,
+                options=[self.tr("None"), "DEFLATE", "LZW", "ZSTD"],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_TIFF_PREDICTOR,
+                self.tr("GeoTIFF output compression predictor"),
+                self.tr("None"),
+                valuetype=Setting.SELECTION,
+                options=[
+                    self.tr("None"),
+                    self.tr("Horizontal differencing"),
+                    self.tr("Floating point"),
+                ],
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_TIFF_TILED,
+                self.tr("Write tiled GeoTIFF outputs"),
+                False,
+            )
+        )
+        ProcessingConfig.addSetting(
+            Setting(
+                "SAGANG",
+                SagaUtils.SAGA_TIFF_COG,
+                self.tr("Write GeoTIFF outputs as Cloud Optimized GeoTIFFs"),
+                False,
+            )
+        )
 
     def unload(self):  # pylint:disable=missing-docstring
         ProcessingConfig.removeSetting(SagaUtils.SAGA_LOG_CONSOLE)
         ProcessingConfig.removeSetting(SagaUtils.SAGA_LOG_COMMANDS)
         ProcessingConfig.removeSetting(SagaUtils.SAGA_FOLDER)
         ProcessingConfig.removeSetting(SagaUtils.SAGA_INTERMEDIATE_OUTPUT_PATH)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_MAX_IMPORT_PROCESSES)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_PROGRESS_MODE)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_PROGRESS_UPDATE_INTERVAL)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_CONSOLE_LOG_LINES)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_THREADS)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_PROCESS_PRIORITY)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_EXPORT_CACHE_FOLDER)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_EXPORT_CACHE_SIZE)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_RASTER_EXPORT_BACKEND)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_TILE_SIZE)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_CLIP_TO_EXTENT)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_CLIP_MARGIN)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_ALIGN_GRIDS)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_ALIGN_RESAMPLING)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_TIFF_COMPRESSION)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_TIFF_PREDICTOR)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_TIFF_TILED)
+        ProcessingConfig.removeSetting(SagaUtils.SAGA_TIFF_COG)
 
     def loadAlgorithms(self):  # pylint:disable=missing-docstring
         self.algs = []
         folder = SagaUtils.sagaDescriptionPath()
-        for descriptionFile in os.listdir(folder):
-            if descriptionFile.endswith("txt"):
-                try:
-                    alg = SagaAlgorithm(os.path.join(folder, descriptionFile))
-                    if alg.name().strip() != "":
-                        self.algs.append(alg)
-                    else:
-                        QgsMessageLog.logMessage(
-                            self.tr(
-                                "Could not open SAGA algorithm: {}".format(
-                                    descriptionFile
-                                )
-                            ),
-                            self.tr("Processing"),
-                            Qgis.MessageLevel.Critical,
-                        )
-                except Exception as e:  # pylint: disable=broad-except
+        index = SagaDescriptionIndex(folder)
+        with self._phase("description index"):
+            descriptions = index.descriptions(self._profile)
+        for descriptionFile, error in index.errors.items():
+            QgsMessageLog.logMessage(
+                self.tr(
+                    "Could not open SAGA algorithm: {}\n{}".format(
+                        descriptionFile, error
+                    )
+                ),
+                self.tr("Processing"),
+                Qgis.MessageLevel.Critical,
+            )
+
+        for descriptionFile, description in descriptions.items():
+            try:
+                start = time.perf_counter()
+                with self._phase("algorithm definitions"):
+                    alg = SagaAlgorithm(
+                        os.path.join(folder, descriptionFile),
+                        description,
+                        defer_parameters=self.DEFER_PARAMETERS,
+                    )
+                if self._profile is not None:
+                    self._profile.record_definition(
+                        descriptionFile, time.perf_counter() - start
+                    )
+                if alg.name().strip() != "":
+                    self.algs.append(alg)
+                else:
                     QgsMessageLog.logMessage(
                         self.tr(
-                            "Could not open SAGA algorithm: {}\n{}".format(
-                                descriptionFile, str(e)
-                            )
+                            "Could not open SAGA algorithm: {}".format(descriptionFile)
                         ),
                         self.tr("Processing"),
                         Qgis.MessageLevel.Critical,
                     )
+            except Exception as e:  # pylint: disable=broad-except
+                QgsMessageLog.logMessage(
+                    self.tr(
+                        "Could not open SAGA algorithm: {}\n{}".format(
+                            descriptionFile, str(e)
+                        )
+                    ),
+                    self.tr("Processing"),
+                    Qgis.MessageLevel.Critical,
+                )
 
         self.algs.append(SplitRGBBands())
-        for a in self.algs:
-            self.addAlgorithm(a)
+        with self._phase("add algorithms"):
+            for a in self.algs:
+                self.addAlgorithm(a)
 
     def name(self):
         """
@@ -147,15 +428,15 @@ class SagaNextGenAlgorithmProvider(QgsProcessingProvider):
 
     def defaultRasterFileExtension(self):
         """
-        Default extension -- only sdat supported
+        Default extension -- sdat
         """
         return "sdat"
 
     def supportedOutputRasterLayerExtensions(self):
         """
-        Only sdat supported
+        SAGA grids, and GeoTIFFs
         """
-        return ["sdat"]
+        return ["sdat", "tif"]
 
     def supportedOutputVectorLayerExtensions(self):
         """
@@ -0,0 +1,155 @@
+"""
+Raster metadata read from headers, for validating parameters
+"""
+
+import collections
+import os
+import threading
+
+from .alignment import SagaGrid
+from .exportcache import SagaExportCache
+
+
+class SagaRasterMetadata:
+    """
+    The band count and grid of a raster.
+
+    Validating a run's raster inputs only needs their band counts and
+    grids, so rather than loading a layer for each input, the metadata of
+    file based rasters is read from their headers only: the text header
+    of SAGA grids, or the metadata GDAL reads when opening other rasters.
+    Metadata is cached by the raster's path, size and modification time,
+    so validating many runs on the same inputs (e.g. batch runs) reads
+    each header once.
+    """
+
+    # maximum number of rasters whose metadata is cached
+    MAX_ENTRIES = 4096
+
+    _cache = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, band_count: int, grid: SagaGrid, name: str):
+        self.band_count = band_count
+        self.grid = grid
+        self.name = name
+
+    @staticmethod
+    def parseSgrd(text: str, name: str = ""):
+        """
+        Returns the metadata of a SAGA grid from its .sgrd header text, or
+        None if the header is incomplete
+        """
+        values = {}
+        for line in text.splitlines():
+            key, separator, value = line.partition("=")
+            if separator:
+                values[key.strip().upper()] = value.strip()
+        try:
+            width = int(values["CELLCOUNT_X"])
+            height = int(values["CELLCOUNT_Y"])
+            cellsize = float(values["CELLSIZE"])
+            # SAGA positions grids by the centre of their lower left cell
+            xmin = float(values["POSITION_XMIN"]) - cellsize / 2
+            ymin = float(values["POSITION_YMIN"]) - cellsize / 2
+        except (KeyError, ValueError):
+            return None
+        return SagaRasterMetadata(
+            1,
+            SagaGrid(
+                xmin,
+                xmin + width * cellsize,
+                ymin,
+                ymin + height * cellsize,
+                width,
+                height,
+            ),
+            name,
+        )
+
+    @staticmethod
+    def readHeader(path: str):
+        """
+        Reads the metadata of a raster file from its header, returning None
+        if it cannot be read
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        base, extension = os.path.splitext(path)
+        if extension.lower() in (".sgrd", ".sdat"):
+            try:
+                with open(base + ".sgrd", encoding="utf-8", errors="replace") as f:
+                    return SagaRasterMetadata.parseSgrd(f.read(), name)
+            except OSError:
+                return None
+
+        try:
+            from osgeo import gdal  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            return None
+        dataset = gdal.Open(path)
+        if dataset is None:
+            return None
+        x, cell_width, rotation_x, y, rotation_y, cell_height = (
+            dataset.GetGeoTransform()
+        )
+        if rotation_x != 0 or rotation_y != 0:
+            return None
+        width = dataset.RasterXSize
+        height = dataset.RasterYSize
+        xs = sorted([x, x + width * cell_width])
+        ys = sorted([y, y + height * cell_height])
+        return SagaRasterMetadata(
+            dataset.RasterCount,
+            SagaGrid(xs[0], xs[1], ys[0], ys[1], width, height),
+            name,
+        )
+
+    @staticmethod
+    def forPath(path: str):
+        """
+        Returns the metadata of a raster file, from the cache or its header,
+        or None if it cannot be read
+        """
+        fingerprint = SagaExportCache.fileFingerprint(path)
+        if fingerprint is None:
+            return None
+        key = tuple(fingerprint)
+        with SagaRasterMetadata._lock:
+            if key in SagaRasterMetadata._cache:
+                SagaRasterMetadata._cache.move_to_end(key)
+                return SagaRasterMetadata._cache[key]
+
+        metadata = SagaRasterMetadata.readHeader(path)
+        if metadata is not None:
+            with SagaRasterMetadata._lock:
+                SagaRasterMetadata._cache[key] = metadata
+                while len(SagaRasterMetadata._cache) > SagaRasterMetadata.MAX_ENTRIES:
+                    SagaRasterMetadata._cache.popitem(last=False)
+        return metadata
+
+    @staticmethod
+    def forLayer(layer):
+        """
+        Returns the metadata of a loaded raster layer
+        """
+        extent = layer.extent()
+        return SagaRasterMetadata(
+            layer.bandCount(),
+            SagaGrid(
+                extent.xMinimum(),
+                extent.xMaximum(),
+                extent.yMinimum(),
+                extent.yMaximum(),
+                layer.width(),
+                layer.height(),
+            ),
+            layer.name(),
+        )
+
+    @staticmethod
+    def clearCache():
+        """
+        Removes all cached metadata
+        """
+        with SagaRasterMetadata._lock:
+            SagaRasterMetadata._cache.clear()
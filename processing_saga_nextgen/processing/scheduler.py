@@ -0,0 +1,86 @@
+"""
+Scheduling of SAGA's OpenMP threads across concurrent jobs
+"""
+
+import os
+import threading
+
+from contextlib import contextmanager
+
+
+class SagaCoreScheduler:
+    """
+    Divides the machine's cores among the SAGA jobs running at the same time.
+
+    SAGA tools are OpenMP parallel and by default every saga_cmd process
+    uses all cores, so concurrent jobs oversubscribe the CPU. Each job
+    instead reserves a share of the cores when it starts and releases it
+    when it finishes. Since a running saga_cmd cannot change its thread
+    count, a job's share is fixed when it starts: it gets an equal share of
+    the cores between the jobs expected to run at the same time, i.e. the
+    running jobs plus the new one, or the concurrency of the caller's pool
+    if that is larger. A lone job gets every core, and a job started while
+    others run gets its equal share even if the earlier jobs still hold
+    more than theirs, so that jobs started later are not starved.
+    """
+
+    _lock = threading.Lock()
+    _reserved = {}
+    _next_job = 0
+
+    @staticmethod
+    def availableCores() -> int:
+        """
+        Returns the number of cores available to this process
+        """
+        try:
+            return len(os.sched_getaffinity(0)) or 1
+        except (AttributeError, OSError):
+            return os.cpu_count() or 1
+
+    @staticmethod
+    def activeJobs() -> int:
+        """
+        Returns the number of jobs which currently hold a reservation
+        """
+        with SagaCoreScheduler._lock:
+            return len(SagaCoreScheduler._reserved)
+
+    @staticmethod
+    def share(cores: int, active_jobs: int, concurrency: int = 1) -> int:
+        """
+        Returns the number of threads to give a new job, when there are
+        already active_jobs jobs running and the new job is one of
+        concurrency jobs started together
+        """
+        jobs = max(concurrency, active_jobs + 1)
+        return max(1, cores // jobs)
+
+    @staticmethod
+    @contextmanager
+    def reserve(requested: int = 0, concurrency: int = 1):
+        """
+        Context manager which reserves cores for a job for the duration of
+        the context, yielding the number of threads the job should use.
+
+        If a thread count is requested it is used as is (limited to the
+        available cores), otherwise the job gets its share of the cores.
+        Callers which run jobs on a pool pass the pool's number of workers
+        as the concurrency, so that the first jobs do not take all cores.
+        """
+        cores = SagaCoreScheduler.availableCores()
+        with SagaCoreScheduler._lock:
+            job = SagaCoreScheduler._next_job
+            SagaCoreScheduler._next_job += 1
+            if requested and requested > 0:
+                threads = min(requested, cores)
+            else:
+                threads = SagaCoreScheduler.share(
+                    cores, len(SagaCoreScheduler._reserved), concurrency
+                )
+            SagaCoreScheduler._reserved[job] = threads
+        try:
+            yield threads
+        finally:
+            with SagaCoreScheduler._lock:
+                del SagaCoreScheduler._reserved[job]
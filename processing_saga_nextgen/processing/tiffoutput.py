@@ -0,0 +1,105 @@
+"""
+GeoTIFF and Cloud Optimized GeoTIFF raster outputs
+"""
+
+import os
+
+
+class SagaTiffOutput:
+    """
+    Writes SAGA raster outputs as GeoTIFFs.
+
+    SAGA writes .tif outputs itself, but with fixed creation options. When
+    compression, tiling, a predictor or a cloud optimized layout is
+    requested, SAGA writes a temporary grid instead, which is converted to
+    the requested GeoTIFF in-process with GDAL right after the run.
+    """
+
+    EXTENSIONS = [".tif", ".tiff"]
+
+    # compression setting options
+    COMPRESSION = ["NONE", "DEFLATE", "LZW", "ZSTD"]
+
+    # predictor setting options, as GTiff PREDICTOR values
+    PREDICTORS = [1, 2, 3]
+
+    # COG driver names for the GTiff PREDICTOR values
+    COG_PREDICTORS = {1: "NO", 2: "STANDARD", 3: "FLOATING_POINT"}
+
+    def __init__(
+        self,
+        compression: int = 0,
+        tiled: bool = False,
+        predictor: int = 0,
+        cloud_optimized: bool = False,
+    ):
+        self.compression = SagaTiffOutput.COMPRESSION[compression]
+        self.tiled = tiled
+        self.predictor = SagaTiffOutput.PREDICTORS[predictor]
+        self.cloud_optimized = cloud_optimized
+
+    @staticmethod
+    def isTiffPath(path: str) -> bool:
+        """
+        Returns True if a path is a GeoTIFF destination
+        """
+        return os.path.splitext(path)[1].lower() in SagaTiffOutput.EXTENSIONS
+
+    def driver(self) -> str:
+        """
+        Returns the GDAL driver to write outputs with
+        """
+        return "COG" if self.cloud_optimized else "GTiff"
+
+    def creationOptions(self) -> list:
+        """
+        Returns the GDAL creation options to write outputs with
+        """
+        # predictors only apply to compressed outputs
+        predictor = self.predictor if self.compression != "NONE" else 1
+        if self.cloud_optimized:
+            # COG outputs are always tiled
+            return [
+                "COMPRESS={}".format(self.compression),
+                "PREDICTOR={}".format(SagaTiffOutput.COG_PREDICTORS[predictor]),
+                "BIGTIFF=IF_SAFER",
+            ]
+
+        options = []
+        if self.compression != "NONE":
+            options.append("COMPRESS={}".format(self.compression))
+        if predictor != 1:
+            options.append("PREDICTOR={}".format(predictor))
+        if self.tiled:
+            options.append("TILED=YES")
+        if options:
+            options.append("BIGTIFF=IF_SAFER")
+        return options
+
+    def needsConversion(self) -> bool:
+        """
+        Returns True if outputs must be converted after the run, rather than
+        written by SAGA directly
+        """
+        return self.driver() != "GTiff" or bool(self.creationOptions())
+
+    def translate(self, source: str, destination: str):
+        """
+        Converts a raster written by SAGA to the output GeoTIFF, returning
+        an error message or None if the conversion succeeded
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        dataset = gdal.Translate(
+            destination,
+            source,
+            format=self.driver(),
+            creationOptions=self.creationOptions(),
+        )
+        if dataset is None:
+            return gdal.GetLastErrorMsg() or "GDAL could not write {}".format(
+                destination
+            )
+        # closes and flushes the output
+        dataset = None
+        return None
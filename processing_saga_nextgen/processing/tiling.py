@@ -0,0 +1,294 @@
+"""
+Tiled parallel execution of SAGA tools which only use a local neighbourhood
+"""
+
+import contextlib
+import math
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import QgsProcessingException
+
+from .utils import SagaUtils
+
+
+class SagaTile:
+    """
+    A tile of a raster: the window of cells it produces, and the larger
+    window (including the halo around it) which is read to produce them
+    """
+
+    def __init__(self, index: int, window: tuple, read_window: tuple):
+        self.index = index
+        # (x offset, y offset, width, height) in cells
+        self.window = window
+        self.read_window = read_window
+
+    def trimmedWindow(self) -> tuple:
+        """
+        Returns the tile's window within the tile's output, i.e. the tile's
+        output without its halo
+        """
+        x, y, width, height = self.window
+        return x - self.read_window[0], y - self.read_window[1], width, height
+
+
+class SagaTiling:
+    """
+    Splits rasters into tiles, each extended by a halo of cells around it.
+
+    SAGA loads whole grids into memory, but tools which only use a fixed
+    neighbourhood of each cell (e.g. filters and terrain derivatives) give
+    the same results when run on tiles of a raster, as long as each tile
+    also includes the neighbourhood (halo) of its edge cells. Algorithms
+    declare this with a "Tileable|HALO" line in their description file,
+    where HALO is a number of cells, the name of a parameter giving the
+    number of cells, or a sum of these (e.g. "KERNEL_RADIUS+1").
+    """
+
+    @staticmethod
+    def halo(spec: str, values) -> int:
+        """
+        Returns the halo width in cells for a halo specification, using
+        values to look up the value of a named parameter
+        """
+        halo = 0
+        for term in spec.split("+"):
+            term = term.strip()
+            if term.isdigit():
+                halo += int(term)
+            elif term:
+                halo += int(math.ceil(values(term)))
+        return max(0, halo)
+
+    @staticmethod
+    def tiles(width: int, height: int, tile_size: int, halo: int) -> list:
+        """
+        Returns the tiles covering a raster of the given size, in rows
+        """
+        tiles = []
+        for y in range(0, height, tile_size):
+            for x in range(0, width, tile_size):
+                tile_width = min(tile_size, width - x)
+                tile_height = min(tile_size, height - y)
+                read_x = max(0, x - halo)
+                read_y = max(0, y - halo)
+                read_window = (
+                    read_x,
+                    read_y,
+                    min(width, x + tile_width + halo) - read_x,
+                    min(height, y + tile_height + halo) - read_y,
+                )
+                tiles.append(
+                    SagaTile(len(tiles), (x, y, tile_width, tile_height), read_window)
+                )
+        return tiles
+
+    @staticmethod
+    def gdalPath(path: str) -> str:
+        """
+        Returns the path GDAL opens a raster with, i.e. the .sdat of a
+        SAGA grid
+        """
+        if path.lower().endswith(".sgrd"):
+            return path[:-4] + "sdat"
+        return path
+
+    @staticmethod
+    def rasterSize(path: str):
+        """
+        Returns the width and height of a raster, or None if it cannot be
+        opened
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        dataset = gdal.Open(SagaTiling.gdalPath(path))
+        if dataset is None:
+            return None
+        return dataset.RasterXSize, dataset.RasterYSize
+
+    @staticmethod
+    def writeTileInput(source: str, destination: str, tile: SagaTile):
+        """
+        Writes a virtual raster of a tile's read window of a source raster,
+        which SAGA reads without copying the tile's cells
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        output = gdal.Translate(
+            destination,
+            SagaTiling.gdalPath(source),
+            format="VRT",
+            srcWin=list(tile.read_window),
+        )
+        if output is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaTiling", "Could not create tile {} of {}: {}"
+                ).format(tile.index, source, gdal.GetLastErrorMsg())
+            )
+        output = None
+
+
+class SagaMosaic:
+    """
+    Assembles an output raster from the trimmed outputs of its tiles, one
+    tile at a time, so that only a single tile is held in memory
+    """
+
+    def __init__(self, path: str, reference: str):
+        self.path = path
+        self.reference = reference
+        self._dataset = None
+
+    def _create(self, band):
+        """
+        Creates the output, on the grid of the reference raster and with the
+        data type and no data value of a tile's output band
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        reference = gdal.Open(SagaTiling.gdalPath(self.reference))
+        if self.path.lower().endswith((".sgrd", ".sdat")):
+            driver = gdal.GetDriverByName("SAGA")
+        else:
+            driver = gdal.GetDriverByName("GTiff")
+        self._dataset = driver.Create(
+            SagaTiling.gdalPath(self.path),
+            reference.RasterXSize,
+            reference.RasterYSize,
+            1,
+            band.DataType,
+        )
+        if self._dataset is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaTiling", "Could not create {}: {}"
+                ).format(self.path, gdal.GetLastErrorMsg())
+            )
+        self._dataset.SetGeoTransform(reference.GetGeoTransform())
+        self._dataset.SetProjection(reference.GetProjection())
+        nodata = band.GetNoDataValue()
+        if nodata is not None:
+            self._dataset.GetRasterBand(1).SetNoDataValue(nodata)
+
+    def add(self, tile: SagaTile, tile_output: str):
+        """
+        Copies a tile's output, without its halo, into the mosaic
+        """
+        from osgeo import gdal  # pylint: disable=import-outside-toplevel
+
+        source = gdal.Open(SagaTiling.gdalPath(tile_output))
+        if source is None:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaTiling", "SAGA did not create tile {} of {}"
+                ).format(tile.index, self.path)
+            )
+        band = source.GetRasterBand(1)
+        if self._dataset is None:
+            self._create(band)
+
+        x, y, width, height = tile.trimmedWindow()
+        self._dataset.GetRasterBand(1).WriteRaster(
+            tile.window[0],
+            tile.window[1],
+            width,
+            height,
+            band.ReadRaster(x, y, width, height),
+        )
+
+    def close(self):
+        """
+        Flushes and closes the mosaic
+        """
+        self._dataset = None
+
+
+class SagaTiledExecution:
+    """
+    Runs a SAGA command once per tile, in parallel saga_cmd processes, and
+    mosaics the tiles' trimmed outputs into the requested outputs as each
+    tile finishes. Tile inputs are virtual rasters and tile outputs are
+    removed once mosaicked, so neither memory nor temporary disk use grow
+    with the size of the raster.
+    """
+
+    def __init__(self, tiles, inputs: dict, outputs: dict, workspace):
+        """
+        inputs is a dictionary of input parameter name to raster path, and
+        outputs a dictionary of output parameter name to the path to write
+        the mosaic to
+        """
+        self.tiles = tiles
+        self.inputs = inputs
+        self.outputs = outputs
+        self.workspace = workspace
+
+    def prepareTile(self, tile: SagaTile):
+        """
+        Writes a tile's inputs, returning dictionaries of parameter name to
+        the tile's input and output paths
+        """
+        tile_inputs = {}
+        for name, path in self.inputs.items():
+            tile_inputs[name] = self.workspace.tempFilename("vrt")
+            SagaTiling.writeTileInput(path, tile_inputs[name], tile)
+        tile_outputs = {
+            name: self.workspace.tempFilename("sgrd") for name in self.outputs
+        }
+        return tile_inputs, tile_outputs
+
+    def summary(self) -> str:
+        """
+        Returns a description of the execution for the log
+        """
+        return QCoreApplication.translate(
+            "SagaTiling", "Running SAGA in {} tiles"
+        ).format(len(self.tiles))
+
+    def run(self, build_command, feedback, threads: int = 0):
+        """
+        Runs the tiles, using build_command(tile_inputs, tile_outputs) to
+        build each tile's command. Returns a tuple of whether execution
+        completed (i.e. was not canceled) and the list of SagaCommandRun
+        for the tiles.
+        """
+        commands = {}
+        outputs = {}
+        for tile in self.tiles:
+            tile_inputs, outputs[tile.index] = self.prepareTile(tile)
+            commands[tile.index] = build_command(tile_inputs, outputs[tile.index])
+
+        mosaics = {
+            name: SagaMosaic(path, next(iter(self.inputs.values())))
+            for name, path in self.outputs.items()
+        }
+        runs = []
+        try:
+            with contextlib.closing(
+                SagaUtils.executeParallelCommands(
+                    commands, feedback, self.workspace, threads, "saga_tile"
+                )
+            ) as results:
+                for done, (index, run) in enumerate(results, start=1):
+                    runs.append(run)
+                    if run.canceled or feedback.isCanceled():
+                        continue
+
+                    tile = self.tiles[index]
+                    for name, mosaic in mosaics.items():
+                        if not os.path.exists(outputs[index][name]):
+                            raise QgsProcessingException(
+                                QCoreApplication.translate(
+                                    "SagaTiling", "SAGA failed on tile {}:\n{}"
+                                ).format(index, "\n".join(run.console))
+                            )
+                        mosaic.add(tile, outputs[index][name])
+                        SagaUtils.removeDataset(outputs[index][name])
+                    feedback.setProgress(100 * done / len(self.tiles))
+        finally:
+            for mosaic in mosaics.values():
+                mosaic.close()
+
+        return not feedback.isCanceled(), runs
@@ -15,10 +15,17 @@
 ***************************************************************************
 """
 
+import concurrent.futures
+import json
+import locale
 import os
 import platform
+import queue
+import shutil
+import signal
 import stat
 import subprocess
+import threading
 import time
 import tempfile
 
@@ -29,6 +36,13 @@ from processing.tools.system import isWindows, isMac, userFolder
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import Qgis, QgsApplication, QgsMessageLog
 
+from .accounting import SagaCommandRun
+from .alignment import SagaGrid
+from .console import SagaConsoleOutput
+from .jobs import SagaJobWorkspace
+from .scheduler import SagaCoreScheduler
+from .tiffoutput import SagaTiffOutput
+
 
 class SagaUtils:
     """
@@ -37,24 +51,65 @@ class SagaUtils:
 
     REQUIRED_VERSION = "9.2."
 
+    # raster formats which saga_cmd can read directly, so need not be
+    # imported with io_gdal when import/export optimizations are enabled
+    DIRECT_RASTER_EXTENSIONS = [".tif", ".tiff", ".img", ".asc", ".vrt"]
+
     SAGA_FOLDER = "SAGA_FOLDER"
     SAGA_LOG_COMMANDS = "SAGANG_LOG_COMMANDS"
     SAGA_LOG_CONSOLE = "SAGANG_LOG_CONSOLE"
     SAGA_IMPORT_EXPORT_OPTIMIZATION = "SAGANG_IMPORT_EXPORT_OPTIMIZATION"
     SAGA_INTERMEDIATE_OUTPUT_PATH = "SAGA_INTERMEDIATE_OUTPUT_PATH"
+    SAGA_MAX_IMPORT_PROCESSES = "SAGANG_MAX_IMPORT_PROCESSES"
+    SAGA_PROGRESS_MODE = "SAGANG_PROGRESS_MODE"
+    SAGA_PROGRESS_UPDATE_INTERVAL = "SAGANG_PROGRESS_UPDATE_INTERVAL"
+    SAGA_CONSOLE_LOG_LINES = "SAGANG_CONSOLE_LOG_LINES"
+    SAGA_THREADS = "SAGANG_THREADS"
+    SAGA_PROCESS_PRIORITY = "SAGANG_PROCESS_PRIORITY"
+    SAGA_EXPORT_CACHE_FOLDER = "SAGANG_EXPORT_CACHE_FOLDER"
+    SAGA_EXPORT_CACHE_SIZE = "SAGANG_EXPORT_CACHE_SIZE"
+    SAGA_TIFF_COMPRESSION = "SAGANG_TIFF_COMPRESSION"
+    SAGA_TIFF_TILED = "SAGANG_TIFF_TILED"
+    SAGA_TIFF_PREDICTOR = "SAGANG_TIFF_PREDICTOR"
+    SAGA_TIFF_COG = "SAGANG_TIFF_COG"
+    SAGA_RASTER_EXPORT_BACKEND = "SAGANG_RASTER_EXPORT_BACKEND"
+    SAGA_TILE_SIZE = "SAGANG_TILE_SIZE"
+    SAGA_CLIP_TO_EXTENT = "SAGANG_CLIP_TO_EXTENT"
+    SAGA_CLIP_MARGIN = "SAGANG_CLIP_MARGIN"
+    SAGA_ALIGN_GRIDS = "SAGANG_ALIGN_GRIDS"
+    SAGA_ALIGN_RESAMPLING = "SAGANG_ALIGN_RESAMPLING"
+
+    # interval at which running jobs are polled for cancellation, in seconds
+    CANCEL_POLL_INTERVAL = 0.1
+
+    # files which make up SAGA grids and shapefiles
+    GRID_EXTENSIONS = [".sgrd", ".sdat", ".mgrd", ".prj", ".sdat.aux.xml"]
+    SHAPEFILE_EXTENSIONS = [".shp", ".shx", ".dbf", ".prj", ".cpg", ".mshp"]
+
+    # process priority setting options
+    PRIORITY_NORMAL = 0
+    PRIORITY_BELOW_NORMAL = 1
+    PRIORITY_IDLE = 2
+
+    # raster export backend setting options
+    EXPORT_BACKEND_GDAL = 0
+    EXPORT_BACKEND_SAGA = 1
+
+    # saga_cmd --flags values for each of the progress mode setting's options
+    PROGRESS_MODE_FLAGS = ["", "q", "s"]
+
+    VERSION_CACHE_FILENAME = "saga_nextgen_version_cache.json"
 
     _installed_version = None
     _installedVersionFound = False
+    _version_cache = {}
+    _version_lock = threading.Lock()
 
     @staticmethod
-    def sagaBatchJobFilename():
+    def sagaJobFolder():
         """
-        Returns the full pathname to use for batch files
+        Returns the folder to use for batch files and job workspaces
         """
-        if isWindows():
-            filename = "saga_batch_job.bat"
-        else:
-            filename = "saga_batch_job.sh"
         if ProcessingConfig.getSetting(SagaUtils.SAGA_INTERMEDIATE_OUTPUT_PATH):
             # explicit output path was set in provider options
             intermediateDir = ProcessingConfig.getSetting(
@@ -67,14 +122,196 @@ class SagaUtils:
                 with tempfile.NamedTemporaryFile(dir=intermediateDir) as f:  # pylint:disable=unused-variable
                     # temp file will be opened and closed, this throws an exception if it fails for some reason (e.g. missing permissions)
                     # we thus know the path is writable now, so use it
-                    batchfile = os.path.join(intermediateDir, filename)
+                    return intermediateDir
             except:  # pylint:disable=bare-except
                 # cannot write to specified directory, use default
-                batchfile = os.path.join(userFolder(), filename)
+                return userFolder()
+
+        # default output to userFolder()
+        return userFolder()
+
+    @staticmethod
+    def sagaBatchJobFilename(workspace=None, name="saga_batch_job"):
+        """
+        Returns the full pathname to use for batch files.
+
+        If a job workspace is specified the batch file is created within it,
+        otherwise the shared batch file in the job folder is used.
+        """
+        if workspace is not None:
+            return workspace.batchJobFilename(name)
+
+        if isWindows():
+            filename = name + ".bat"
         else:
-            # default output to userFolder()
-            batchfile = os.path.join(userFolder(), filename)
-        return batchfile
+            filename = name + ".sh"
+        return os.path.join(SagaUtils.sagaJobFolder(), filename)
+
+    @staticmethod
+    def exportCacheFolder():
+        """
+        Returns the folder holding the persistent export caches
+        """
+        folder = ProcessingConfig.getSetting(SagaUtils.SAGA_EXPORT_CACHE_FOLDER)
+        if folder:
+            return folder
+        return os.path.join(userFolder(), "saga_export_cache")
+
+    @staticmethod
+    def exportCacheBudget() -> int:
+        """
+        Returns the disk budget of each export cache in bytes, or 0 if
+        export caching is disabled
+        """
+        try:
+            megabytes = float(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_EXPORT_CACHE_SIZE) or 0
+            )
+        except (TypeError, ValueError):
+            megabytes = 0
+        return max(0, int(megabytes * 1024 * 1024))
+
+    @staticmethod
+    def rasterExportBackend() -> int:
+        """
+        Returns the configured backend for exporting rasters to SAGA grids
+        """
+        try:
+            return int(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_RASTER_EXPORT_BACKEND) or 0
+            )
+        except (TypeError, ValueError):
+            return SagaUtils.EXPORT_BACKEND_GDAL
+
+    @staticmethod
+    def tileSize() -> int:
+        """
+        Returns the tile size in cells for tiled execution, or 0 if tiled
+        execution is disabled
+        """
+        try:
+            return max(
+                0, int(ProcessingConfig.getSetting(SagaUtils.SAGA_TILE_SIZE) or 0)
+            )
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def clipToExtent() -> bool:
+        """
+        Returns True if inputs should be clipped to the extent a run is
+        limited to
+        """
+        return bool(ProcessingConfig.getSetting(SagaUtils.SAGA_CLIP_TO_EXTENT))
+
+    @staticmethod
+    def clipMargin() -> int:
+        """
+        Returns the margin in cells to keep around the extent inputs are
+        clipped to
+        """
+        try:
+            return max(
+                0, int(ProcessingConfig.getSetting(SagaUtils.SAGA_CLIP_MARGIN) or 0)
+            )
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def alignGrids() -> bool:
+        """
+        Returns True if raster inputs on different grids should be aligned
+        to a reference grid
+        """
+        return bool(ProcessingConfig.getSetting(SagaUtils.SAGA_ALIGN_GRIDS))
+
+    @staticmethod
+    def alignResampling() -> str:
+        """
+        Returns the GDAL resampling algorithm for aligning raster inputs
+        """
+        try:
+            index = int(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_ALIGN_RESAMPLING) or 0
+            )
+        except (TypeError, ValueError):
+            index = 0
+        if not 0 <= index < len(SagaGrid.RESAMPLING):
+            index = 0
+        return SagaGrid.RESAMPLING[index]
+
+    @staticmethod
+    def importExportOptimization() -> bool:
+        """
+        Returns True if SAGA import/export optimizations are enabled
+        """
+        return bool(
+            ProcessingConfig.getSetting(SagaUtils.SAGA_IMPORT_EXPORT_OPTIMIZATION)
+        )
+
+    @staticmethod
+    def versionTuple(version: str) -> tuple:
+        """
+        Converts a SAGA version string (e.g. "9.2.1") to a tuple of integers
+        which compares correctly (e.g. "9.10" is newer than "9.2")
+        """
+        parts = []
+        for part in (version or "").strip().split("."):
+            digits = ""
+            for c in part:
+                if not c.isdigit():
+                    break
+                digits += c
+            if not digits:
+                break
+            parts.append(int(digits))
+        return tuple(parts)
+
+    @staticmethod
+    def tiffOutput():
+        """
+        Returns the GeoTIFF output writer configured from the provider
+        settings
+        """
+
+        def option(setting, count):
+            try:
+                value = int(ProcessingConfig.getSetting(setting) or 0)
+            except (TypeError, ValueError):
+                return 0
+            return value if 0 <= value < count else 0
+
+        return SagaTiffOutput(
+            compression=option(
+                SagaUtils.SAGA_TIFF_COMPRESSION, len(SagaTiffOutput.COMPRESSION)
+            ),
+            tiled=bool(ProcessingConfig.getSetting(SagaUtils.SAGA_TIFF_TILED)),
+            predictor=option(
+                SagaUtils.SAGA_TIFF_PREDICTOR, len(SagaTiffOutput.PREDICTORS)
+            ),
+            cloud_optimized=bool(ProcessingConfig.getSetting(SagaUtils.SAGA_TIFF_COG)),
+        )
+
+    @staticmethod
+    def isDirectRasterSource(path: str) -> bool:
+        """
+        Returns True if a raster source is a plain file in a format which
+        saga_cmd can read directly. Sources with GDAL open options or
+        subdatasets, and paths saga_cmd may not be able to open (i.e. non
+        ascii paths), must be imported with io_gdal.
+        """
+        if not path or not path.isascii() or "|" in path:
+            return False
+        if os.path.splitext(path)[1].lower() not in SagaUtils.DIRECT_RASTER_EXTENSIONS:
+            return False
+        return os.path.isfile(path)
+
+    @staticmethod
+    def createJobWorkspace():
+        """
+        Creates a new, isolated workspace for a single SAGA execution
+        """
+        return SagaJobWorkspace(os.path.join(SagaUtils.sagaJobFolder(), "saga_jobs"))
 
     @staticmethod
     def findSagaFolder():
@@ -134,11 +371,18 @@ class SagaUtils:
         return os.path.join(os.path.dirname(__file__), "..", "description")
 
     @staticmethod
-    def createSagaBatchJobFileFromSagaCommands(commands):
+    def createSagaBatchJobFileFromSagaCommands(
+        commands, workspace=None, name="saga_batch_job", threads=None
+    ):
         """
-        Creates a batch job file from a list of SAGA commands
+        Creates a batch job file from a list of SAGA commands, returning the
+        path to the batch file.
+
+        If a number of threads is specified, saga_cmd is limited to using
+        that many OpenMP threads.
         """
-        with open(SagaUtils.sagaBatchJobFilename(), "w", encoding="utf8") as fout:
+        batch_filename = SagaUtils.sagaBatchJobFilename(workspace, name)
+        with open(batch_filename, "w", encoding="utf8") as fout:
             if isWindows():
                 fout.write("set SAGA=" + SagaUtils.sagaPath() + "\n")
                 fout.write(
@@ -156,21 +400,232 @@ class SagaUtils:
                 fout.write("export PATH=" + SagaUtils.sagaPath() + ":$PATH\n")
             else:
                 pass
+            if threads:
+                if isWindows():
+                    fout.write("set OMP_NUM_THREADS={}\n".format(threads))
+                else:
+                    fout.write("export OMP_NUM_THREADS={}\n".format(threads))
+
+            prefix = SagaUtils.priorityCommandPrefix() + "saga_cmd "
+            flags = SagaUtils.sagaCmdFlags(threads)
             for command in commands:
-                fout.write("saga_cmd " + command + "\n")
+                fout.write(prefix + flags + command + "\n")
 
             fout.write("exit")
 
+        return batch_filename
+
+    @staticmethod
+    def sagaCmdFlags(threads=None) -> str:
+        """
+        Returns the saga_cmd options used to select the configured progress
+        reporting mode and the number of threads, followed by a space (or an
+        empty string when saga_cmd's defaults are used)
+        """
+        options = ""
+        if threads:
+            options += "--cores={} ".format(threads)
+        try:
+            flags = SagaUtils.PROGRESS_MODE_FLAGS[
+                int(ProcessingConfig.getSetting(SagaUtils.SAGA_PROGRESS_MODE) or 0)
+            ]
+        except (TypeError, ValueError, IndexError):
+            flags = ""
+        if flags:
+            options += "--flags={} ".format(flags)
+        return options
+
+    @staticmethod
+    def threadsSetting() -> int:
+        """
+        Returns the configured number of threads per SAGA job, or 0 if the
+        available cores should be shared between running jobs
+        """
+        try:
+            return max(0, int(ProcessingConfig.getSetting(SagaUtils.SAGA_THREADS) or 0))
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def processPriority() -> int:
+        """
+        Returns the configured priority for SAGA processes
+        """
+        try:
+            return int(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_PROCESS_PRIORITY) or 0
+            )
+        except (TypeError, ValueError):
+            return SagaUtils.PRIORITY_NORMAL
+
+    @staticmethod
+    def priorityCommandPrefix() -> str:
+        """
+        Returns the command prefix which lowers the CPU (and where ionice is
+        available, IO) priority of saga_cmd for the configured process
+        priority. On Windows the priority is set on the batch job process
+        instead, and inherited by saga_cmd.
+        """
+        priority = SagaUtils.processPriority()
+        if isWindows() or priority == SagaUtils.PRIORITY_NORMAL:
+            return ""
+
+        if priority == SagaUtils.PRIORITY_IDLE:
+            prefix = "nice -n 19 "
+            ionice = "ionice -c 3 "
+        else:
+            prefix = "nice -n 10 "
+            ionice = "ionice -c 2 -n 7 "
+        if shutil.which("ionice"):
+            prefix += ionice
+        return prefix
+
+    @staticmethod
+    def consoleOutput(feedback):
+        """
+        Returns a console output parser for the given feedback, configured
+        from the provider settings
+        """
+        try:
+            interval = (
+                float(
+                    ProcessingConfig.getSetting(SagaUtils.SAGA_PROGRESS_UPDATE_INTERVAL)
+                    or 0
+                )
+                / 1000
+            )
+        except (TypeError, ValueError):
+            interval = 0.1
+        try:
+            max_log_lines = int(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_CONSOLE_LOG_LINES) or 0
+            )
+        except (TypeError, ValueError):
+            max_log_lines = 1000
+        return SagaConsoleOutput(
+            feedback,
+            progress_interval=interval,
+            console_interval=interval,
+            max_log_lines=max_log_lines,
+        )
+
+    @staticmethod
+    def sagaCmdPath():
+        """
+        Returns the resolved path to the saga_cmd executable, or None if it
+        cannot be found
+        """
+        if isWindows():
+            path = os.path.join(SagaUtils.sagaPath(), "saga_cmd.exe")
+        elif isMac() or platform.system() == "FreeBSD":
+            path = os.path.join(SagaUtils.sagaPath(), "saga_cmd")
+        else:
+            path = shutil.which("saga_cmd")
+
+        if not path or not os.path.isfile(path):
+            return None
+        return os.path.realpath(path)
+
+    @staticmethod
+    def sagaCmdFingerprint():
+        """
+        Returns a fingerprint of the saga_cmd executable, consisting of its
+        resolved path, size and modification time, or None if saga_cmd
+        cannot be found
+        """
+        path = SagaUtils.sagaCmdPath()
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return "{}|{}|{}".format(path, st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def versionCacheFilename():
+        """
+        Returns the full pathname of the on-disk SAGA version cache
+        """
+        return os.path.join(userFolder(), SagaUtils.VERSION_CACHE_FILENAME)
+
+    @staticmethod
+    def _readVersionCache() -> dict:
+        """
+        Reads the on-disk SAGA version cache
+        """
+        try:
+            with open(SagaUtils.versionCacheFilename(), encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    @staticmethod
+    def _writeVersionCache(fingerprint: str, version: str):
+        """
+        Stores a detected SAGA version in the on-disk cache, dropping
+        entries for saga_cmd executables which no longer exist
+        """
+        cache = {
+            k: v
+            for k, v in SagaUtils._readVersionCache().items()
+            if os.path.exists(k.split("|")[0])
+        }
+        cache[fingerprint] = version
+        filename = SagaUtils.versionCacheFilename()
+        temp_file = "{}.{}.tmp".format(filename, os.getpid())
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(temp_file, filename)
+        except OSError:
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+
     @staticmethod
     def getInstalledVersion(runSaga=False):
         """
-        Gets the installed SAGA version
+        Gets the installed SAGA version.
+
+        The detected version is cached for the session and on disk, keyed by
+        the fingerprint of the saga_cmd executable. If runSaga is True the
+        fingerprint is checked again, and SAGA is only run to detect the
+        version when the executable has changed.
         """
-        maxRetries = 5
-        retries = 0
         if SagaUtils._installedVersionFound and not runSaga:
             return SagaUtils._installed_version
 
+        fingerprint = SagaUtils.sagaCmdFingerprint()
+        if fingerprint is not None:
+            with SagaUtils._version_lock:
+                version = SagaUtils._version_cache.get(fingerprint)
+                if version is None:
+                    version = SagaUtils._readVersionCache().get(fingerprint)
+                    if version is not None:
+                        SagaUtils._version_cache[fingerprint] = version
+            if version is not None:
+                SagaUtils._installed_version = version
+                SagaUtils._installedVersionFound = True
+                return version
+
+        version = SagaUtils.runVersionProbe()
+        if version is not None and fingerprint is not None:
+            with SagaUtils._version_lock:
+                SagaUtils._version_cache[fingerprint] = version
+                SagaUtils._writeVersionCache(fingerprint, version)
+        return version
+
+    @staticmethod
+    def runVersionProbe():
+        """
+        Runs saga_cmd to detect the installed SAGA version
+        """
+        maxRetries = 5
+        retries = 0
+
         if isWindows():
             commands = [os.path.join(SagaUtils.sagaPath(), "saga_cmd.exe"), "-v"]
         elif isMac() or platform.system() == "FreeBSD":
@@ -211,56 +666,411 @@ class SagaUtils:
         return SagaUtils._installed_version
 
     @staticmethod
-    def executeSaga(feedback):
+    def batchJobCommand(batch_filename):
         """
-        Executes the saga command
+        Returns the shell command used to run a batch job file
         """
-
         if isWindows():
-            safeSagaBatchJobFilename = SagaUtils.make_path_safe(
-                SagaUtils.sagaBatchJobFilename()
-            )
+            safeSagaBatchJobFilename = SagaUtils.make_path_safe(batch_filename)
             command = ["cmd.exe", "/C ", safeSagaBatchJobFilename]
             command = " ".join(command)
         else:
             os.chmod(
-                SagaUtils.sagaBatchJobFilename(),
+                batch_filename,
                 stat.S_IEXEC | stat.S_IREAD | stat.S_IWRITE,
             )
-            command = ["'" + SagaUtils.sagaBatchJobFilename() + "'"]
-        loglines = [
-            QCoreApplication.translate("SagaUtils", "SAGA execution console output")
-        ]
-        with subprocess.Popen(
-            command,
+            command = ["'" + batch_filename + "'"]
+        return command
+
+    @staticmethod
+    def startBatchJob(batch_filename):
+        """
+        Starts running a saga batch job file in its own process group, so
+        that the shell and all saga_cmd processes it starts can be
+        terminated together
+        """
+        kwargs = {}
+        if isWindows():
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+            priority = SagaUtils.processPriority()
+            if priority == SagaUtils.PRIORITY_IDLE:
+                kwargs["creationflags"] |= subprocess.IDLE_PRIORITY_CLASS
+            elif priority == SagaUtils.PRIORITY_BELOW_NORMAL:
+                kwargs["creationflags"] |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+        else:
+            kwargs["start_new_session"] = True
+        return subprocess.Popen(  # pylint: disable=consider-using-with
+            SagaUtils.batchJobCommand(batch_filename),
             shell=True,
             stdout=subprocess.PIPE,
             stdin=subprocess.DEVNULL,
             stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        ) as proc:
+            **kwargs,
+        )
+
+    @staticmethod
+    def terminateProcessTree(proc, timeout: float = 5):
+        """
+        Terminates a batch job process started by startBatchJob together with
+        all of its child processes, escalating from SIGTERM to SIGKILL if the
+        processes have not exited after the timeout
+        """
+        if isWindows():
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False,
+            )
+            proc.wait()
+            return
+
+        # the batch job is the leader of its own process group
+        group = proc.pid
+        try:
+            os.killpg(group, signal.SIGTERM)
+        except ProcessLookupError:
+            proc.wait()
+            return
+
+        deadline = time.monotonic() + timeout
+        while True:
+            proc.poll()
             try:
-                for line in iter(proc.stdout.readline, ""):
-                    if "%" in line:
-                        s = "".join([x for x in line if x.isdigit()])
-                        try:
-                            feedback.setProgress(int(s))
-                        except:  # noqa   # pylint:disable=bare-except
-                            pass
-                    else:
-                        line = line.strip()
-                        if line in ("/", "-", "\\", "|"):
-                            continue
-
-                        loglines.append(line)
-                        feedback.pushConsoleInfo(line)
-            except:  # noqa  # pylint:disable=bare-except
-                pass
+                os.killpg(group, 0)
+            except ProcessLookupError:
+                break
+            if time.monotonic() >= deadline:
+                try:
+                    os.killpg(group, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                break
+            time.sleep(SagaUtils.CANCEL_POLL_INTERVAL)
+        proc.wait()
+
+    @staticmethod
+    def executeSaga(feedback, workspace=None) -> bool:
+        """
+        Executes the saga batch job file, from the given job workspace if
+        specified.
+
+        Returns False if execution was canceled.
+        """
+        run = SagaUtils.executeBatchJob(
+            SagaUtils.sagaBatchJobFilename(workspace), feedback
+        )
+        return not run.canceled
+
+    @staticmethod
+    def runProcess(batch_filename, feedback, consume, command=None):
+        """
+        Runs a saga batch job file, passing its raw output to the consume
+        function as it is produced, and returns a SagaCommandRun.
+
+        The feedback is polled for cancellation while the job runs, and if
+        it is canceled the job's whole process tree is terminated. Where
+        possible the job is waited for with os.wait4, to record the CPU time
+        and peak memory used by its process tree.
+        """
+        run = SagaCommandRun(command or os.path.basename(batch_filename))
+        chunks = queue.Queue()
+
+        def read(stream):
+            try:
+                for chunk in iter(lambda: stream.read1(65536), b""):
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+
+        with SagaUtils.startBatchJob(batch_filename) as proc:
+            reader = threading.Thread(target=read, args=(proc.stdout,), daemon=True)
+            reader.start()
+            try:
+                while True:
+                    if feedback.isCanceled():
+                        run.canceled = True
+                        SagaUtils.terminateProcessTree(proc)
+                        break
+                    try:
+                        chunk = chunks.get(timeout=SagaUtils.CANCEL_POLL_INTERVAL)
+                    except queue.Empty:
+                        continue
+                    if chunk is None:
+                        break
+                    consume(chunk)
+            finally:
+                reader.join()
+            while not chunks.empty():
+                chunk = chunks.get()
+                if chunk is not None:
+                    consume(chunk)
+
+            if proc.returncode is None and hasattr(os, "wait4"):
+                _, status, rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                run.setUsage(rusage)
+        run.return_code = proc.returncode
+        run.stop()
+        return run
+
+    @staticmethod
+    def executeBatchJob(batch_filename, feedback, command=None):
+        """
+        Executes a saga batch job file, reporting progress and console output
+        to the feedback object, and returns a SagaCommandRun
+        """
+        output = SagaUtils.consoleOutput(feedback)
+        try:
+            run = SagaUtils.runProcess(
+                batch_filename, feedback, output.feedBytes, command
+            )
+        finally:
+            output.finish()
+        run.console = list(output.loglines)
+
+        if run.canceled:
+            feedback.pushInfo(
+                QCoreApplication.translate("SagaUtils", "SAGA execution canceled")
+            )
+
+        if ProcessingConfig.getSetting(SagaUtils.SAGA_LOG_CONSOLE):
+            QgsMessageLog.logMessage(
+                "\n".join(
+                    [
+                        QCoreApplication.translate(
+                            "SagaUtils", "SAGA execution console output"
+                        ),
+                        output.logText(),
+                    ]
+                ),
+                "Processing",
+                Qgis.MessageLevel.Info,
+            )
+        return run
+
+    @staticmethod
+    def executeSagaCommands(commands, feedback, workspace, threads=None):
+        """
+        Executes SAGA commands one after the other, each in its own batch
+        job so that the resources used by each command can be recorded.
+
+        Returns a tuple of whether execution completed (i.e. was not
+        canceled) and the list of SagaCommandRun for the executed commands.
+        """
+        runs = []
+        for i, command in enumerate(commands):
+            batch_filename = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                [command], workspace, "saga_command_{}".format(i), threads
+            )
+            run = SagaUtils.executeBatchJob(batch_filename, feedback, command)
+            runs.append(run)
+            if run.canceled:
+                return False, runs
+        return True, runs
+
+    @staticmethod
+    def executeParallelCommands(
+        commands: dict, feedback, workspace, threads=0, name="saga_job"
+    ):
+        """
+        Runs a dictionary of independent commands in parallel saga_cmd
+        processes, dividing the threads (by default all cores) between them,
+        and yields a tuple of the key and SagaCommandRun of each command as
+        it finishes. Once execution is canceled, or the caller stops
+        consuming the results (e.g. because it raised), commands which have
+        not started are skipped.
+        """
+        workers = min(len(commands), SagaCoreScheduler.availableCores())
+        if workers == 0:
+            return
+        job_threads = max(1, threads // workers) if threads else 0
+
+        def run(key, index):
+            with SagaCoreScheduler.reserve(job_threads, workers) as reserved:
+                batch_filename = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                    [commands[key]],
+                    workspace,
+                    "{}_{}".format(name, index),
+                    reserved,
+                )
+                return SagaUtils.runBatchJob(batch_filename, feedback, commands[key])
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        futures = {
+            pool.submit(run, key, index): key for index, key in enumerate(commands)
+        }
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                result = future.result()
+                if result.canceled or feedback.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                yield futures[future], result
+        finally:
+            # only wait for the commands which are already running
+            for pending in futures:
+                pending.cancel()
+            pool.shutdown(wait=True)
+
+    @staticmethod
+    def splitImportCommands(commands, import_commands):
+        """
+        Splits a list of commands into the leading import commands, which do
+        not depend on each other, and the remaining commands
+        """
+        import_commands = set(import_commands)
+        count = 0
+        for command in commands:
+            if command not in import_commands:
+                break
+            count += 1
+        return commands[:count], commands[count:]
+
+    @staticmethod
+    def maxImportProcesses():
+        """
+        Returns the maximum number of import processes to run concurrently
+        """
+        try:
+            value = int(
+                ProcessingConfig.getSetting(SagaUtils.SAGA_MAX_IMPORT_PROCESSES) or 0
+            )
+        except (TypeError, ValueError):
+            value = 0
+        return value if value > 0 else (os.cpu_count() or 1)
+
+    @staticmethod
+    def runBatchJob(batch_filename, feedback, command=None):
+        """
+        Runs a saga batch job file without reporting progress, returning a
+        SagaCommandRun with its console output lines
+        """
+        if feedback.isCanceled():
+            run = SagaCommandRun(command or os.path.basename(batch_filename))
+            run.canceled = True
+            return run
+
+        chunks = []
+        run = SagaUtils.runProcess(batch_filename, feedback, chunks.append, command)
+        stdout = b"".join(chunks).decode(
+            locale.getpreferredencoding(False), errors="replace"
+        )
+        for line in SagaConsoleOutput.LINE_BREAK_RE.split(stdout):
+            _, text = SagaConsoleOutput.parseLine(line)
+            if text is not None:
+                run.console.append(text)
+        return run
+
+    @staticmethod
+    def executeSagaImports(commands, feedback, workspace):
+        """
+        Executes independent input import commands, running them through a
+        bounded pool of concurrent saga_cmd processes. Each import reserves
+        its share of the cores from the core scheduler, so that imports
+        are counted against the other jobs running at the same time.
+
+        Returns a tuple of whether execution completed (i.e. was not
+        canceled) and the list of SagaCommandRun for the executed imports.
+        """
+        max_workers = min(len(commands), SagaUtils.maxImportProcesses())
+        if max_workers <= 1:
+            if not commands:
+                return True, []
+            with SagaCoreScheduler.reserve() as threads:
+                return SagaUtils.executeSagaCommands(
+                    commands, feedback, workspace, threads
+                )
+
+        def run(index, command):
+            # concurrent imports share the cores between them
+            with SagaCoreScheduler.reserve(0, max_workers) as threads:
+                batch_filename = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                    [command], workspace, "saga_import_{}".format(index), threads
+                )
+                return SagaUtils.runBatchJob(batch_filename, feedback, command)
+
+        runs = []
+        loglines = [
+            QCoreApplication.translate("SagaUtils", "SAGA import console output")
+        ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(run, index, command)
+                for index, command in enumerate(commands)
+            ]
+            # feedback is only used from this thread, as each import finishes
+            for done, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1
+            ):
+                if future.cancelled():
+                    continue
+                run = future.result()
+                runs.append(run)
+                if run.canceled or feedback.isCanceled():
+                    # imports which have not started yet are skipped, and
+                    # running ones terminate themselves
+                    for pending in futures:
+                        pending.cancel()
+                    continue
+                for line in run.console:
+                    loglines.append(line)
+                    feedback.pushConsoleInfo(line)
+                feedback.setProgress(100 * done / len(futures))
 
         if ProcessingConfig.getSetting(SagaUtils.SAGA_LOG_CONSOLE):
             QgsMessageLog.logMessage(
                 "\n".join(loglines), "Processing", Qgis.MessageLevel.Info
             )
+        return not feedback.isCanceled(), runs
+
+    @staticmethod
+    def removeDataset(path: str):
+        """
+        Deletes a file written by SAGA, together with its sidecar files (e.g.
+        the .sdat, .mgrd and .prj files of a .sgrd grid)
+        """
+        if not path:
+            return
+
+        base, extension = os.path.splitext(path)
+        extension = extension.lower()
+        if extension in SagaUtils.GRID_EXTENSIONS:
+            paths = [base + ext for ext in SagaUtils.GRID_EXTENSIONS]
+        elif extension in SagaUtils.SHAPEFILE_EXTENSIONS:
+            paths = [base + ext for ext in SagaUtils.SHAPEFILE_EXTENSIONS]
+        else:
+            paths = [path]
+
+        for file in paths:
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+    @staticmethod
+    def moveDataset(path: str, destination: str):
+        """
+        Moves a file written by SAGA, together with its sidecar files, to
+        a new path (which may have a different extension of the same format,
+        e.g. .sdat for a .sgrd grid)
+        """
+        base, extension = os.path.splitext(path)
+        extension = extension.lower()
+        if extension in SagaUtils.GRID_EXTENSIONS:
+            extensions = SagaUtils.GRID_EXTENSIONS
+        elif extension in SagaUtils.SHAPEFILE_EXTENSIONS:
+            extensions = SagaUtils.SHAPEFILE_EXTENSIONS
+        else:
+            shutil.move(path, destination)
+            return
+
+        destination_base = os.path.splitext(destination)[0]
+        for ext in extensions:
+            if os.path.exists(base + ext):
+                shutil.move(base + ext, destination_base + ext)
 
     @staticmethod
     def make_path_safe(path: str) -> str:
@@ -0,0 +1,106 @@
+"""
+Export of vector inputs to shapefiles
+"""
+
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsProcessingException,
+    QgsVectorFileWriter,
+)
+
+from .exportcache import SagaExportCache
+
+
+class SagaVectorExport:
+    """
+    Exports vector inputs to the shapefiles SAGA reads.
+
+    Layers which are not plain shapefiles (e.g. GeoPackage layers, or
+    shapefiles with a subset string or selection) must be rewritten as
+    shapefiles for every run. Exports of file based layers are cached in
+    the vectors export cache instead, keyed by the files' fingerprints and
+    everything else which selects the exported features, so that runs of
+    several tools on the same layer export it once.
+    """
+
+    # files whose changes change a layer's features, besides the layer's
+    # file itself
+    SIDECAR_SUFFIXES = {".shp": [".dbf", ".shx"], ".gpkg": ["-wal"]}
+
+    @staticmethod
+    def sourcePath(source: str) -> str:
+        """
+        Returns the file path of an OGR layer source, without its layer
+        name and other options (e.g. "parcels.gpkg|layername=parcels")
+        """
+        return source.split("|")[0]
+
+    @staticmethod
+    def sourceFingerprint(source: str):
+        """
+        Returns a fingerprint of the files of an OGR layer source, or None
+        if the source is not file based
+        """
+        path = SagaVectorExport.sourcePath(source)
+        fingerprint = SagaExportCache.fileFingerprint(path)
+        if fingerprint is None:
+            return None
+
+        base, extension = os.path.splitext(path)
+        fingerprints = [fingerprint]
+        for suffix in SagaVectorExport.SIDECAR_SUFFIXES.get(extension.lower(), []):
+            sidecar = path + suffix if suffix.startswith("-") else base + suffix
+            fingerprints.append(SagaExportCache.fileFingerprint(sidecar))
+        return fingerprints
+
+    @staticmethod
+    def isShapefile(layer) -> bool:
+        """
+        Returns True if a layer is a complete shapefile, which SAGA reads
+        without exporting it
+        """
+        return (
+            layer.providerType() == "ogr"
+            and "|" not in layer.source()
+            and layer.source().lower().endswith(".shp")
+            and not layer.subsetString()
+        )
+
+    @staticmethod
+    def writeShapefile(source, destination: str, context, feedback, rect=None):
+        """
+        Writes the features of a feature source, or only those which
+        intersect a rectangle (in the source's CRS), to a shapefile.
+        Returns False if the export was canceled.
+        """
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "ESRI Shapefile"
+        options.fileEncoding = "UTF-8"
+        writer = QgsVectorFileWriter.create(
+            destination,
+            source.fields(),
+            source.wkbType(),
+            source.sourceCrs(),
+            context.transformContext(),
+            options,
+        )
+        if writer.hasError() != QgsVectorFileWriter.WriterError.NoError:
+            raise QgsProcessingException(
+                QCoreApplication.translate(
+                    "SagaVectorExport", "Could not create {}: {}"
+                ).format(destination, writer.errorMessage())
+            )
+
+        request = QgsFeatureRequest()
+        if rect is not None:
+            request.setFilterRect(rect)
+        for feature in source.getFeatures(request):
+            if feedback.isCanceled():
+                return False
+            writer.addFeature(feature)
+        # closes and flushes the shapefile
+        writer = None
+        return True
@@ -42,6 +42,8 @@ def getAlgParams(f):
                 pass
             elif line.startswith("AllowUnmatching"):
                 pass
+            elif line.startswith("Tileable"):
+                pass
             elif line.startswith("Extent"):
                 extentParamNames = line[6:].strip().split(" ")
                 params.extend(["-" + p for p in extentParamNames])
@@ -10,7 +10,6 @@ import os
 from qgis.PyQt.QtCore import QTranslator, QCoreApplication
 from qgis.core import QgsApplication
 from qgis.gui import QgisInterface
-from processing_saga_nextgen.processing.provider import SagaNextGenAlgorithmProvider
 
 
 class SagaNextGenProviderPlugin:
@@ -57,6 +56,12 @@ class SagaNextGenProviderPlugin:
 
     def initProcessing(self):
         """Create the Processing provider"""
+        # imported here so that loading the plugin does not pull in the whole
+        # processing provider until the provider is actually created
+        from processing_saga_nextgen.processing.provider import (  # pylint:disable=import-outside-toplevel
+            SagaNextGenAlgorithmProvider,
+        )
+
         self.provider = SagaNextGenAlgorithmProvider()
         QgsApplication.processingRegistry().addProvider(self.provider)
 
@@ -0,0 +1,435 @@
+"""
+Benchmarks for the SAGA provider.
+
+These are not run as part of the test suite. Run them from an environment
+where QGIS (and SAGA, for the execution benchmarks) is available with:
+
+    python -m processing_saga_nextgen.test.benchmarks [benchmark name ...]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from qgis.testing import start_app
+
+MODULE = "processing_saga_nextgen.test.benchmarks"
+
+
+def _resident_memory() -> int:
+    """
+    Returns the current resident set size of this process, in bytes
+    (or 0 where this cannot be determined)
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _run_isolated(benchmark: str, *args) -> dict:
+    """
+    Runs a benchmark helper in a fresh interpreter, so that timings and
+    memory use are not affected by earlier runs, and returns its JSON result
+    """
+    output = subprocess.run(
+        [sys.executable, "-m", MODULE, benchmark, *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _provider_load(mode: str):
+    """
+    Loads the provider's algorithms, with the provider's algorithm copies
+    either creating all their parameters when they are added ("eager") or
+    deferring them to the instances created from them ("deferred")
+    """
+    start_app()
+    # pylint: disable=import-outside-toplevel
+    from processing_saga_nextgen.processing.provider import (
+        SagaNextGenAlgorithmProvider,
+    )
+
+    SagaNextGenAlgorithmProvider.DEFER_PARAMETERS = mode == "deferred"
+    provider = SagaNextGenAlgorithmProvider()
+    rss_before = _resident_memory()
+    tracemalloc.start()
+    start = time.perf_counter()
+    provider.loadAlgorithms()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "algorithms": len(provider.algs),
+                "seconds": elapsed,
+                "python_peak_bytes": peak,
+                "rss_delta_bytes": _resident_memory() - rss_before,
+            }
+        )
+    )
+
+
+def benchmark_provider_load():
+    """
+    Compares provider load time and memory when the provider's algorithm
+    copies create their parameters against deferring them to the instances
+    created from them
+    """
+    results = [_run_isolated("_provider_load", mode) for mode in ("eager", "deferred")]
+    for result in results:
+        print(
+            "{mode:>8}: {algorithms} algorithms in {seconds:.3f}s, "
+            "python peak {python_peak_bytes} bytes, "
+            "rss +{rss_delta_bytes} bytes".format(**result)
+        )
+    eager, deferred = results
+    if deferred["seconds"]:
+        print("speedup: {:.1f}x".format(eager["seconds"] / deferred["seconds"]))
+
+
+def _import_time(module: str):
+    """
+    Measures the time taken to import a module of the plugin, and the time
+    it would take to also load all short help eagerly as used to be done
+    when importing the help package
+    """
+    # pylint: disable=import-outside-toplevel
+    import importlib
+    import qgis.core  # noqa: F401  # pylint: disable=unused-import
+
+    start = time.perf_counter()
+    importlib.import_module(module)
+    import_seconds = time.perf_counter() - start
+
+    from processing_saga_nextgen.help import compileShortHelp, loadShortHelp
+
+    start = time.perf_counter()
+    compileShortHelp()
+    help_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    loadShortHelp()
+    print(
+        json.dumps(
+            {
+                "module": module,
+                "import_seconds": import_seconds,
+                "eager_help_seconds": help_seconds,
+                "cached_help_seconds": time.perf_counter() - start,
+            }
+        )
+    )
+
+
+def benchmark_import_time():
+    """
+    Measures the plugin's import time, with the short help now loaded lazily,
+    against the cost of the eager help loading which used to happen on import
+    """
+    for module in (
+        "processing_saga_nextgen.saga_nextgen_plugin",
+        "processing_saga_nextgen.processing.provider",
+    ):
+        result = _run_isolated("_import_time", module)
+        print(
+            "{module}: import {import_seconds:.3f}s, "
+            "eager help load (previously done on import) {eager_help_seconds:.3f}s, "
+            "help load from compiled cache {cached_help_seconds:.3f}s".format(**result)
+        )
+
+
+def benchmark_concurrent_threads():
+    """
+    Measures the throughput of several SAGA jobs running at the same time,
+    with every saga_cmd using all cores against sharing the cores between
+    the jobs.
+
+    Uses the DEM given by the SAGANG_BENCHMARK_DEM environment variable (a
+    SAGA grid), and the number of concurrent jobs given by
+    SAGANG_BENCHMARK_JOBS (default 4).
+    """
+    start_app()
+    # pylint: disable=import-outside-toplevel
+    import concurrent.futures
+    import tempfile
+
+    from processing_saga_nextgen.processing.scheduler import SagaCoreScheduler
+    from processing_saga_nextgen.processing.utils import SagaUtils
+
+    dem = os.environ.get("SAGANG_BENCHMARK_DEM")
+    if not dem:
+        print("set SAGANG_BENCHMARK_DEM to the path of a SAGA grid")
+        return
+    jobs = int(os.environ.get("SAGANG_BENCHMARK_JOBS", "4"))
+
+    def run_jobs(scheduled: bool) -> float:
+        with tempfile.TemporaryDirectory() as temp_dir:
+
+            def job(i):
+                command = 'ta_morphometry 0 -ELEVATION "{}" -SLOPE "{}"'.format(
+                    dem, os.path.join(temp_dir, "slope_{}.sgrd".format(i))
+                )
+                workspace = SagaUtils.createJobWorkspace()
+                try:
+                    if scheduled:
+                        with SagaCoreScheduler.reserve(0, jobs) as threads:
+                            batch_file = (
+                                SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                                    [command], workspace, threads=threads
+                                )
+                            )
+                            SagaUtils.runBatchJob(batch_file, _NoFeedback())
+                    else:
+                        batch_file = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                            [command], workspace
+                        )
+                        SagaUtils.runBatchJob(batch_file, _NoFeedback())
+                finally:
+                    workspace.cleanup()
+
+            start = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(job, range(jobs)))
+            return time.perf_counter() - start
+
+    for label, scheduled in (("all cores per job", False), ("shared cores", True)):
+        seconds = run_jobs(scheduled)
+        print(
+            "{}: {} jobs in {:.3f}s, {:.2f} jobs/s".format(
+                label, jobs, seconds, jobs / seconds
+            )
+        )
+
+
+def benchmark_import_export_optimization():
+    """
+    Measures running a SAGA tool on a GeoTIFF DEM, importing it to a SAGA
+    grid with io_gdal first against passing it to SAGA directly (as is done
+    when import/export optimizations are enabled).
+
+    Uses the GeoTIFF given by the SAGANG_BENCHMARK_GEOTIFF environment
+    variable, which should be large enough for the import to matter.
+    """
+    start_app()
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+
+    from processing_saga_nextgen.processing.SagaAlgorithm import SagaAlgorithm
+    from processing_saga_nextgen.processing.utils import SagaUtils
+
+    dem = os.environ.get("SAGANG_BENCHMARK_GEOTIFF")
+    if not dem:
+        print("set SAGANG_BENCHMARK_GEOTIFF to the path of a GeoTIFF DEM")
+        return
+
+    def run(direct: bool) -> float:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            commands = []
+            elevation = dem
+            if not direct:
+                elevation = os.path.join(temp_dir, "dem.sgrd")
+                commands.append(
+                    'io_gdal 0 {} -GRIDS "{}" -FILES "{}"'.format(
+                        SagaAlgorithm.RASTER_EXPORT_OPTIONS, elevation, dem
+                    )
+                )
+            commands.append(
+                'ta_morphometry 0 -ELEVATION "{}" -SLOPE "{}"'.format(
+                    elevation, os.path.join(temp_dir, "slope.sgrd")
+                )
+            )
+            workspace = SagaUtils.createJobWorkspace()
+            try:
+                batch_file = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                    commands, workspace
+                )
+                start = time.perf_counter()
+                SagaUtils.runBatchJob(batch_file, _NoFeedback())
+                return time.perf_counter() - start
+            finally:
+                workspace.cleanup()
+
+    size = os.path.getsize(dem) / 1024 / 1024
+    for label, direct in (("io_gdal import", False), ("direct input", True)):
+        seconds = min(run(direct) for _ in range(3))
+        print("{}: {:.3f}s ({:.1f} MiB GeoTIFF)".format(label, seconds, size))
+
+
+def benchmark_gdal_export():
+    """
+    Measures exporting rasters to SAGA grids with io_gdal, through one
+    saga_cmd process per input, against exporting them in-process with
+    GDAL on a thread pool.
+
+    Uses the GeoTIFF given by the SAGANG_BENCHMARK_GEOTIFF environment
+    variable, exported SAGANG_BENCHMARK_INPUTS times (default 4).
+    """
+    start_app()
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+
+    from processing_saga_nextgen.processing.SagaAlgorithm import SagaAlgorithm
+    from processing_saga_nextgen.processing.gdalexport import SagaGdalExport
+    from processing_saga_nextgen.processing.utils import SagaUtils
+
+    source = os.environ.get("SAGANG_BENCHMARK_GEOTIFF")
+    if not source:
+        print("set SAGANG_BENCHMARK_GEOTIFF to the path of a GeoTIFF")
+        return
+    if not SagaGdalExport.available():
+        print("GDAL's SAGA driver is not available")
+        return
+    inputs = int(os.environ.get("SAGANG_BENCHMARK_INPUTS", "4"))
+
+    def run(in_process: bool) -> float:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            exports = {}
+            for i in range(inputs):
+                destination = os.path.join(temp_dir, "input_{}.sgrd".format(i))
+                command = 'io_gdal 0 {} -GRIDS "{}" -FILES "{}"'.format(
+                    SagaAlgorithm.RASTER_EXPORT_OPTIONS, destination, source
+                )
+                exports[command] = (source, destination)
+
+            workspace = SagaUtils.createJobWorkspace()
+            try:
+                start = time.perf_counter()
+                commands = list(exports)
+                if in_process:
+                    commands, _ = SagaGdalExport.exportRasters(
+                        commands, exports, _NoFeedback()
+                    )
+                SagaUtils.executeSagaImports(commands, _NoFeedback(), workspace)
+                return time.perf_counter() - start
+            finally:
+                workspace.cleanup()
+
+    for label, in_process in (("io_gdal", False), ("in-process GDAL", True)):
+        seconds = min(run(in_process) for _ in range(3))
+        print(
+            "{}: {} inputs in {:.3f}s, {:.3f}s per input".format(
+                label, inputs, seconds, seconds / inputs
+            )
+        )
+
+
+def benchmark_grid_alignment():
+    """
+    Measures aligning a raster to a reference grid by warping it to a full
+    copy and exporting the copy, as when running the warps by hand, against
+    exporting a virtual warped raster, which resamples it during the export.
+
+    Uses the GeoTIFF given by the SAGANG_BENCHMARK_GEOTIFF environment
+    variable, aligned to a grid shifted by half a cell with cells 1.5 times
+    as large.
+    """
+    start_app()
+    # pylint: disable=import-outside-toplevel
+    import tempfile
+
+    from osgeo import gdal
+
+    from processing_saga_nextgen.processing.alignment import SagaGrid
+    from processing_saga_nextgen.processing.gdalexport import SagaGdalExport
+
+    source = os.environ.get("SAGANG_BENCHMARK_GEOTIFF")
+    if not source:
+        print("set SAGANG_BENCHMARK_GEOTIFF to the path of a GeoTIFF")
+        return
+    if not SagaGdalExport.available():
+        print("GDAL's SAGA driver is not available")
+        return
+
+    dataset = gdal.Open(source)
+    x, cell_width, _, y, _, cell_height = dataset.GetGeoTransform()
+    width = int(dataset.RasterXSize / 1.5)
+    height = int(dataset.RasterYSize / 1.5)
+    x += cell_width / 2
+    y += cell_height / 2
+    grid = SagaGrid(
+        x,
+        x + width * cell_width * 1.5,
+        y + height * cell_height * 1.5,
+        y,
+        width,
+        height,
+        dataset.GetProjection(),
+    )
+    dataset = None
+
+    def run(virtual: bool) -> float:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            start = time.perf_counter()
+            if virtual:
+                aligned = os.path.join(temp_dir, "aligned.vrt")
+                grid.writeWarpedView(source, aligned, "bilinear")
+            else:
+                aligned = os.path.join(temp_dir, "aligned.tif")
+                gdal.Warp(
+                    aligned,
+                    source,
+                    outputBounds=(grid.xmin, grid.ymin, grid.xmax, grid.ymax),
+                    width=grid.width,
+                    height=grid.height,
+                    resampleAlg="bilinear",
+                )
+            run = SagaGdalExport.exportRaster(
+                aligned, os.path.join(temp_dir, "aligned.sgrd")
+            )
+            seconds = time.perf_counter() - start
+            if run.return_code != 0:
+                print("\n".join(run.console))
+            return seconds
+
+    for label, virtual in (("warp, then export", False), ("warped VRT", True)):
+        seconds = min(run(virtual) for _ in range(3))
+        print("{}: {:.3f}s".format(label, seconds))
+
+
+class _NoFeedback:
+    """
+    Feedback for benchmark jobs, which are never canceled and discard
+    their output
+    """
+
+    def isCanceled(self):  # pylint: disable=missing-function-docstring
+        return False
+
+    def pushConsoleInfo(self, info):  # pylint: disable=missing-function-docstring
+        pass
+
+    def pushWarning(self, warning):  # pylint: disable=missing-function-docstring
+        pass
+
+    def setProgress(self, progress):  # pylint: disable=missing-function-docstring
+        pass
+
+
+BENCHMARKS = {
+    "provider_load": benchmark_provider_load,
+    "import_time": benchmark_import_time,
+    "concurrent_threads": benchmark_concurrent_threads,
+    "import_export_optimization": benchmark_import_export_optimization,
+    "gdal_export": benchmark_gdal_export,
+    "grid_alignment": benchmark_grid_alignment,
+}
+
+HELPERS = {"_provider_load": _provider_load, "_import_time": _import_time}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in HELPERS:
+        HELPERS[sys.argv[1]](*sys.argv[2:])
+    else:
+        for benchmark_name in sys.argv[1:] or BENCHMARKS.keys():
+            print("--- {} ---".format(benchmark_name))
+            BENCHMARKS[benchmark_name]()
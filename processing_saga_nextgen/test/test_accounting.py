@@ -0,0 +1,63 @@
+"""
+Test resource accounting
+"""
+
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.accounting import (
+    SagaCommandRun,
+    SagaRunSummary,
+)
+
+
+class AccountingTests(TestCase):
+    """
+    Test resource accounting
+    """
+
+    def test_summary(self):
+        """
+        Test summarizing the resources used by a run's commands
+        """
+        run1 = SagaCommandRun('io_gdal 0 -GRIDS "a.sgrd" -FILES "a.tif"')
+        run1.wall_seconds = 1.5
+        run1.setUsage(SimpleNamespace(ru_utime=1, ru_stime=0.25, ru_maxrss=1024))
+        run2 = SagaCommandRun('ta_morphometry "0" -ELEVATION "a.sgrd"')
+        run2.wall_seconds = 2.5
+        run2.user_seconds = 4
+        run2.system_seconds = 0.5
+        run2.peak_rss_bytes = 2**40
+
+        summary = SagaRunSummary("sagang:slopeaspectcurvature")
+        summary.add([run1, run2])
+        report = summary.toDict()
+        self.assertEqual(report["algorithm"], "sagang:slopeaspectcurvature")
+        self.assertEqual(len(report["commands"]), 2)
+        self.assertEqual(report["total"]["wall_seconds"], 4)
+        self.assertEqual(report["total"]["user_seconds"], 5)
+        self.assertEqual(report["total"]["peak_rss_bytes"], 2**40)
+        self.assertEqual(
+            summary.lines()[1],
+            'ta_morphometry "0": 2.50s, CPU 4.00s user + 0.50s system, '
+            "peak memory 1048576.0 MiB",
+        )
+
+        # usage which could not be measured is not totalled
+        run2.user_seconds = None
+        self.assertIsNone(summary.toDict()["total"]["user_seconds"])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "summary.jsonl")
+            with mock.patch.dict(
+                os.environ, {SagaRunSummary.ENVIRONMENT_VARIABLE: path}
+            ):
+                summary.write()
+                summary.write()
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertEqual(json.loads(lines[0])["total"]["wall_seconds"], 4)
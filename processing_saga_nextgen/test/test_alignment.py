@@ -0,0 +1,55 @@
+"""
+Test alignment of raster inputs to a common grid
+"""
+
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.alignment import SagaGrid
+
+
+class AlignmentTests(TestCase):
+    """
+    Test alignment of raster inputs to a common grid
+    """
+
+    def test_cell_size(self):
+        """
+        Test grid cell sizes
+        """
+        grid = SagaGrid(1000, 2000, 5000, 5500, 100, 25, "EPSG:2056")
+        self.assertEqual(grid.cellSize(), (10, 20))
+
+    def test_matches(self):
+        """
+        Test matching grid systems
+        """
+        grid = SagaGrid(1000, 2000, 5000, 5500, 100, 50, "EPSG:2056")
+        self.assertTrue(
+            grid.matches(SagaGrid(1000, 2000, 5000, 5500, 100, 50, "EPSG:2056"))
+        )
+        # within the tolerance of floating point extents
+        self.assertTrue(
+            grid.matches(
+                SagaGrid(1000.0000001, 2000, 5000, 5500.0000001, 100, 50, "EPSG:2056")
+            )
+        )
+
+        # shifted by part of a cell
+        self.assertFalse(
+            grid.matches(SagaGrid(1005, 2005, 5000, 5500, 100, 50, "EPSG:2056"))
+        )
+        # different resolution
+        self.assertFalse(
+            grid.matches(SagaGrid(1000, 2000, 5000, 5500, 200, 100, "EPSG:2056"))
+        )
+        # different CRS
+        self.assertFalse(
+            grid.matches(SagaGrid(1000, 2000, 5000, 5500, 100, 50, "EPSG:21781"))
+        )
+
+    def test_to_list(self):
+        """
+        Test grids as lists, for export cache keys
+        """
+        grid = SagaGrid(1000, 2000, 5000, 5500, 100, 50, "EPSG:2056")
+        self.assertEqual(grid.toList(), [1000, 2000, 5000, 5500, 100, 50, "EPSG:2056"])
@@ -0,0 +1,107 @@
+"""
+Test per-band execution of multiband rasters
+"""
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.bands import SagaBandExecution
+from processing_saga_nextgen.processing.jobs import SagaJobWorkspace
+from processing_saga_nextgen.processing.tiffoutput import SagaTiffOutput
+from processing_saga_nextgen.processing.utils import SagaUtils
+
+
+class FakeFeedback:
+    """
+    Records the progress reported to it
+    """
+
+    def __init__(self):
+        self.progress = []
+
+    def isCanceled(self):  # pylint: disable=missing-function-docstring
+        return False
+
+    def setProgress(self, progress):  # pylint: disable=missing-function-docstring
+        self.progress.append(progress)
+
+
+def fake_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+    """
+    Writes the grid named by the command's -RESULT
+    """
+    output = command.split("-RESULT ")[1].split()[0]
+    for extension in (".sgrd", ".sdat"):
+        with open(os.path.splitext(output)[0] + extension, "w", encoding="utf-8"):
+            pass
+    return SagaCommandRun(command)
+
+
+class BandExecutionTests(TestCase):
+    """
+    Test per-band execution of multiband rasters
+    """
+
+    def test_band_outputs(self):
+        """
+        Test the paths of each band's outputs
+        """
+        self.assertEqual(
+            SagaBandExecution.bandPath("/data/slope.sdat", 2), "/data/slope_band2.sdat"
+        )
+        execution = SagaBandExecution(
+            3,
+            {"INPUT": "rgb.tif"},
+            {"RESULT": "/data/out.sdat"},
+            None,
+            False,
+            SagaTiffOutput(),
+        )
+        self.assertEqual(
+            execution.bandOutputs(),
+            {
+                "RESULT": [
+                    "/data/out_band1.sdat",
+                    "/data/out_band2.sdat",
+                    "/data/out_band3.sdat",
+                ]
+            },
+        )
+        execution.stack = True
+        self.assertEqual(execution.bandOutputs(), {})
+
+    def test_run(self):
+        """
+        Test running each band and moving its outputs into place
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaBandExecution, "writeBandView"),
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+        ):
+            workspace = SagaJobWorkspace(os.path.join(temp_dir, "jobs"))
+            output = os.path.join(temp_dir, "out.sdat")
+            execution = SagaBandExecution(
+                3,
+                {"INPUT": "rgb.tif"},
+                {"RESULT": output},
+                workspace,
+                False,
+                SagaTiffOutput(),
+            )
+            feedback = FakeFeedback()
+            completed, runs = execution.run(
+                lambda inputs, outputs: "filter 0 -INPUT {} -RESULT {}".format(
+                    inputs["INPUT"], outputs["RESULT"]
+                ),
+                feedback,
+            )
+
+            self.assertTrue(completed)
+            self.assertEqual(len(runs), 3)
+            self.assertEqual(feedback.progress[-1], 100)
+            for path in execution.bandOutputs()["RESULT"]:
+                self.assertTrue(os.path.exists(path))
+                self.assertTrue(os.path.exists(os.path.splitext(path)[0] + ".sgrd"))
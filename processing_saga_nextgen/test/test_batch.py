@@ -0,0 +1,323 @@
+"""
+Test batch execution
+"""
+
+import os
+import tempfile
+import threading
+import uuid
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.batch import SagaBatchExecutor
+from processing_saga_nextgen.processing.profiling import SagaTrace
+from processing_saga_nextgen.processing.SagaAlgorithm import SagaAlgorithm
+from processing_saga_nextgen.processing.utils import SagaUtils
+
+
+class FakeFeedback:
+    """
+    Records the errors reported to it
+    """
+
+    def __init__(self):
+        self.errors = []
+
+    def isCanceled(self):  # pylint: disable=missing-function-docstring
+        return False
+
+    def reportError(self, error, fatalError=False):  # pylint: disable=missing-function-docstring,unused-argument
+        self.errors.append(error)
+
+    def pushInfo(self, info):  # pylint: disable=missing-function-docstring
+        pass
+
+    def setProgress(self, progress):  # pylint: disable=missing-function-docstring
+        pass
+
+
+class FakeLayer:
+    """
+    A single band raster layer read by GDAL
+    """
+
+    def __init__(self, source):
+        self._source = source
+
+    def source(self):  # pylint: disable=missing-function-docstring
+        return self._source
+
+    def name(self):  # pylint: disable=missing-function-docstring
+        return os.path.splitext(os.path.basename(self._source))[0]
+
+    def bandCount(self):  # pylint: disable=missing-function-docstring
+        return 1
+
+    def providerType(self):  # pylint: disable=missing-function-docstring
+        return "gdal"
+
+
+class FakeAlgorithm:
+    """
+    An algorithm which exports its INPUT, with SagaAlgorithm's raster
+    export, and writes to its OUTPUT
+    """
+
+    RASTER_EXPORT_OPTIONS = SagaAlgorithm.RASTER_EXPORT_OPTIONS
+    exportRasterLayer = SagaAlgorithm.exportRasterLayer
+    rasterExportKey = SagaAlgorithm.rasterExportKey
+    canReadRasterDirectly = SagaAlgorithm.canReadRasterDirectly
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.pendingExports = {}
+        self.sharedExports = {}
+        self.usedExports = []
+        self.exportedLayers = {}
+        self.exportedFiles = []
+        self.gdalExports = {}
+        self.bandInputs = {}
+        self.tiffOutputs = {}
+        self.alignGrid = None
+        self.trace = SagaTrace(None)
+
+    def tr(self, string):  # pylint: disable=missing-function-docstring
+        return string
+
+    def id(self):  # pylint: disable=missing-function-docstring
+        return "sagang:fake"
+
+    def create(self):  # pylint: disable=missing-function-docstring
+        return FakeAlgorithm(self.folder)
+
+    def checkInstalledVersion(self, feedback):  # pylint: disable=missing-function-docstring
+        pass
+
+    def checkParameterValues(self, parameters, context):  # pylint: disable=missing-function-docstring,unused-argument
+        if parameters["INPUT"] is None:
+            return False, "No input"
+        return True, ""
+
+    def prepareCommands(self, parameters, context, feedback, workspace):  # pylint: disable=missing-function-docstring,unused-argument
+        output = os.path.join(self.folder, parameters["OUTPUT"])
+        command = self.exportRasterLayer(
+            "INPUT", FakeLayer(os.path.join(self.folder, parameters["INPUT"]))
+        )
+        return (
+            [command] if command else [],
+            [
+                'tool 0 -INPUT "{}" -OUTPUT {}'.format(
+                    self.exportedLayers["INPUT"], output
+                )
+            ],
+            (None, [output], {"OUTPUT": output}, {}),
+        )
+
+    def finalizeOutputs(self, crs, output_layers, output_files, output_files_nonascii):  # pylint: disable=missing-function-docstring,unused-argument
+        return dict(output_files)
+
+
+def fake_imports(commands, feedback, workspace):  # pylint: disable=unused-argument
+    """
+    Creates the exported grids of import commands
+    """
+    for command in commands:
+        grid = command.split('-GRIDS "')[1].split('"')[0]
+        export(grid)
+    return True, []
+
+
+def export(grid):
+    """
+    Simulates an export, writing a grid's files
+    """
+    for extension in (".sgrd", ".sdat"):
+        with open(os.path.splitext(grid)[0] + extension, "wb") as f:
+            f.write(b"0")
+
+
+def temp_filename(folder):
+    """
+    Returns a fake QgsProcessingUtils.generateTempFilename for a folder
+    """
+    return lambda name: os.path.join(folder, uuid.uuid4().hex + "_" + name)
+
+
+def fake_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+    """
+    Creates the output of a batch item, unless it is the failing item
+    """
+    with open(batch_filename, encoding="utf-8") as f:
+        output = f.read().split("-OUTPUT ")[1].split()[0]
+    if "fail" not in output:
+        with open(output, "w", encoding="utf-8"):
+            pass
+    run = SagaCommandRun("tool 0")
+    run.console = ["ran {}".format(os.path.basename(output))]
+    return run
+
+
+class BatchTests(TestCase):
+    """
+    Test batch execution
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.temp_dir.cleanup)
+        self.folder = self.temp_dir.name
+        for name in ("a.tif", "b.tif"):
+            with open(os.path.join(self.folder, name), "wb") as f:
+                f.write(b"0")
+
+        self.temp_folder = os.path.join(self.folder, "temp")
+        os.makedirs(self.temp_folder)
+        utils = mock.patch(
+            "processing_saga_nextgen.processing.SagaAlgorithm.QgsProcessingUtils"
+        ).start()
+        utils.generateTempFilename.side_effect = temp_filename(self.temp_folder)
+        self.cache_budget = mock.patch.object(
+            SagaUtils, "exportCacheBudget", return_value=0
+        ).start()
+        for name, value in (
+            ("sagaJobFolder", self.folder),
+            ("exportCacheFolder", os.path.join(self.folder, "cache")),
+            ("importExportOptimization", False),
+            ("rasterExportBackend", SagaUtils.EXPORT_BACKEND_SAGA),
+            ("getInstalledVersion", "9.0.0"),
+        ):
+            mock.patch.object(SagaUtils, name, return_value=value).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_batch(self):
+        """
+        Test running a batch with shared inputs and failing items
+        """
+        with (
+            mock.patch.object(
+                SagaUtils, "executeSagaImports", side_effect=fake_imports
+            ) as imports,
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+        ):
+            feedback = FakeFeedback()
+            executor = SagaBatchExecutor(
+                FakeAlgorithm(self.folder), context=object(), feedback=feedback
+            )
+            results = list(
+                executor.run(
+                    [
+                        {"INPUT": "a.tif", "OUTPUT": "1.sdat"},
+                        {"INPUT": "a.tif", "OUTPUT": "2.sdat"},
+                        {"INPUT": None, "OUTPUT": "3.sdat"},
+                        {"INPUT": "b.tif", "OUTPUT": "fail.sdat"},
+                    ]
+                )
+            )
+
+        # each distinct input is only exported once, without the cache
+        self.assertEqual(
+            [
+                os.path.basename(command.split()[-1].strip('"'))
+                for command in imports.call_args[0][0]
+            ],
+            ["a.tif", "b.tif"],
+        )
+        # and the temporary exports are removed once the batch ran
+        self.assertEqual(os.listdir(self.temp_folder), [])
+
+        results = {result.index: result for result in results}
+        self.assertEqual(len(results), 4)
+        self.assertTrue(results[0].succeeded())
+        self.assertEqual(
+            results[1].results, {"OUTPUT": os.path.join(self.folder, "2.sdat")}
+        )
+        self.assertEqual(results[1].console, ["ran 2.sdat"])
+        self.assertEqual(results[2].error, "No input")
+        self.assertIn("did not create any outputs", results[3].error)
+
+        statistics = executor.statistics()
+        self.assertEqual(statistics["items"], 4)
+        self.assertEqual(statistics["succeeded"], 2)
+        self.assertEqual(statistics["failed"], 2)
+        self.assertEqual(len(feedback.errors), 2)
+
+    def test_batch_cache(self):
+        """
+        Test that batches commit their exports to the export cache, and
+        reuse the exports of earlier batches
+        """
+        self.cache_budget.return_value = 1000000
+        parameter_sets = [
+            {"INPUT": "a.tif", "OUTPUT": "1.sdat"},
+            {"INPUT": "a.tif", "OUTPUT": "2.sdat"},
+        ]
+        with (
+            mock.patch.object(
+                SagaUtils, "executeSagaImports", side_effect=fake_imports
+            ) as imports,
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+        ):
+            executor = SagaBatchExecutor(
+                FakeAlgorithm(self.folder), context=object(), feedback=FakeFeedback()
+            )
+            results = list(executor.run(parameter_sets))
+            self.assertTrue(all(result.succeeded() for result in results))
+            self.assertEqual(len(imports.call_args[0][0]), 1)
+
+            results = list(executor.run(parameter_sets))
+            self.assertTrue(all(result.succeeded() for result in results))
+            self.assertEqual(imports.call_args[0][0], [])
+
+        # the cached export is kept, but no longer pinned
+        cache = os.path.join(self.folder, "cache", "rasters")
+        entries = [
+            name
+            for name in os.listdir(cache)
+            if os.path.isdir(os.path.join(cache, name))
+        ]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(cache, entries[0]))), ["a.sdat", "a.sgrd"]
+        )
+
+    def test_batch_closed(self):
+        """
+        Test that items which have not started are skipped once the caller
+        stops consuming the results
+        """
+        release = threading.Event()
+        ran = []
+
+        def run(batch_filename, feedback, command=None):
+            result = fake_run(batch_filename, feedback, command)
+            ran.append(result.console[0])
+            if result.console[0] != "ran 1.sdat":
+                release.wait(5)
+            return result
+
+        with (
+            mock.patch.object(
+                SagaUtils, "executeSagaImports", side_effect=fake_imports
+            ),
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=run),
+        ):
+            executor = SagaBatchExecutor(
+                FakeAlgorithm(self.folder),
+                context=object(),
+                feedback=FakeFeedback(),
+                max_workers=1,
+            )
+            results = executor.run(
+                [
+                    {"INPUT": "a.tif", "OUTPUT": "{}.sdat".format(index)}
+                    for index in range(1, 4)
+                ]
+            )
+            self.assertTrue(next(results).succeeded())
+            timer = threading.Timer(0.1, release.set)
+            timer.start()
+            results.close()
+            timer.join()
+
+        self.assertNotIn("ran 3.sdat", ran)
+        self.assertEqual(os.listdir(self.temp_folder), [])
@@ -0,0 +1,69 @@
+"""
+Test clipping of inputs to the output extent
+"""
+
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.clipping import SagaClipping
+
+
+class ClippingTests(TestCase):
+    """
+    Test clipping of inputs to the output extent
+    """
+
+    # a 1000 x 500 raster of 10 unit cells, with its top left corner at
+    # (1000, 9000)
+    GEOTRANSFORM = (1000, 10, 0, 9000, 0, -10)
+
+    def test_raster_window(self):
+        """
+        Test the window of cells covering an extent
+        """
+        window = SagaClipping.rasterWindow(
+            self.GEOTRANSFORM, 1000, 500, (2000, 3000, 6000, 7000), 0
+        )
+        self.assertEqual(window, (100, 200, 100, 100))
+
+        # extended by the margin
+        window = SagaClipping.rasterWindow(
+            self.GEOTRANSFORM, 1000, 500, (2000, 3000, 6000, 7000), 5
+        )
+        self.assertEqual(window, (95, 195, 110, 110))
+
+        # partial cells are included
+        window = SagaClipping.rasterWindow(
+            self.GEOTRANSFORM, 1000, 500, (2005, 2995, 6005, 6995), 0
+        )
+        self.assertEqual(window, (100, 200, 100, 100))
+
+    def test_raster_window_edges(self):
+        """
+        Test windows at and beyond the raster's edges
+        """
+        # clamped to the raster
+        window = SagaClipping.rasterWindow(
+            self.GEOTRANSFORM, 1000, 500, (0, 2000, 8500, 10000), 5
+        )
+        self.assertEqual(window, (0, 0, 105, 55))
+
+        # covering the whole raster
+        self.assertIsNone(
+            SagaClipping.rasterWindow(
+                self.GEOTRANSFORM, 1000, 500, (0, 20000, 0, 10000), 0
+            )
+        )
+
+        # not overlapping the raster
+        self.assertIsNone(
+            SagaClipping.rasterWindow(
+                self.GEOTRANSFORM, 1000, 500, (20000, 30000, 6000, 7000), 0
+            )
+        )
+
+        # rotated rasters are not clipped
+        self.assertIsNone(
+            SagaClipping.rasterWindow(
+                (1000, 10, 1, 9000, 1, -10), 1000, 500, (2000, 3000, 6000, 7000), 0
+            )
+        )
@@ -0,0 +1,106 @@
+"""
+Test saga console output parsing
+"""
+
+import io
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.console import SagaConsoleOutput
+
+
+class FakeFeedback:
+    """
+    Records the progress and console output reported to it
+    """
+
+    def __init__(self):
+        self.progress = []
+        self.console = []
+
+    def setProgress(self, progress):  # pylint: disable=missing-function-docstring
+        self.progress.append(progress)
+
+    def pushConsoleInfo(self, text):  # pylint: disable=missing-function-docstring
+        self.console.append(text)
+
+
+class FakeClock:
+    """
+    A manually advanced clock
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConsoleOutputTests(TestCase):
+    """
+    Test saga console output parsing
+    """
+
+    def test_parse_line(self):
+        """
+        Test classifying lines of output
+        """
+        self.assertEqual(SagaConsoleOutput.parseLine("42%"), (42, None))
+        self.assertEqual(SagaConsoleOutput.parseLine("  7 %"), (7, None))
+        self.assertEqual(SagaConsoleOutput.parseLine("[100%]"), (100, None))
+        self.assertEqual(SagaConsoleOutput.parseLine("|"), (None, None))
+        self.assertEqual(SagaConsoleOutput.parseLine("   "), (None, None))
+        self.assertEqual(
+            SagaConsoleOutput.parseLine(" 12% of cells are no-data "),
+            (None, "12% of cells are no-data"),
+        )
+
+    def test_chunks(self):
+        """
+        Test parsing output split arbitrarily into chunks
+        """
+        feedback = FakeFeedback()
+        output = SagaConsoleOutput(feedback, progress_interval=0, console_interval=0)
+        output.feed("tool: Slo")
+        output.feed("pe\r\n 1")
+        output.feed("0%\r 20%\r20%\r")
+        output.feed("done")
+        output.finish()
+        self.assertEqual(feedback.progress, [20])
+        self.assertEqual(feedback.console, ["tool: Slope", "done"])
+
+    def test_throttling(self):
+        """
+        Test that progress and console output are throttled
+        """
+        feedback = FakeFeedback()
+        clock = FakeClock()
+        output = SagaConsoleOutput(
+            feedback, progress_interval=1, console_interval=1, clock=clock
+        )
+        output.feed("".join("{}%\r".format(i) for i in range(50)) + "a\nb\n")
+        self.assertEqual(feedback.progress, [49])
+        self.assertEqual(feedback.console, ["a\nb"])
+
+        clock.now = 0.5
+        output.feed("".join("{}%\r".format(i) for i in range(50, 80)) + "c\n")
+        self.assertEqual(feedback.progress, [49])
+        self.assertEqual(feedback.console, ["a\nb"])
+
+        clock.now = 1.5
+        output.feed("90%\r")
+        self.assertEqual(feedback.progress, [49, 90])
+        self.assertEqual(feedback.console, ["a\nb", "c"])
+
+        output.feed("100%\rd\n")
+        output.finish()
+        self.assertEqual(feedback.progress, [49, 90, 100])
+        self.assertEqual(feedback.console, ["a\nb", "c", "d"])
+
+    def test_log_lines(self):
+        """
+        Test that only the most recent lines are kept for the log
+        """
+        output = SagaConsoleOutput(FakeFeedback(), max_log_lines=2)
+        output.readStream(io.BytesIO(b"one\ntwo\n50%\rthree\nfour"))
+        self.assertEqual(output.logText(), "[2 earlier lines omitted]\nthree\nfour")
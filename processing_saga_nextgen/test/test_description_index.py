@@ -0,0 +1,105 @@
+"""
+Test the SAGA description index
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.SagaDescriptionIndex import (
+    SagaDescriptionIndex,
+)
+from processing_saga_nextgen.processing.utils import SagaUtils
+
+
+class DescriptionIndexTests(TestCase):
+    """
+    Test the SAGA description index
+    """
+
+    # pylint: disable=missing-function-docstring
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.temp_dir, "description")
+        os.mkdir(self.folder)
+        for file in (
+            "grid_filter_simple_filter.txt",
+            "grid_analysis_coverage_of_categories.txt",
+        ):
+            shutil.copy(
+                os.path.join(SagaUtils.sagaDescriptionPath(), file), self.folder
+            )
+        self.index_file = os.path.join(self.temp_dir, "index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_description_file(self):
+        description = SagaDescriptionIndex.parse_description_file(
+            os.path.join(self.folder, "grid_analysis_coverage_of_categories.txt")
+        )
+        self.assertEqual(description["name"], "Coverage of Categories")
+        self.assertEqual(description["cmdname"], "26")
+        self.assertEqual(description["group"], "grid_analysis")
+        self.assertFalse(description["known_issues"])
+        self.assertFalse(description["allow_unmatching"])
+        self.assertIsNone(description["tile_halo"])
+        self.assertEqual(description["hardcoded_strings"], ["-TARGET_DEFINITION 0"])
+        self.assertEqual(
+            description["parameters"][0],
+            "QgsProcessingParameterRasterLayer|CLASSES|Categories|None|False",
+        )
+
+    def test_parse_tileable(self):
+        description = SagaDescriptionIndex.parse_description_file(
+            os.path.join(self.folder, "grid_filter_simple_filter.txt")
+        )
+        self.assertEqual(description["tile_halo"], "KERNEL_RADIUS")
+
+    def test_index_reused(self):
+        index = SagaDescriptionIndex(self.folder, self.index_file)
+        descriptions = index.descriptions()
+        self.assertEqual(
+            list(descriptions.keys()),
+            [
+                "grid_analysis_coverage_of_categories.txt",
+                "grid_filter_simple_filter.txt",
+            ],
+        )
+        self.assertTrue(os.path.exists(self.index_file))
+
+        # an unchanged folder must be served entirely from the stored index
+        with mock.patch.object(SagaDescriptionIndex, "parse_description_file") as parse:
+            self.assertEqual(
+                SagaDescriptionIndex(self.folder, self.index_file).descriptions(),
+                descriptions,
+            )
+            parse.assert_not_called()
+
+    def test_index_rebuilt(self):
+        SagaDescriptionIndex(self.folder, self.index_file).descriptions()
+
+        path = os.path.join(self.folder, "grid_filter_simple_filter.txt")
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content.replace("Simple Filter|0", "Simpler Filter|0"))
+
+        os.remove(os.path.join(self.folder, "grid_analysis_coverage_of_categories.txt"))
+
+        descriptions = SagaDescriptionIndex(self.folder, self.index_file).descriptions()
+        self.assertEqual(list(descriptions.keys()), ["grid_filter_simple_filter.txt"])
+        self.assertEqual(
+            descriptions["grid_filter_simple_filter.txt"]["name"], "Simpler Filter"
+        )
+
+    def test_parse_errors(self):
+        with open(os.path.join(self.folder, "broken.txt"), "wb") as f:
+            f.write(b"\xff\xfe\xfa")
+
+        index = SagaDescriptionIndex(self.folder, self.index_file)
+        descriptions = index.descriptions()
+        self.assertNotIn("broken.txt", descriptions)
+        self.assertIn("broken.txt", index.errors)
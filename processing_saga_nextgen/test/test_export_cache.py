@@ -0,0 +1,254 @@
+"""
+Test the export cache
+"""
+
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.exportcache import SagaExportCache
+
+
+def export(path: str, size: int):
+    """
+    Simulates an export, writing a grid's files
+    """
+    for extension in (".sgrd", ".sdat"):
+        with open(os.path.splitext(path)[0] + extension, "wb") as f:
+            f.write(b"0" * size)
+
+
+class ExportCacheTests(TestCase):
+    """
+    Test the export cache
+    """
+
+    def test_fingerprint(self):
+        """
+        Test that keys change when the source changes
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "dem.tif")
+            with open(source, "wb") as f:
+                f.write(b"1")
+            key1 = SagaExportCache.makeKey(
+                "raster", SagaExportCache.fileFingerprint(source), None
+            )
+            self.assertEqual(
+                key1,
+                SagaExportCache.makeKey(
+                    "raster", SagaExportCache.fileFingerprint(source), None
+                ),
+            )
+            self.assertNotEqual(
+                key1,
+                SagaExportCache.makeKey(
+                    "raster", SagaExportCache.fileFingerprint(source), 2
+                ),
+            )
+            with open(source, "wb") as f:
+                f.write(b"12")
+            self.assertNotEqual(
+                key1,
+                SagaExportCache.makeKey(
+                    "raster", SagaExportCache.fileFingerprint(source), None
+                ),
+            )
+            self.assertIsNone(SagaExportCache.fileFingerprint(temp_dir))
+            self.assertIsNone(
+                SagaExportCache.fileFingerprint("dbname='gis' table=\"dem\"")
+            )
+
+    def test_cache(self):
+        """
+        Test committing, looking up and evicting exports
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = SagaExportCache(temp_dir, 250)
+            self.assertIsNone(cache.lookup("a"))
+
+            path_a = cache.newEntryPath("a", "a.sgrd")
+            # uncommitted exports are not visible
+            export(path_a, 50)
+            self.assertIsNone(cache.lookup("a"))
+            cache.commit("a", path_a)
+            cache.release(path_a)
+            self.assertEqual(cache.lookup("a"), path_a)
+            cache.release(path_a)
+
+            # failed exports are discarded
+            path_failed = cache.newEntryPath("failed", "failed.sgrd")
+            cache.commit("failed", path_failed)
+            self.assertFalse(os.path.exists(os.path.dirname(path_failed)))
+
+            path_b = cache.newEntryPath("b", "b.sgrd")
+            export(path_b, 50)
+            cache.commit("b", path_b)
+            time.sleep(0.01)
+            # using a makes b the least recently used entry
+            cache.release(cache.lookup("a"))
+
+            # b is still in use, so a is evicted instead
+            path_c = cache.newEntryPath("c", "c.sgrd")
+            export(path_c, 50)
+            cache.commit("c", path_c)
+            cache.release(path_c)
+            self.assertTrue(os.path.exists(path_b))
+            self.assertFalse(os.path.exists(path_a))
+            self.assertIsNone(cache.lookup("a"))
+            cache.release(path_b)
+
+            # once released, b is evicted as the least recently used entry
+            path_d = cache.newEntryPath("d", "d.sgrd")
+            export(path_d, 50)
+            cache.commit("d", path_d)
+            cache.release(path_d)
+            self.assertIsNone(cache.lookup("b"))
+            self.assertFalse(os.path.exists(path_b))
+            self.assertEqual(cache.lookup("c"), path_c)
+            self.assertEqual(cache.lookup("d"), path_d)
+            cache.release(path_c)
+            cache.release(path_d)
+
+            statistics = cache.statistics()
+            self.assertEqual(statistics["entries"], 2)
+            self.assertEqual(statistics["size_bytes"], 200)
+            self.assertEqual(statistics["hits"], 4)
+            self.assertEqual(statistics["misses"], 4)
+
+            # the cache persists between sessions
+            cache = SagaExportCache(temp_dir, 250)
+            self.assertEqual(cache.lookup("c"), path_c)
+            cache.release(path_c)
+
+    def test_orphans(self):
+        """
+        Test that folders left over from failed runs are removed, but not
+        folders which are still in use
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = SagaExportCache(temp_dir, 250)
+            old = time.time() - SagaExportCache.ORPHAN_SECONDS - 1
+
+            # left over by a run which did not exit cleanly
+            orphan = os.path.join(temp_dir, "orphan")
+            os.makedirs(orphan)
+            stale = os.path.join(orphan, SagaExportCache.PIN_PREFIX + "1-dead")
+            with open(stale, "wb"):
+                pass
+            stale_time = time.time() - SagaExportCache.PIN_STALE_SECONDS - 1
+            os.utime(stale, (stale_time, stale_time))
+            os.utime(orphan, (old, old))
+
+            # still being written by this process
+            path_pending = cache.newEntryPath("e", "e.sgrd")
+            os.utime(os.path.dirname(path_pending), (old, old))
+
+            # still used by another process
+            other = SagaExportCache(temp_dir, 250)
+            path_other = other.newEntryPath("g", "g.sgrd")
+            os.utime(os.path.dirname(path_other), (old, old))
+
+            path_f = cache.newEntryPath("f", "f.sgrd")
+            export(path_f, 10)
+            cache.commit("f", path_f)
+            self.assertFalse(os.path.exists(orphan))
+            self.assertTrue(os.path.exists(os.path.dirname(path_pending)))
+            self.assertTrue(os.path.exists(os.path.dirname(path_other)))
+
+            cache.discard(path_pending)
+            self.assertFalse(os.path.exists(os.path.dirname(path_pending)))
+            other.discard(path_other)
+
+    def test_processes(self):
+        """
+        Test that caches used by several processes share their entries
+        rather than overwriting each other's index
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = SagaExportCache(temp_dir, 1000)
+            second = SagaExportCache(temp_dir, 1000)
+            # both processes have read the (empty) index
+            self.assertIsNone(first.lookup("a"))
+            self.assertIsNone(second.lookup("b"))
+
+            path_a = first.newEntryPath("a", "a.sgrd")
+            export(path_a, 50)
+            first.commit("a", path_a)
+            first.release(path_a)
+            path_b = second.newEntryPath("b", "b.sgrd")
+            export(path_b, 50)
+            second.commit("b", path_b)
+            second.release(path_b)
+
+            self.assertEqual(first.lookup("b"), path_b)
+            self.assertEqual(second.lookup("a"), path_a)
+            first.release(path_b)
+            second.release(path_a)
+            self.assertEqual(first.statistics()["entries"], 2)
+            self.assertEqual(first.statistics()["hits"], 2)
+            self.assertEqual(first.statistics()["misses"], 2)
+
+            # an entry in use by one process is not evicted by another
+            self.assertEqual(first.lookup("a"), path_a)
+            second.budget_bytes = 0
+            path_c = second.newEntryPath("c", "c.sgrd")
+            export(path_c, 50)
+            second.commit("c", path_c)
+            self.assertTrue(os.path.exists(path_a))
+            self.assertFalse(os.path.exists(path_b))
+            first.release(path_a)
+            second.release(path_c)
+
+            # concurrent exports of the same layer keep the first entry, and
+            # remove the other once it is no longer used
+            path_d1 = first.newEntryPath("d", "d.sgrd")
+            path_d2 = second.newEntryPath("d", "d.sgrd")
+            export(path_d1, 50)
+            export(path_d2, 50)
+            first.commit("d", path_d1)
+            second.commit("d", path_d2)
+            self.assertTrue(os.path.exists(path_d2))
+            second.release(path_d2)
+            self.assertFalse(os.path.exists(os.path.dirname(path_d2)))
+            self.assertEqual(second.lookup("d"), path_d1)
+            second.release(path_d1)
+            first.release(path_d1)
+
+            # a stale lock is broken rather than blocking commits
+            lock = os.path.join(temp_dir, SagaExportCache.LOCK_FILENAME)
+            with open(lock, "wb"):
+                pass
+            old = time.time() - SagaExportCache.LOCK_STALE_SECONDS - 1
+            os.utime(lock, (old, old))
+            first.budget_bytes = 1000
+            path_e = first.newEntryPath("e", "e.sgrd")
+            export(path_e, 50)
+            first.commit("e", path_e)
+            first.release(path_e)
+            self.assertFalse(os.path.exists(lock))
+            self.assertEqual(second.lookup("e"), path_e)
+            second.release(path_e)
+
+    def test_index_writes(self):
+        """
+        Test that lookups are written to the index with the next commit or
+        release, rather than for every lookup
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = SagaExportCache(temp_dir, 250)
+            path_a = cache.newEntryPath("a", "a.sgrd")
+            export(path_a, 50)
+            cache.commit("a", path_a)
+            cache.release(path_a)
+
+            def stored_hits():
+                return SagaExportCache(temp_dir, 250).statistics()["hits"]
+
+            cache.lookup("a")
+            cache.lookup("a")
+            self.assertEqual(stored_hits(), 0)
+            cache.release(path_a)
+            self.assertEqual(stored_hits(), 2)
+            cache.release(path_a)
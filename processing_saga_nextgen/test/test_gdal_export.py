@@ -0,0 +1,190 @@
+"""
+Test in-process GDAL exports
+"""
+
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.gdalexport import SagaGdalExport
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+
+class FakeFeedback:
+    """
+    Records the warnings reported to it
+    """
+
+    def __init__(self):
+        self.warnings = []
+
+    def isCanceled(self):  # pylint: disable=missing-function-docstring
+        return False
+
+    def pushWarning(self, warning):  # pylint: disable=missing-function-docstring
+        self.warnings.append(warning)
+
+
+class FakeDataset:
+    """
+    A GDAL dataset with a geotransform
+    """
+
+    def __init__(self, geotransform):
+        self.geotransform = geotransform
+
+    def GetGeoTransform(self):  # pylint: disable=missing-function-docstring
+        return self.geotransform
+
+
+def fake_gdal(geotransform):
+    """
+    Returns a fake osgeo package whose gdal module opens every source as a
+    dataset with a geotransform
+    """
+    module = types.ModuleType("osgeo.gdal")
+    module.OF_RASTER = 2
+    module.OpenEx = mock.Mock(return_value=FakeDataset(geotransform))
+    module.Translate = mock.Mock(return_value=object())
+    module.Warp = mock.Mock(return_value=object())
+    module.GetLastErrorMsg = mock.Mock(return_value="")
+    package = types.ModuleType("osgeo")
+    package.gdal = module
+    return {"osgeo": package, "osgeo.gdal": module}
+
+
+def fake_export(source, destination):
+    """
+    Exports every source except bad.tif
+    """
+    run = SagaCommandRun(SagaGdalExport.exportCommand(source, destination, False))
+    run.return_code = 1 if source == "bad.tif" else 0
+    run.stop()
+    return run
+
+
+class GdalExportTests(TestCase):
+    """
+    Test in-process GDAL exports
+    """
+
+    def test_rotated(self):
+        """
+        Test detecting rotated rasters
+        """
+        self.assertFalse(SagaGdalExport.isRotated((0, 10, 0, 100, 0, -10)))
+        self.assertTrue(SagaGdalExport.isRotated((0, 10, 0.5, 100, 0, -10)))
+        self.assertTrue(SagaGdalExport.isRotated((0, 10, 0, 100, -0.5, -10)))
+
+    def test_square_cells(self):
+        """
+        Test detecting rasters with non-square cells
+        """
+        self.assertTrue(SagaGdalExport.hasSquareCells((0, 10, 0, 100, 0, -10)))
+        self.assertTrue(
+            SagaGdalExport.hasSquareCells((0, 1 / 1200, 0, 100, 0, -0.000833333333333))
+        )
+        self.assertFalse(SagaGdalExport.hasSquareCells((0, 10, 0, 100, 0, -5)))
+
+    def test_export_raster(self):
+        """
+        Test that square rasters are translated strictly, rotated rasters
+        warped, and rasters with non-square cells left to io_gdal
+        """
+        modules = fake_gdal((0, 10, 0, 100, 0, -10))
+        with mock.patch.dict(sys.modules, modules):
+            run = SagaGdalExport.exportRaster("a.tif", "a.sgrd")
+        self.assertEqual(run.return_code, 0)
+        modules["osgeo.gdal"].Translate.assert_called_once_with(
+            "a.sdat", mock.ANY, format="SAGA", strict=True
+        )
+
+        modules = fake_gdal((0, 10, 0.5, 100, 0.5, -10))
+        with mock.patch.dict(sys.modules, modules):
+            run = SagaGdalExport.exportRaster("a.tif", "a.sgrd")
+        self.assertEqual(run.return_code, 0)
+        self.assertIn("Warp", run.command)
+        modules["osgeo.gdal"].Warp.assert_called_once()
+
+        modules = fake_gdal((0, 10, 0, 100, 0, -5))
+        with (
+            mock.patch.dict(sys.modules, modules),
+            mock.patch(
+                "processing_saga_nextgen.processing.utils.SagaUtils.removeDataset"
+            ) as remove,
+        ):
+            run = SagaGdalExport.exportRaster("a.tif", "a.sgrd")
+        self.assertEqual(run.return_code, 1)
+        modules["osgeo.gdal"].Translate.assert_not_called()
+        modules["osgeo.gdal"].Warp.assert_not_called()
+        remove.assert_called_once_with("a.sgrd")
+
+    @unittest.skipIf(
+        gdal is None or gdal.GetDriverByName("SAGA") is None,
+        "GDAL's SAGA driver is not available",
+    )
+    def test_export_non_square(self):
+        """
+        Test exporting real rasters with square and non-square cells
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, geotransform in (
+                ("square", (1000, 10, 0, 2000, 0, -10)),
+                ("non_square", (1000, 10, 0, 2000, 0, -5)),
+            ):
+                source = os.path.join(temp_dir, name + ".tif")
+                dataset = gdal.GetDriverByName("GTiff").Create(source, 4, 3)
+                dataset.SetGeoTransform(geotransform)
+                dataset.GetRasterBand(1).Fill(7)
+                dataset = None
+
+                destination = os.path.join(temp_dir, name + ".sgrd")
+                run = SagaGdalExport.exportRaster(source, destination)
+                if name == "square":
+                    self.assertEqual(run.return_code, 0)
+                    exported = gdal.Open(os.path.join(temp_dir, name + ".sdat"))
+                    self.assertEqual(
+                        exported.GetGeoTransform(), (1000, 10, 0, 2000, 0, -10)
+                    )
+                    self.assertEqual(exported.GetRasterBand(1).ReadAsArray()[0][0], 7)
+                    exported = None
+                else:
+                    # left to io_gdal
+                    self.assertEqual(run.return_code, 1)
+                    self.assertFalse(
+                        os.path.exists(os.path.join(temp_dir, name + ".sdat"))
+                    )
+
+    def test_export_rasters(self):
+        """
+        Test that failed GDAL exports fall back to their io_gdal commands
+        """
+        commands = ["io_gdal 0 a", "io_gdal 0 b", "io_gdal 0 c"]
+        exports = {
+            "io_gdal 0 a": ("a.tif", "a.sgrd"),
+            "io_gdal 0 b": ("bad.tif", "b.sgrd"),
+        }
+        feedback = FakeFeedback()
+        with (
+            mock.patch.object(SagaGdalExport, "available", return_value=True),
+            mock.patch.object(SagaGdalExport, "exportRaster", side_effect=fake_export),
+        ):
+            remaining, runs = SagaGdalExport.exportRasters(commands, exports, feedback)
+
+        self.assertEqual(remaining, ["io_gdal 0 b", "io_gdal 0 c"])
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(len(feedback.warnings), 1)
+
+        # without GDAL everything is imported by SAGA
+        with mock.patch.object(SagaGdalExport, "available", return_value=False):
+            remaining, runs = SagaGdalExport.exportRasters(commands, exports, feedback)
+        self.assertEqual(remaining, commands)
+        self.assertEqual(runs, [])
@@ -0,0 +1,34 @@
+"""
+Test short help loading
+"""
+
+from unittest import TestCase
+
+from processing_saga_nextgen import help as saga_help
+
+
+class HelpTests(TestCase):
+    """
+    Test short help loading
+    """
+
+    # pylint: disable=missing-function-docstring
+
+    def test_compile_short_help(self):
+        compiled = saga_help.compileShortHelp()
+        context, text = compiled["saga:rastercalculator"]
+        self.assertEqual(context, "SAGAAlgorithm")
+        self.assertTrue(text.startswith("This algorithm allows performing"))
+
+    def test_algorithm_short_help(self):
+        self.assertTrue(
+            saga_help.algorithmShortHelp("saga:rastercalculator").startswith(
+                "This algorithm allows performing"
+            )
+        )
+        self.assertIsNone(saga_help.algorithmShortHelp("saga:doesnotexist"))
+        # translations are cached
+        self.assertIn("saga:rastercalculator", saga_help._translated_help)  # pylint: disable=protected-access
+
+    def test_short_help_dictionary(self):
+        self.assertIn("saga:rastercalculator", saga_help.shortHelp)
@@ -0,0 +1,114 @@
+"""
+Test provider profiling
+"""
+
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.profiling import SagaStartupProfile, SagaTrace
+
+
+class ProfilingTests(TestCase):
+    """
+    Test provider profiling
+    """
+
+    # pylint: disable=missing-function-docstring
+
+    def test_from_environment(self):
+        with mock.patch.dict(os.environ, {"SAGANG_PROFILE_STARTUP": ""}):
+            self.assertIsNone(SagaStartupProfile.from_environment())
+        with mock.patch.dict(os.environ, {"SAGANG_PROFILE_STARTUP": "1"}):
+            profile = SagaStartupProfile.from_environment()
+            self.assertIsNotNone(profile)
+            self.assertIsNone(profile.output_file)
+        with mock.patch.dict(os.environ, {"SAGANG_PROFILE_STARTUP": "/tmp/p.json"}):
+            self.assertEqual(
+                SagaStartupProfile.from_environment().output_file, "/tmp/p.json"
+            )
+
+    def test_report(self):
+        profile = SagaStartupProfile()
+        profile.start()
+        with profile.phase("settings"):
+            pass
+        with profile.phase("settings"):
+            pass
+        profile.record_description("a.txt", 0.5)
+        profile.record_description("b.txt", 1.5)
+        profile.record_definition("a.txt", 0.25)
+        profile.stop()
+
+        report = profile.report()
+        self.assertEqual(list(report["phases"].keys()), ["settings"])
+        self.assertEqual(report["descriptions"]["count"], 2)
+        self.assertEqual(report["descriptions"]["total_seconds"], 2)
+        self.assertEqual(report["descriptions"]["slowest"][0]["file"], "b.txt")
+        # parsing and creating algorithms are reported separately
+        self.assertEqual(report["definitions"]["count"], 1)
+        self.assertEqual(report["definitions"]["total_seconds"], 0.25)
+        self.assertIsNotNone(report["peak_allocated_bytes"])
+        self.assertIn("b.txt", profile.summary())
+        self.assertIn("1 algorithms created", profile.summary())
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "profile.json")
+            profile.write_json(path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["descriptions"]["count"], 2)
+
+    def test_trace_disabled(self):
+        with mock.patch.dict(os.environ, {"SAGANG_TRACE": ""}):
+            trace = SagaTrace.for_run("sagang:slope")
+        self.assertFalse(trace.enabled)
+        with trace.span("phase"):
+            pass
+        self.assertEqual(trace.events, [])
+        trace.finish()
+
+    def test_trace_per_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with mock.patch.dict(os.environ, {"SAGANG_TRACE": temp_dir}):
+                trace = SagaTrace.for_run("sagang:slope")
+            with trace.span("sagang:slope", "algorithm"):
+                with trace.span("matrix table", parameter="TABLE"):
+                    pass
+            run = SagaCommandRun('ta_morphometry "0" -ELEVATION "a.sgrd"')
+            run.stop()
+            trace.add_command_runs([run])
+            trace.finish()
+
+            files = os.listdir(temp_dir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].startswith("sagang_slope_"))
+            with open(os.path.join(temp_dir, files[0]), encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+            self.assertEqual(
+                [event["name"] for event in events],
+                ["matrix table", "sagang:slope", 'ta_morphometry "0"'],
+            )
+            self.assertEqual(events[0]["args"], {"parameter": "TABLE"})
+            self.assertEqual(events[2]["cat"], "saga")
+            for event in events:
+                self.assertEqual(event["ph"], "X")
+                self.assertGreaterEqual(event["dur"], 0)
+            # the algorithm span encloses its phases
+            self.assertLessEqual(events[1]["ts"], events[0]["ts"])
+
+    def test_trace_per_session(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "session.json")
+            with mock.patch.dict(os.environ, {"SAGANG_TRACE": path}):
+                for name in ("first", "second"):
+                    trace = SagaTrace.for_run(name)
+                    with trace.span(name):
+                        pass
+                    trace.finish()
+            with open(path, encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+            self.assertEqual(
+                [event["name"] for event in events][-2:], ["first", "second"]
+            )
@@ -0,0 +1,100 @@
+"""
+Test raster metadata read from headers
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.rastermetadata import SagaRasterMetadata
+
+HEADER = """NAME\t= dem
+DESCRIPTION\t=
+UNIT\t=
+DATAFORMAT\t= FLOAT
+DATAFILE_OFFSET\t= 0
+BYTEORDER_BIG\t= FALSE
+TOPTOBOTTOM\t= FALSE
+POSITION_XMIN\t= 1005.0000000000
+POSITION_YMIN\t= 5005.0000000000
+CELLCOUNT_X\t= {}
+CELLCOUNT_Y\t= 50
+CELLSIZE\t= 10.0000000000
+Z_FACTOR\t= 1.000000
+NODATA_VALUE\t= -99999.000000
+"""
+
+
+class RasterMetadataTests(TestCase):
+    """
+    Test raster metadata read from headers
+    """
+
+    def setUp(self):
+        SagaRasterMetadata.clearCache()
+
+    def test_parse_sgrd(self):
+        """
+        Test parsing .sgrd headers
+        """
+        metadata = SagaRasterMetadata.parseSgrd(HEADER.format(100), "dem")
+        self.assertEqual(metadata.band_count, 1)
+        self.assertEqual(metadata.name, "dem")
+        # grids are positioned by the centre of their lower left cell
+        self.assertEqual(
+            metadata.grid.toList(), [1000.0, 2000.0, 5000.0, 5500.0, 100, 50, ""]
+        )
+
+        self.assertIsNone(SagaRasterMetadata.parseSgrd("NAME\t= dem\n"))
+        self.assertIsNone(SagaRasterMetadata.parseSgrd(HEADER.format("many"), "dem"))
+
+    def test_for_path(self):
+        """
+        Test reading and caching the metadata of SAGA grids
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "dem.sgrd")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(HEADER.format(100))
+
+            metadata = SagaRasterMetadata.forPath(path)
+            self.assertEqual(metadata.name, "dem")
+            self.assertEqual(metadata.grid.width, 100)
+            # the .sdat is described by the same header
+            self.assertEqual(
+                SagaRasterMetadata.forPath(path).grid.toList(),
+                SagaRasterMetadata.readHeader(
+                    os.path.join(temp_dir, "dem.sdat")
+                ).grid.toList(),
+            )
+            # cached
+            self.assertIs(SagaRasterMetadata.forPath(path), metadata)
+
+            # reread once the header changes
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(HEADER.format(200))
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertEqual(SagaRasterMetadata.forPath(path).grid.width, 200)
+
+            self.assertIsNone(
+                SagaRasterMetadata.forPath(os.path.join(temp_dir, "missing.sgrd"))
+            )
+
+    def test_cache_size(self):
+        """
+        Test that the cache is bounded
+        """
+        max_entries = SagaRasterMetadata.MAX_ENTRIES
+        SagaRasterMetadata.MAX_ENTRIES = 2
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                for i in range(3):
+                    path = os.path.join(temp_dir, "dem{}.sgrd".format(i))
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(HEADER.format(100))
+                    SagaRasterMetadata.forPath(path)
+                # pylint: disable=protected-access
+                self.assertEqual(len(SagaRasterMetadata._cache), 2)
+        finally:
+            SagaRasterMetadata.MAX_ENTRIES = max_entries
@@ -90,6 +90,74 @@ class TestSagaAlgorithms(unittest.TestCase, AlgorithmsTest):
         self.assertEqual(param.defaultFileExtension(), "tif")
         self.assertEqual(param.supportedOutputRasterLayerExtensions(), ["tif"])
 
+        param = Parameters.create_parameter_from_line(
+            "SagaImageOutput|RGB|Output RGB|None|True"
+        )
+        clone = param.clone()
+        self.assertIsInstance(clone, SagaImageOutputParam)
+        self.assertEqual(clone.name(), "RGB")
+        self.assertTrue(
+            clone.flags() & QgsProcessingParameterDefinition.Flag.FlagOptional
+        )
+
+    def test_deferred_parameters(self):
+        # the provider's copy only defines the toolbox metadata
+        alg = QgsApplication.processingRegistry().algorithmById("sagang:featuresbuffer")
+        self.assertTrue(alg.defer_parameters)
+        self.assertEqual(alg.parameterDefinitions(), [])
+        self.assertEqual(alg.name(), "featuresbuffer")
+
+        # whereas the instances created from it are fully initialized
+        alg = QgsApplication.processingRegistry().createAlgorithmById(
+            "sagang:featuresbuffer"
+        )
+        self.assertFalse(alg.defer_parameters)
+        self.assertEqual(
+            [p.name() for p in alg.parameterDefinitions()][:2],
+            ["SHAPES", "BUFFER"],
+        )
+        self.assertIn("BUFFER", [o.name() for o in alg.outputDefinitions()])
+
+    def test_shared_definition(self):
+        alg = QgsApplication.processingRegistry().algorithmById("sagang:featuresbuffer")
+        instance1 = alg.createInstance()
+        instance2 = alg.createInstance()
+        instance1.initAlgorithm()
+        instance2.initAlgorithm()
+        # the parsed definition is shared, the parameters are not
+        self.assertIs(instance1.definition, alg.definition)
+        self.assertIs(instance2.definition, alg.definition)
+        self.assertEqual(
+            [p.name() for p in instance1.parameterDefinitions()],
+            [p.name() for p in instance2.parameterDefinitions()],
+        )
+        self.assertIsNot(
+            instance1.parameterDefinition("SHAPES"),
+            instance2.parameterDefinition("SHAPES"),
+        )
+
+    def test_band_outputs(self):
+        alg = QgsApplication.processingRegistry().createAlgorithmById(
+            "sagang:slopeaspectcurvature"
+        )
+        self.assertIsNotNone(alg.outputDefinition("SLOPE_BANDS"))
+
+        # unstacked multiband runs load the first band's output
+        context = QgsProcessingContext()
+        context.addLayerToLoadOnCompletion(
+            "/data/slope.sdat",
+            QgsProcessingContext.LayerDetails("Slope", QgsProject.instance(), "SLOPE"),
+        )
+        alg.bandOutputs = {
+            "SLOPE": ["/data/slope_band1.sdat", "/data/slope_band2.sdat"]
+        }
+        alg.updateBandLayersToLoad(context, {"SLOPE": "/data/slope.sdat"})
+        self.assertFalse(context.willLoadLayerOnCompletion("/data/slope.sdat"))
+        self.assertEqual(
+            context.layerToLoadOnCompletionDetails("/data/slope_band1.sdat").name,
+            "Slope",
+        )
+
     def test_non_ascii_output(self):
         # create a memory layer and add to project and context
         layer = QgsVectorLayer(
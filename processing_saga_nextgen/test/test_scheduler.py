@@ -0,0 +1,51 @@
+"""
+Test core scheduling
+"""
+
+from unittest import TestCase, mock
+
+from processing_saga_nextgen.processing.scheduler import SagaCoreScheduler
+
+
+class SchedulerTests(TestCase):
+    """
+    Test core scheduling
+    """
+
+    def test_share(self):
+        """
+        Test dividing cores between jobs
+        """
+        # a lone job gets every core
+        self.assertEqual(SagaCoreScheduler.share(8, 0), 8)
+        self.assertEqual(SagaCoreScheduler.share(2, 0), 2)
+        # later jobs get an equal share, whatever the earlier jobs hold
+        self.assertEqual(SagaCoreScheduler.share(8, 1), 4)
+        self.assertEqual(SagaCoreScheduler.share(8, 3), 2)
+        self.assertEqual(SagaCoreScheduler.share(2, 4), 1)
+        # jobs started together by a pool share the cores between them
+        self.assertEqual(SagaCoreScheduler.share(8, 0, 4), 2)
+        self.assertEqual(SagaCoreScheduler.share(8, 3, 4), 2)
+        self.assertEqual(SagaCoreScheduler.share(8, 0, 16), 1)
+
+    def test_reserve(self):
+        """
+        Test reserving and releasing cores
+        """
+        with mock.patch.object(SagaCoreScheduler, "availableCores", return_value=8):
+            with SagaCoreScheduler.reserve() as first:
+                self.assertEqual(first, 8)
+                self.assertEqual(SagaCoreScheduler.activeJobs(), 1)
+                with SagaCoreScheduler.reserve() as second:
+                    self.assertEqual(second, 4)
+                    with SagaCoreScheduler.reserve() as third:
+                        self.assertEqual(third, 2)
+                with SagaCoreScheduler.reserve(16) as requested:
+                    self.assertEqual(requested, 8)
+            self.assertEqual(SagaCoreScheduler.activeJobs(), 0)
+
+            # a pool of workers splits the cores fairly from the first job
+            with SagaCoreScheduler.reserve(0, 2) as first:
+                with SagaCoreScheduler.reserve(0, 2) as second:
+                    self.assertEqual([first, second], [4, 4])
+            self.assertEqual(SagaCoreScheduler.activeJobs(), 0)
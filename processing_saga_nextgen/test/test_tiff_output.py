@@ -0,0 +1,51 @@
+"""
+Test GeoTIFF outputs
+"""
+
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.tiffoutput import SagaTiffOutput
+
+
+class TiffOutputTests(TestCase):
+    """
+    Test GeoTIFF outputs
+    """
+
+    def test_tiff_path(self):
+        """
+        Test recognizing GeoTIFF destinations
+        """
+        self.assertTrue(SagaTiffOutput.isTiffPath("/data/slope.tif"))
+        self.assertTrue(SagaTiffOutput.isTiffPath("/data/slope.TIFF"))
+        self.assertFalse(SagaTiffOutput.isTiffPath("/data/slope.sdat"))
+        self.assertFalse(SagaTiffOutput.isTiffPath("/data/tif"))
+
+    def test_creation_options(self):
+        """
+        Test the creation options for each setting
+        """
+        output = SagaTiffOutput()
+        self.assertEqual(output.driver(), "GTiff")
+        self.assertEqual(output.creationOptions(), [])
+        # SAGA writes plain GeoTIFFs itself where it can
+        self.assertFalse(output.needsConversion())
+
+        output = SagaTiffOutput(compression=1, tiled=True, predictor=2)
+        self.assertEqual(
+            output.creationOptions(),
+            ["COMPRESS=DEFLATE", "PREDICTOR=3", "TILED=YES", "BIGTIFF=IF_SAFER"],
+        )
+        self.assertTrue(output.needsConversion())
+
+        # predictors only apply to compressed outputs
+        output = SagaTiffOutput(predictor=1)
+        self.assertEqual(output.creationOptions(), [])
+
+        output = SagaTiffOutput(compression=3, predictor=1, cloud_optimized=True)
+        self.assertEqual(output.driver(), "COG")
+        self.assertEqual(
+            output.creationOptions(),
+            ["COMPRESS=ZSTD", "PREDICTOR=STANDARD", "BIGTIFF=IF_SAFER"],
+        )
+        self.assertTrue(output.needsConversion())
@@ -0,0 +1,407 @@
+"""
+Test tiled execution
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+from unittest import TestCase, mock
+
+from qgis.core import QgsProcessingException
+
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.jobs import SagaJobWorkspace
+from processing_saga_nextgen.processing.scheduler import SagaCoreScheduler
+from processing_saga_nextgen.processing.tiling import (
+    SagaMosaic,
+    SagaTile,
+    SagaTiledExecution,
+    SagaTiling,
+)
+from processing_saga_nextgen.processing.utils import SagaUtils
+
+try:
+    from osgeo import gdal, osr
+except ImportError:
+    gdal = None
+
+NODATA = -99999
+
+requires_saga_driver = unittest.skipIf(
+    gdal is None or gdal.GetDriverByName("SAGA") is None,
+    "GDAL's SAGA driver is not available",
+)
+
+
+class FakeFeedback:
+    """
+    Records the progress reported to it, and cancels after a number of
+    progress reports
+    """
+
+    def __init__(self, cancel_after=None):
+        self.progress = []
+        self.cancel_after = cancel_after
+
+    def isCanceled(self):  # pylint: disable=missing-function-docstring
+        return self.cancel_after is not None and len(self.progress) >= self.cancel_after
+
+    def setProgress(self, progress):  # pylint: disable=missing-function-docstring
+        self.progress.append(progress)
+
+
+def write_raster(path, rows, data_type=None, nodata=NODATA):
+    """
+    Writes a single band raster of rows of values, on a grid with square
+    cells of 10 map units
+    """
+    data_type = data_type or gdal.GDT_Float32
+    driver = "SAGA" if path.lower().endswith(".sdat") else "GTiff"
+    dataset = gdal.GetDriverByName(driver).Create(
+        path, len(rows[0]), len(rows), 1, data_type
+    )
+    dataset.SetGeoTransform((1000, 10, 0, 2000, 0, -10))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32633)
+    dataset.SetProjection(srs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    for y, row in enumerate(rows):
+        band.WriteRaster(
+            0,
+            y,
+            len(row),
+            1,
+            struct.pack("<{}d".format(len(row)), *row),
+            buf_type=gdal.GDT_Float64,
+        )
+    dataset = None
+
+
+def read_raster(path):
+    """
+    Returns the rows of values of a single band raster, and the raster
+    """
+    dataset = gdal.Open(path)
+    band = dataset.GetRasterBand(1)
+    rows = [
+        list(
+            struct.unpack(
+                "<{}d".format(dataset.RasterXSize),
+                band.ReadRaster(
+                    0, y, dataset.RasterXSize, 1, buf_type=gdal.GDT_Float64
+                ),
+            )
+        )
+        for y in range(dataset.RasterYSize)
+    ]
+    return rows, dataset
+
+
+def neighbourhood_sum(rows):
+    """
+    Returns the sum of each cell's 3x3 neighbourhood, ignoring cells with no
+    data and cells outside of the raster, i.e. a tool with a halo of 1 cell
+    """
+    height, width = len(rows), len(rows[0])
+    result = []
+    for y in range(height):
+        result.append([])
+        for x in range(width):
+            if rows[y][x] == NODATA:
+                result[y].append(NODATA)
+                continue
+            total = 0
+            for row in rows[max(0, y - 1) : y + 2]:
+                for value in row[max(0, x - 1) : x + 2]:
+                    if value != NODATA:
+                        total += value
+            result[y].append(total)
+    return result
+
+
+def sum_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+    """
+    Runs the neighbourhood sum on a tile's input, like saga_cmd would
+    """
+    source = command.split("-INPUT ")[1].split()[0]
+    output = command.split("-RESULT ")[1].split()[0]
+    rows, _ = read_raster(source)
+    write_raster(SagaTiling.gdalPath(output), neighbourhood_sum(rows))
+    return SagaCommandRun(command)
+
+
+def empty_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+    """
+    Writes an empty grid named by the command's -RESULT, unless it is for
+    tile 1
+    """
+    if "tile1" not in command:
+        output = command.split("-RESULT ")[1].split()[0]
+        for extension in (".sgrd", ".sdat"):
+            with open(os.path.splitext(output)[0] + extension, "w", encoding="utf-8"):
+                pass
+    run = SagaCommandRun(command)
+    run.console = ["ran {}".format(command.split()[0])]
+    return run
+
+
+def build_command(inputs, outputs):
+    """
+    Builds a tile's neighbourhood sum command
+    """
+    return "sum -INPUT {} -RESULT {}".format(inputs["INPUT"], outputs["RESULT"])
+
+
+def source_rows(width, height):
+    """
+    Returns distinct values for each cell, with a few cells without data
+    """
+    rows = [[float(y * width + x) for x in range(width)] for y in range(height)]
+    rows[0][0] = NODATA
+    rows[height // 2][width // 2] = NODATA
+    return rows
+
+
+class TilingTests(TestCase):
+    """
+    Test tiled execution
+    """
+
+    def test_halo(self):
+        """
+        Test halo specifications
+        """
+        values = {"KERNEL_RADIUS": 3, "SCALE": 1.5}.get
+        self.assertEqual(SagaTiling.halo("2", values), 2)
+        self.assertEqual(SagaTiling.halo("KERNEL_RADIUS", values), 3)
+        self.assertEqual(SagaTiling.halo("KERNEL_RADIUS + 1", values), 4)
+        self.assertEqual(SagaTiling.halo("SCALE", values), 2)
+        self.assertEqual(SagaTiling.halo("0", values), 0)
+
+    def test_tiles(self):
+        """
+        Test that tiles cover the raster exactly once, and read their halo
+        where it is within the raster
+        """
+        width, height = 250, 120
+        tiles = SagaTiling.tiles(width, height, 100, 2)
+        self.assertEqual(len(tiles), 6)
+        self.assertEqual([tile.index for tile in tiles], list(range(6)))
+
+        covered = [[0] * width for _ in range(height)]
+        for tile in tiles:
+            x, y, tile_width, tile_height = tile.window
+            for row in range(y, y + tile_height):
+                for column in range(x, x + tile_width):
+                    covered[row][column] += 1
+        self.assertTrue(all(count == 1 for row in covered for count in row))
+
+        # the first tile has no halo above or to its left
+        self.assertEqual(tiles[0].window, (0, 0, 100, 100))
+        self.assertEqual(tiles[0].read_window, (0, 0, 102, 102))
+        self.assertEqual(tiles[0].trimmedWindow(), (0, 0, 100, 100))
+
+        # interior edges are extended by the halo
+        self.assertEqual(tiles[4].window, (100, 100, 100, 20))
+        self.assertEqual(tiles[4].read_window, (98, 98, 104, 22))
+        self.assertEqual(tiles[4].trimmedWindow(), (2, 2, 100, 20))
+
+        # the last tile is clipped to the raster
+        self.assertEqual(tiles[5].window, (200, 100, 50, 20))
+        self.assertEqual(tiles[5].read_window, (198, 98, 52, 22))
+
+    def test_single_tile(self):
+        """
+        Test a raster smaller than a tile
+        """
+        tiles = SagaTiling.tiles(50, 40, 100, 5)
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(tiles[0].window, (0, 0, 50, 40))
+        self.assertEqual(tiles[0].read_window, (0, 0, 50, 40))
+
+    def test_trimmed_window(self):
+        """
+        Test that the trimmed window of each tile's read window holds
+        exactly the tile's cells
+        """
+        width, height = 23, 17
+        rows = [[(x, y) for x in range(width)] for y in range(height)]
+        for halo in (0, 1, 3):
+            for tile in SagaTiling.tiles(width, height, 8, halo):
+                read_x, read_y, read_width, read_height = tile.read_window
+                tile_output = [
+                    row[read_x : read_x + read_width]
+                    for row in rows[read_y : read_y + read_height]
+                ]
+                x, y, tile_width, tile_height = tile.trimmedWindow()
+                trimmed = [
+                    row[x : x + tile_width] for row in tile_output[y : y + tile_height]
+                ]
+                x, y, tile_width, tile_height = tile.window
+                self.assertEqual(
+                    trimmed,
+                    [row[x : x + tile_width] for row in rows[y : y + tile_height]],
+                )
+
+        tile = SagaTile(3, (10, 20, 5, 5), (7, 17, 11, 8))
+        self.assertEqual(tile.trimmedWindow(), (3, 3, 5, 5))
+
+    @requires_saga_driver
+    def test_mosaic(self):
+        """
+        Test that mosaicked tile outputs have the reference raster's grid,
+        and the tile outputs' data type and no data value
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            width, height = 7, 5
+            reference = os.path.join(temp_dir, "reference.tif")
+            write_raster(reference, source_rows(width, height), nodata=None)
+
+            rows = [[float(x * y) for x in range(width)] for y in range(height)]
+            rows[2][3] = -1
+            mosaic = SagaMosaic(os.path.join(temp_dir, "mosaic.tif"), reference)
+            for tile in SagaTiling.tiles(width, height, 3, 1):
+                read_x, read_y, read_width, read_height = tile.read_window
+                tile_output = os.path.join(temp_dir, "tile{}.sdat".format(tile.index))
+                write_raster(
+                    tile_output,
+                    [
+                        row[read_x : read_x + read_width]
+                        for row in rows[read_y : read_y + read_height]
+                    ],
+                    data_type=gdal.GDT_Int16,
+                    nodata=-1,
+                )
+                mosaic.add(tile, tile_output)
+            mosaic.close()
+
+            mosaicked, dataset = read_raster(os.path.join(temp_dir, "mosaic.tif"))
+            self.assertEqual(mosaicked, rows)
+            _, reference_dataset = read_raster(reference)
+            self.assertEqual(
+                dataset.GetGeoTransform(), reference_dataset.GetGeoTransform()
+            )
+            self.assertEqual(dataset.GetProjection(), reference_dataset.GetProjection())
+            band = dataset.GetRasterBand(1)
+            self.assertEqual(band.DataType, gdal.GDT_Int16)
+            self.assertEqual(band.GetNoDataValue(), -1)
+
+    @requires_saga_driver
+    def test_mosaic_missing_tile(self):
+        """
+        Test that a missing tile output is reported
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mosaic = SagaMosaic(os.path.join(temp_dir, "mosaic.tif"), "reference.tif")
+            with self.assertRaises(QgsProcessingException):
+                mosaic.add(
+                    SagaTile(0, (0, 0, 1, 1), (0, 0, 1, 1)),
+                    os.path.join(temp_dir, "missing.sdat"),
+                )
+
+    @requires_saga_driver
+    def test_run(self):
+        """
+        Test that running a tool in tiles gives the same cells and
+        georeferencing as running it on the whole raster
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=sum_run),
+        ):
+            width, height = 23, 17
+            source = os.path.join(temp_dir, "source.tif")
+            write_raster(source, source_rows(width, height))
+            output = os.path.join(temp_dir, "output.sdat")
+            execution = SagaTiledExecution(
+                SagaTiling.tiles(width, height, 8, 1),
+                {"INPUT": source},
+                {"RESULT": output},
+                SagaJobWorkspace(os.path.join(temp_dir, "jobs")),
+            )
+            feedback = FakeFeedback()
+            completed, runs = execution.run(build_command, feedback)
+
+            self.assertTrue(completed)
+            self.assertEqual(len(runs), len(execution.tiles))
+            self.assertEqual(feedback.progress[-1], 100)
+
+            untiled = os.path.join(temp_dir, "untiled.tif")
+            write_raster(untiled, neighbourhood_sum(source_rows(width, height)))
+            expected, expected_dataset = read_raster(untiled)
+            rows, dataset = read_raster(output)
+            self.assertEqual(rows, expected)
+            self.assertEqual(
+                dataset.GetGeoTransform(), expected_dataset.GetGeoTransform()
+            )
+            self.assertEqual(
+                dataset.GetRasterBand(1).GetNoDataValue(),
+                expected_dataset.GetRasterBand(1).GetNoDataValue(),
+            )
+            self.assertEqual(dataset.GetRasterBand(1).DataType, gdal.GDT_Float32)
+
+    def test_run_failed_tile(self):
+        """
+        Test that a tile without outputs fails the run, and that the
+        mosaics are closed
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaTiling, "writeTileInput"),
+            mock.patch.object(SagaMosaic, "add") as add,
+            mock.patch.object(SagaMosaic, "close") as close,
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=empty_run),
+            mock.patch.object(SagaCoreScheduler, "availableCores", return_value=1),
+        ):
+            execution = SagaTiledExecution(
+                SagaTiling.tiles(40, 10, 10, 1),
+                {"INPUT": "source.tif"},
+                {"RESULT": os.path.join(temp_dir, "output.sdat")},
+                SagaJobWorkspace(os.path.join(temp_dir, "jobs")),
+            )
+            with self.assertRaises(QgsProcessingException) as raised:
+                execution.run(
+                    lambda inputs, outputs, tiles=iter(range(4)): (
+                        "tile{} -RESULT {}".format(next(tiles), outputs["RESULT"])
+                    ),
+                    FakeFeedback(),
+                )
+
+            self.assertIn("tile 1", str(raised.exception))
+            self.assertIn("ran tile1", str(raised.exception))
+            # only the tile which finished before the failure is mosaicked
+            self.assertEqual(add.call_count, 1)
+            close.assert_called_once()
+
+    def test_run_canceled(self):
+        """
+        Test that canceling a run stops mosaicking, and that the mosaics are
+        closed
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaTiling, "writeTileInput"),
+            mock.patch.object(SagaMosaic, "add") as add,
+            mock.patch.object(SagaMosaic, "close") as close,
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=empty_run) as run,
+            mock.patch.object(SagaCoreScheduler, "availableCores", return_value=1),
+        ):
+            execution = SagaTiledExecution(
+                SagaTiling.tiles(40, 10, 10, 1),
+                {"INPUT": "source.tif"},
+                {"RESULT": os.path.join(temp_dir, "output.sdat")},
+                SagaJobWorkspace(os.path.join(temp_dir, "jobs")),
+            )
+            feedback = FakeFeedback(cancel_after=1)
+            completed, runs = execution.run(
+                lambda inputs, outputs: "tile -RESULT {}".format(outputs["RESULT"]),
+                feedback,
+            )
+
+            self.assertFalse(completed)
+            self.assertEqual(len(runs), run.call_count)
+            self.assertEqual(add.call_count, 1)
+            close.assert_called_once()
@@ -2,8 +2,14 @@
 Test saga utils
 """
 
-from unittest import TestCase
+import contextlib
+import os
+import tempfile
+import time
+from unittest import TestCase, mock
 
+from processing_saga_nextgen.processing.accounting import SagaCommandRun
+from processing_saga_nextgen.processing.scheduler import SagaCoreScheduler
 from processing_saga_nextgen.processing.utils import SagaUtils
 
 
@@ -19,3 +25,259 @@ class UtilTests(TestCase):
         path = r"C:\Users\fclementi\AppData\Roaming\QGIS\QGIS3\profiles\new(profile)\processing\saga_batch_job.bat"
         expected = r'"C:\Users\fclementi\AppData\Roaming\QGIS\QGIS3\profiles\new^(profile^)\processing\saga_batch_job.bat"'
         self.assertEqual(expected, SagaUtils.make_path_safe(path))
+
+    def test_version_tuple(self):
+        """
+        Test SagaUtils.versionTuple
+        """
+        self.assertEqual(SagaUtils.versionTuple("9.2.1"), (9, 2, 1))
+        self.assertEqual(SagaUtils.versionTuple("9.2."), (9, 2))
+        self.assertEqual(SagaUtils.versionTuple("9.3.0b"), (9, 3, 0))
+        self.assertEqual(SagaUtils.versionTuple(""), ())
+        self.assertGreater(
+            SagaUtils.versionTuple("9.10.0"), SagaUtils.versionTuple("9.2.")
+        )
+        self.assertLess(SagaUtils.versionTuple("9.1.3"), SagaUtils.versionTuple("9.2."))
+
+    def test_direct_raster_source(self):
+        """
+        Test SagaUtils.isDirectRasterSource
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tif = os.path.join(temp_dir, "dem.TIF")
+            nc = os.path.join(temp_dir, "dem.nc")
+            for path in (tif, nc):
+                with open(path, "wb") as f:
+                    f.write(b"0")
+
+            self.assertTrue(SagaUtils.isDirectRasterSource(tif))
+            self.assertFalse(SagaUtils.isDirectRasterSource(nc))
+            self.assertFalse(SagaUtils.isDirectRasterSource(tif + "|option:x=1"))
+            self.assertFalse(
+                SagaUtils.isDirectRasterSource(os.path.join(temp_dir, "missing.tif"))
+            )
+            self.assertFalse(
+                SagaUtils.isDirectRasterSource(os.path.join(temp_dir, "höhe.tif"))
+            )
+            self.assertFalse(SagaUtils.isDirectRasterSource(""))
+
+    def test_version_cache(self):
+        """
+        Test that the SAGA version is only probed when saga_cmd changes
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(
+                SagaUtils,
+                "versionCacheFilename",
+                return_value=os.path.join(temp_dir, "version_cache.json"),
+            ),
+            mock.patch.object(
+                SagaUtils, "sagaCmdFingerprint", return_value=__file__ + "|1|1"
+            ) as fingerprint,
+            mock.patch.object(
+                SagaUtils, "runVersionProbe", return_value="9.2.0"
+            ) as probe,
+            mock.patch.dict(SagaUtils._version_cache, clear=True),
+        ):  # pylint: disable=protected-access
+            self.assertEqual(SagaUtils.getInstalledVersion(True), "9.2.0")
+            self.assertEqual(SagaUtils.getInstalledVersion(True), "9.2.0")
+            self.assertEqual(probe.call_count, 1)
+
+            # a new session reuses the version stored on disk
+            SagaUtils._version_cache.clear()  # pylint: disable=protected-access
+            self.assertEqual(SagaUtils.getInstalledVersion(True), "9.2.0")
+            self.assertEqual(probe.call_count, 1)
+
+            # a changed saga_cmd is probed again
+            fingerprint.return_value = __file__ + "|2|2"
+            probe.return_value = "9.3.0"
+            self.assertEqual(SagaUtils.getInstalledVersion(True), "9.3.0")
+            self.assertEqual(probe.call_count, 2)
+
+    def test_job_workspaces(self):
+        """
+        Test that each job gets its own, isolated workspace
+        """
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaUtils, "sagaJobFolder", return_value=temp_dir),
+        ):
+            workspace1 = SagaUtils.createJobWorkspace()
+            workspace2 = SagaUtils.createJobWorkspace()
+            self.assertNotEqual(workspace1.folder, workspace2.folder)
+            self.assertNotEqual(
+                workspace1.tempFilename("txt"), workspace1.tempFilename("txt")
+            )
+
+            batch_file1 = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                ['ta_morphometry "0" -ELEVATION "a.sgrd"'], workspace1
+            )
+            batch_file2 = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                ['grid_filter "0" -INPUT "b.sgrd"'], workspace2
+            )
+            self.assertNotEqual(batch_file1, batch_file2)
+            self.assertEqual(os.path.dirname(batch_file1), workspace1.folder)
+            with open(batch_file1, encoding="utf-8") as f:
+                self.assertIn("ta_morphometry", f.read())
+
+            batch_file3 = SagaUtils.createSagaBatchJobFileFromSagaCommands(
+                ['grid_filter "0" -INPUT "b.sgrd"'], workspace2, "threads", 3
+            )
+            with open(batch_file3, encoding="utf-8") as f:
+                content = f.read()
+            self.assertIn("OMP_NUM_THREADS=3", content)
+            self.assertIn('saga_cmd --cores=3 grid_filter "0"', content)
+
+            workspace1.cleanup()
+            self.assertFalse(os.path.exists(workspace1.folder))
+            self.assertTrue(os.path.exists(batch_file2))
+            workspace2.cleanup()
+
+    def test_split_import_commands(self):
+        """
+        Test splitting independent import commands from the tool commands
+        """
+        imports = [
+            'io_gdal 0 -TRANSFORM 1 -RESAMPLING 3 -GRIDS "a.sgrd" -FILES "a.tif"',
+            'io_gdal 0 -TRANSFORM 1 -RESAMPLING 3 -GRIDS "b.sgrd" -FILES "b.tif"',
+        ]
+        tool = 'grid_calculus "1" -GRIDS "a.sgrd;b.sgrd"'
+        self.assertEqual(
+            SagaUtils.splitImportCommands(imports + [tool], imports),
+            (imports, [tool]),
+        )
+        self.assertEqual(SagaUtils.splitImportCommands([tool], []), ([], [tool]))
+        # once a non-import command is reached, everything else depends on it
+        self.assertEqual(
+            SagaUtils.splitImportCommands([imports[0], tool, imports[1]], imports),
+            ([imports[0]], [tool, imports[1]]),
+        )
+
+    def test_remove_dataset(self):
+        """
+        Test removing a SAGA grid together with its sidecar files
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("out.sgrd", "out.sdat", "out.mgrd", "out.prj", "other.sdat"):
+                with open(os.path.join(temp_dir, name), "w", encoding="utf-8"):
+                    pass
+            SagaUtils.removeDataset(os.path.join(temp_dir, "out.sdat"))
+            self.assertEqual(os.listdir(temp_dir), ["other.sdat"])
+
+    def test_move_dataset(self):
+        """
+        Test SagaUtils.moveDataset
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "temp_1.sgrd")
+            for extension in (".sgrd", ".sdat", ".prj"):
+                with open(os.path.join(temp_dir, "temp_1" + extension), "w"):
+                    pass
+            SagaUtils.moveDataset(source, os.path.join(temp_dir, "slope.sdat"))
+            self.assertEqual(
+                sorted(os.listdir(temp_dir)), ["slope.prj", "slope.sdat", "slope.sgrd"]
+            )
+
+    def test_execute_parallel_commands(self):
+        """
+        Test SagaUtils.executeParallelCommands
+        """
+
+        def fake_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+            with open(batch_filename, encoding="utf-8") as f:
+                self.assertIn(command, f.read())
+            return SagaCommandRun(command)
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaUtils, "sagaJobFolder", return_value=temp_dir),
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+        ):
+            workspace = SagaUtils.createJobWorkspace()
+            feedback = mock.Mock()
+            feedback.isCanceled.return_value = False
+            commands = {"a": "tool 0 -A", "b": "tool 0 -B", "c": "tool 0 -C"}
+            results = dict(
+                SagaUtils.executeParallelCommands(commands, feedback, workspace)
+            )
+            self.assertEqual(
+                {key: run.command for key, run in results.items()}, commands
+            )
+
+    def test_execute_imports_scheduled(self):
+        """
+        Test that concurrent imports reserve their cores from the scheduler
+        """
+        active = []
+
+        def fake_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+            active.append(SagaCoreScheduler.activeJobs())
+            with open(batch_filename, encoding="utf-8") as f:
+                self.assertIn("OMP_NUM_THREADS=", f.read())
+            return SagaCommandRun(command)
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaUtils, "sagaJobFolder", return_value=temp_dir),
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+            mock.patch.object(SagaUtils, "maxImportProcesses", return_value=2),
+            mock.patch.object(SagaCoreScheduler, "availableCores", return_value=8),
+        ):
+            workspace = SagaUtils.createJobWorkspace()
+            feedback = mock.Mock()
+            feedback.isCanceled.return_value = False
+            with SagaCoreScheduler.reserve():
+                completed, runs = SagaUtils.executeSagaImports(
+                    ["io_gdal 0 -A", "io_gdal 0 -B"], feedback, workspace
+                )
+            self.assertTrue(completed)
+            self.assertEqual(len(runs), 2)
+            # each import ran alongside the job reserved around it
+            self.assertTrue(all(count >= 2 for count in active))
+            self.assertEqual(SagaCoreScheduler.activeJobs(), 0)
+
+    def test_execute_parallel_commands_stopped(self):
+        """
+        Test that commands which have not started are skipped once the
+        caller stops consuming the results
+        """
+        started = []
+
+        def fake_run(batch_filename, feedback, command=None):  # pylint: disable=unused-argument
+            started.append(command)
+            time.sleep(0.2)
+            return SagaCommandRun(command)
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch.object(SagaUtils, "sagaJobFolder", return_value=temp_dir),
+            mock.patch.object(SagaUtils, "runBatchJob", side_effect=fake_run),
+            mock.patch.object(SagaCoreScheduler, "availableCores", return_value=1),
+        ):
+            workspace = SagaUtils.createJobWorkspace()
+            feedback = mock.Mock()
+            feedback.isCanceled.return_value = False
+            commands = {"a": "tool 0 -A", "b": "tool 0 -B", "c": "tool 0 -C"}
+            with contextlib.closing(
+                SagaUtils.executeParallelCommands(commands, feedback, workspace)
+            ) as results:
+                self.assertEqual(next(results)[0], "a")
+            self.assertNotIn("tool 0 -C", started)
+
+    def test_terminate_process_tree(self):
+        """
+        Test terminating a job's whole process tree
+        """
+        if os.name == "nt":
+            self.skipTest("POSIX process groups")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            batch_file = os.path.join(temp_dir, "job.sh")
+            with open(batch_file, "w", encoding="utf-8") as f:
+                f.write("trap '' TERM\nsleep 30 &\nsleep 30\n")
+            with SagaUtils.startBatchJob(batch_file) as proc:
+                SagaUtils.terminateProcessTree(proc, timeout=0.5)
+                self.assertIsNotNone(proc.returncode)
+                with self.assertRaises(ProcessLookupError):
+                    os.killpg(proc.pid, 0)
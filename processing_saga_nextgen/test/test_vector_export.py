@@ -0,0 +1,105 @@
+"""
+Test the export of vector inputs
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from processing_saga_nextgen.processing.vectorexport import SagaVectorExport
+
+
+class FakeLayer:
+    """
+    A vector layer, for testing
+    """
+
+    def __init__(self, source, provider="ogr", subset=""):
+        self._source = source
+        self._provider = provider
+        self._subset = subset
+
+    def source(self):  # pylint: disable=missing-function-docstring
+        return self._source
+
+    def providerType(self):  # pylint: disable=missing-function-docstring
+        return self._provider
+
+    def subsetString(self):  # pylint: disable=missing-function-docstring
+        return self._subset
+
+
+def write(path: str, content: bytes):
+    """
+    Writes a file
+    """
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+class VectorExportTests(TestCase):
+    """
+    Test the export of vector inputs
+    """
+
+    def test_source_path(self):
+        """
+        Test the file paths of OGR layer sources
+        """
+        self.assertEqual(
+            SagaVectorExport.sourcePath("/data/parcels.gpkg|layername=parcels"),
+            "/data/parcels.gpkg",
+        )
+        self.assertEqual(
+            SagaVectorExport.sourcePath("/data/parcels.shp"), "/data/parcels.shp"
+        )
+
+    def test_source_fingerprint(self):
+        """
+        Test that fingerprints change when any of a layer's files change
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shp = os.path.join(temp_dir, "parcels.shp")
+            write(shp, b"shp")
+            write(os.path.join(temp_dir, "parcels.dbf"), b"dbf")
+            fingerprint = SagaVectorExport.sourceFingerprint(shp)
+            self.assertEqual(fingerprint, SagaVectorExport.sourceFingerprint(shp))
+
+            # attribute edits only change the .dbf
+            write(os.path.join(temp_dir, "parcels.dbf"), b"dbf2")
+            self.assertNotEqual(fingerprint, SagaVectorExport.sourceFingerprint(shp))
+
+            # GeoPackage edits may only be in the write-ahead log
+            gpkg = os.path.join(temp_dir, "parcels.gpkg")
+            write(gpkg, b"gpkg")
+            source = gpkg + "|layername=parcels"
+            fingerprint = SagaVectorExport.sourceFingerprint(source)
+            write(gpkg + "-wal", b"wal")
+            self.assertNotEqual(fingerprint, SagaVectorExport.sourceFingerprint(source))
+
+            self.assertIsNone(
+                SagaVectorExport.sourceFingerprint(
+                    "dbname='gis' table=\"parcels\" (geom)"
+                )
+            )
+
+    def test_is_shapefile(self):
+        """
+        Test which layers SAGA reads without exporting them
+        """
+        self.assertTrue(SagaVectorExport.isShapefile(FakeLayer("/data/parcels.shp")))
+        self.assertFalse(
+            SagaVectorExport.isShapefile(
+                FakeLayer("/data/parcels.shp", subset='"area" > 100')
+            )
+        )
+        self.assertFalse(
+            SagaVectorExport.isShapefile(
+                FakeLayer("/data/parcels.gpkg|layername=parcels")
+            )
+        )
+        self.assertFalse(
+            SagaVectorExport.isShapefile(
+                FakeLayer("dbname='gis' table=\"parcels\"", provider="postgres")
+            )
+        )